@@ -0,0 +1,252 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+import numpy as np
+
+# Subir este número cuando cambie el formato de lo que se guarda en caché,
+# así las entradas viejas dejan de coincidir y se regeneran solas.
+CACHE_VERSION = 5
+
+# Cuántos bytes del principio y del final del archivo entran en el hash de contenido
+_HASH_SAMPLE_BYTES = 1 << 20
+
+# Carpetas temporales (entradas a medio escribir) sin cambios en este tiempo: su
+# análisis murió con el proceso que lo hacía, así que evict las borra
+STALE_TEMP_SECONDS = 3600
+
+
+class AnalysisCache:
+    """
+    Caché persistente en disco para los resultados del análisis de audio.
+
+    Cada entrada es una carpeta con un `meta.json` y un `.npy` por array, para
+    poder abrirlos con memory-map sin cargarlos enteros en RAM. La clave combina
+    un hash del contenido del archivo (tamaño, mtime y muestras del inicio/final)
+    con los parámetros del análisis. El tamaño total se limita con una política LRU.
+    """
+
+    def __init__(self, cache_dir=None, max_size_mb=2048):
+        self.cache_dir = cache_dir or os.path.join(os.getcwd(), "analysis_cache")
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def make_key(self, filepath, **params):
+        """Genera la clave de caché para un archivo y unos parámetros de análisis."""
+        st = os.stat(filepath)
+        h = hashlib.sha1()
+        h.update(f"v{CACHE_VERSION}|{st.st_size}|{st.st_mtime_ns}".encode())
+        for name in sorted(params):
+            h.update(f"|{name}={params[name]}".encode())
+
+        # Muestras del contenido: detecta archivos reemplazados con el mismo mtime
+        with open(filepath, 'rb') as f:
+            h.update(f.read(_HASH_SAMPLE_BYTES))
+            if st.st_size > 2 * _HASH_SAMPLE_BYTES:
+                f.seek(-_HASH_SAMPLE_BYTES, os.SEEK_END)
+                h.update(f.read(_HASH_SAMPLE_BYTES))
+        return h.hexdigest()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def _temp_dir(self, key):
+        # Única por escritura: dos análisis de la misma clave no se pisan
+        return f"{self._entry_dir(key)}.tmp-{os.getpid()}-{uuid.uuid4().hex}"
+
+    def _publish(self, key, folder):
+        """
+        Renombra una carpeta temporal terminada (con su meta.json) a la entrada
+        de `key`. Devuelve False, sin tocarla, si otra escritura de la misma
+        clave ya publicó la entrada.
+        """
+        entry = self._entry_dir(key)
+        meta_path = os.path.join(entry, "meta.json")
+        if os.path.exists(meta_path):
+            return False
+        shutil.rmtree(entry, ignore_errors=True) # Restos sin meta.json de versiones anteriores
+        try:
+            os.replace(folder, entry)
+        except OSError:
+            if os.path.exists(meta_path):
+                return False # La otra escritura ganó la carrera
+            raise
+        return True
+
+    def load(self, key):
+        """
+        Devuelve (arrays, meta) si la entrada existe, o None.
+        Los arrays se abren en modo memory-map de solo lectura.
+        """
+        entry = self._entry_dir(key)
+        meta_path = os.path.join(entry, "meta.json")
+        if not os.path.exists(meta_path):
+            self.misses += 1
+            return None
+
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            arrays = {
+                name: np.load(os.path.join(entry, f"{name}.npy"), mmap_mode='r')
+                for name in meta.get("arrays", [])
+            }
+        except Exception as e:
+            print(f"[CACHE] Entrada corrupta {key}: {e}")
+            shutil.rmtree(entry, ignore_errors=True)
+            self.misses += 1
+            return None
+
+        # Marcar como usada recientemente (para el LRU)
+        try:
+            os.utime(meta_path)
+        except OSError:
+            pass
+
+        self.hits += 1
+        return arrays, meta
+
+    def store(self, key, arrays, meta=None):
+        """Guarda los arrays y metadatos de una entrada y aplica el límite de tamaño."""
+        entry = self._entry_dir(key)
+        if os.path.exists(os.path.join(entry, "meta.json")):
+            return
+
+        # Escribir en una carpeta temporal y renombrar: nunca queda una entrada a medias
+        tmp_entry = self._temp_dir(key)
+        try:
+            os.makedirs(tmp_entry)
+            for name, arr in arrays.items():
+                np.save(os.path.join(tmp_entry, f"{name}.npy"), np.ascontiguousarray(arr))
+
+            meta = dict(meta or {})
+            meta["arrays"] = list(arrays)
+            meta["created"] = time.time()
+            with open(os.path.join(tmp_entry, "meta.json"), 'w', encoding='utf-8') as f:
+                json.dump(meta, f, indent=4)
+
+            if not self._publish(key, tmp_entry):
+                shutil.rmtree(tmp_entry, ignore_errors=True)
+        except Exception as e:
+            print(f"[CACHE] Error al guardar entrada {key}: {e}")
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+            return
+
+        self.evict()
+
+    def begin_entry(self, key):
+        """
+        Crea una carpeta temporal para que el análisis escriba en ella la
+        entrada directamente (modo fuera de memoria). No es visible hasta
+        finish_entry; si el análisis falla o se cancela, abort_entry la borra.
+        """
+        folder = self._temp_dir(key)
+        os.makedirs(folder)
+        return folder
+
+    def finish_entry(self, key, folder, names, meta=None):
+        """
+        Publica una entrada escrita con begin_entry: escribe su meta.json y
+        renombra la carpeta a su sitio. Devuelve True si `folder` pasó a ser la
+        entrada; si no (otra escritura de la misma clave terminó antes, o no se
+        pudo renombrar), la carpeta sigue siendo del llamador, que debe borrarla
+        con abort_entry cuando suelte sus archivos.
+        """
+        meta = dict(meta or {})
+        meta["arrays"] = list(names)
+        meta["created"] = time.time()
+        with open(os.path.join(folder, "meta.json"), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=4)
+        try:
+            published = self._publish(key, folder)
+        except OSError:
+            # Windows no deja renombrar una carpeta con archivos abiertos (los
+            # memory-map del propio análisis): publicar una copia
+            published = False
+            copy = self._temp_dir(key)
+            try:
+                shutil.copytree(folder, copy)
+                if not self._publish(key, copy):
+                    shutil.rmtree(copy, ignore_errors=True)
+            except OSError as e:
+                print(f"[CACHE] Error al publicar entrada {key}: {e}")
+                shutil.rmtree(copy, ignore_errors=True)
+        self.evict()
+        return published
+
+    def abort_entry(self, folder):
+        """Descarta una entrada de begin_entry que no llegó a publicarse."""
+        shutil.rmtree(folder, ignore_errors=True)
+
+    def load_array(self, key, name):
+        """Array adicional guardado junto a una entrada (p. ej. características), o None."""
+        path = os.path.join(self._entry_dir(key), f"{name}.npy")
+        if not os.path.exists(path):
+            return None
+        try:
+            return np.load(path, mmap_mode='r')
+        except Exception as e:
+            print(f"[CACHE] Array {name} corrupto en {key}: {e}")
+            return None
+
+    def store_array(self, key, name, array):
+        """Añade un array a una entrada existente. Devuelve False si la entrada no existe."""
+        entry = self._entry_dir(key)
+        if not os.path.exists(os.path.join(entry, "meta.json")):
+            return False
+        tmp_path = os.path.join(entry, f"{name}.tmp{os.getpid()}.npy")
+        try:
+            np.save(tmp_path, np.ascontiguousarray(array))
+            os.replace(tmp_path, os.path.join(entry, f"{name}.npy"))
+        except OSError as e:
+            print(f"[CACHE] Error al guardar {name} en {key}: {e}")
+            return False
+        return True
+
+    def evict(self):
+        """Borra las entradas usadas hace más tiempo hasta quedar bajo el límite."""
+        entries = []
+        total = 0
+        now = time.time()
+        for name in os.listdir(self.cache_dir):
+            entry = self._entry_dir(name)
+            if ".tmp" in name:
+                # Entrada a medio escribir: borrarla si quien la escribía ya no existe
+                try:
+                    if now - self._last_modified(entry) > STALE_TEMP_SECONDS:
+                        shutil.rmtree(entry, ignore_errors=True)
+                        print(f"[CACHE] Purged stale {name}")
+                except OSError:
+                    pass # La acaban de publicar o borrar
+                continue
+            meta_path = os.path.join(entry, "meta.json")
+            try:
+                size = sum(
+                    os.path.getsize(os.path.join(entry, f))
+                    for f in os.listdir(entry)
+                )
+                mtime = os.path.getmtime(meta_path)
+            except OSError:
+                continue # Sin meta.json, o la ha borrado otro proceso mientras la medíamos
+            entries.append((mtime, size, entry))
+            total += size
+
+        entries.sort()
+        while total > self.max_bytes and len(entries) > 1:
+            _, size, entry = entries.pop(0)
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            print(f"[CACHE] Evicted {os.path.basename(entry)} ({size / 1e6:.1f} MB)")
+
+    @staticmethod
+    def _last_modified(folder):
+        # Cada escritura de las tablas actualiza el mtime de su archivo
+        return max([os.path.getmtime(folder)] +
+                   [os.path.getmtime(os.path.join(folder, f)) for f in os.listdir(folder)])
+
+    def stats(self):
+        return f"hits={self.hits}, misses={self.misses}"
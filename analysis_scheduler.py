@@ -0,0 +1,124 @@
+import threading
+from track_analyzer import AnalysisCancelled
+
+
+class AnalysisScheduler:
+    """
+    Ejecuta los análisis de pista de uno en uno, en un único hilo.
+
+    Cada submit reemplaza al anterior: un trabajo en espera que queda viejo no
+    llega a arrancar, y el que está en marcha se cancela en el siguiente bloque
+    (ver TrackAnalyzer.run, should_cancel). on_ready solo se llama si el
+    trabajo sigue siendo el más reciente, así que nunca se publican resultados
+    de una pista que ya no está seleccionada.
+
+    Aparte hay un hueco de baja prioridad (prefetch, p. ej. la siguiente pista
+    de la lista): solo arranca cuando no hay otro trabajo, y cualquier submit,
+    cancel o prefetch posterior lo descarta o lo cancela.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._generation = 0
+        self._pending = None # (generación, analizador, on_ready)
+        self._prefetch = None # (generación de prefetch, analizador)
+        self._prefetch_generation = 0
+        self._thread = None
+
+        # Estadísticas
+        self.completed = 0
+        self.cancelled = 0
+        self.skipped = 0
+
+    def submit(self, analyzer, on_ready=None):
+        """Encola un análisis que reemplaza a cualquiera anterior. Devuelve su generación."""
+        with self._cond:
+            self._generation += 1
+            self._drop_prefetch()
+            if self._pending is not None:
+                self._skip(self._pending[1])
+            self._pending = (self._generation, analyzer, on_ready)
+            self._wake()
+            return self._generation
+
+    def prefetch(self, analyzer):
+        """Encola un análisis de baja prioridad (reemplaza al prefetch anterior)."""
+        with self._cond:
+            self._drop_prefetch()
+            self._prefetch = (self._prefetch_generation, analyzer)
+            self._wake()
+
+    def cancel_prefetch(self):
+        with self._cond:
+            self._drop_prefetch()
+
+    def _drop_prefetch(self):
+        # Descarta el prefetch en espera y hace que el que está en marcha se cancele
+        self._prefetch_generation += 1
+        if self._prefetch is not None:
+            self._skip(self._prefetch[1])
+            self._prefetch = None
+
+    def _wake(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
+        self._cond.notify()
+
+    def cancel(self):
+        """Descarta el trabajo en espera y cancela el que esté en marcha."""
+        with self._cond:
+            self._generation += 1
+            self._drop_prefetch()
+            if self._pending is not None:
+                self._skip(self._pending[1])
+                self._pending = None
+
+    def is_current(self, generation):
+        return generation == self._generation
+
+    def _skip(self, analyzer):
+        # Nunca arrancó: marcarlo como terminado para quien espere en done
+        self.skipped += 1
+        analyzer.done.set()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while self._pending is None and self._prefetch is None:
+                    self._cond.wait()
+                job, prefetch = self._pending, self._prefetch
+                if job is not None:
+                    self._pending = None
+                else:
+                    self._prefetch = None
+            if job is not None:
+                self._run(*job)
+            else:
+                self._run_prefetch(*prefetch)
+
+    def _run(self, generation, analyzer, on_ready):
+        def publish():
+            if not self.is_current(generation):
+                return
+            if on_ready:
+                on_ready()
+
+        try:
+            analyzer.run(on_ready=publish, should_cancel=lambda: not self.is_current(generation))
+            self.completed += 1
+        except AnalysisCancelled:
+            self.cancelled += 1
+            print(f"[ENGINE LOG] Superseded analysis cancelled ({self.cancelled} so far)")
+        except Exception as e:
+            print(f"Error en análisis Librosa: {e}")
+
+    def _run_prefetch(self, generation, analyzer):
+        try:
+            analyzer.run(should_cancel=lambda: generation != self._prefetch_generation)
+            self.completed += 1
+        except AnalysisCancelled:
+            self.cancelled += 1
+            print("[ENGINE LOG] Prefetch analysis cancelled")
+        except Exception as e:
+            print(f"[ENGINE LOG] Prefetch analysis failed: {e}")
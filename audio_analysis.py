@@ -0,0 +1,394 @@
+import io
+import weakref
+import numpy as np
+import librosa
+
+# Mismos valores que usa librosa.amplitude_to_db
+AMIN = 1e-5
+TOP_DB = 80.0
+
+
+def amplitude_to_abs_db(mag):
+    """
+    Convierte magnitudes a dB absolutos (ref=1.0), igual que librosa.amplitude_to_db
+    pero sin restar la referencia ni recortar: eso se hace al normalizar.
+    """
+    return 10.0 * np.log10(np.maximum(AMIN ** 2, np.square(mag)))
+
+
+def ref_db_from_max(max_mag):
+    """Referencia en dB a partir de la magnitud máxima (equivale a ref=np.max)."""
+    return 10.0 * np.log10(np.maximum(AMIN ** 2, np.float32(max_mag) ** 2))
+
+
+def normalize_db(db, ref_db):
+    """Lleva dB absolutos a [0, 1]: 0 dB relativo a la referencia -> 1, -80 dB -> 0."""
+    rel = np.asarray(db - ref_db, dtype=np.float32)
+    return np.clip((rel + TOP_DB) / TOP_DB, 0, 1)
+
+
+def fps_aligned_params(fps, sr=22050):
+    """
+    (sr, hop_length) para que cada frame de video caiga exactamente en un frame
+    de análisis: hop = sr/fps redondeado y la frecuencia se ajusta a hop*fps
+    (p. ej. 60 FPS -> hop 368 a 22080 Hz, 30 FPS -> hop 735 a 22050 Hz).
+    """
+    hop_length = max(1, int(round(sr / fps)))
+    return int(round(hop_length * fps)), hop_length
+
+
+def scaled_fft_size(n_fft, sr, target_sr):
+    """
+    n_fft equivalente a otra frecuencia de muestreo: la potencia de dos más
+    cercana que conserva la resolución en Hz (p. ej. 2048 a 22050 -> 4096 a 44100).
+    """
+    return int(n_fft * 2.0 ** round(np.log2(sr / target_sr)))
+
+
+# Ventana de dB absolutos que cubre la codificación uint8 (~0.47 dB por paso)
+UINT8_DB_MIN = -60.0
+UINT8_DB_MAX = 60.0
+
+
+def encode_db(db, dtype="float16"):
+    """
+    Compacta dB absolutos para guardarlos: float32 sin cambios, float16 directo,
+    o uint8 cuantizado linealmente en [UINT8_DB_MIN, UINT8_DB_MAX].
+    """
+    dtype = np.dtype(dtype)
+    if dtype == np.uint8:
+        scaled = (db - UINT8_DB_MIN) * (255.0 / (UINT8_DB_MAX - UINT8_DB_MIN))
+        return np.clip(np.round(scaled), 0, 255).astype(np.uint8)
+    return np.asarray(db, dtype=dtype)
+
+
+def decode_db(stored):
+    """Inversa de encode_db: devuelve dB absolutos en float32."""
+    if stored.dtype == np.uint8:
+        step = (UINT8_DB_MAX - UINT8_DB_MIN) / 255.0
+        return stored.astype(np.float32) * np.float32(step) + np.float32(UINT8_DB_MIN)
+    return np.asarray(stored, dtype=np.float32)
+
+
+class StreamingSTFT:
+    """
+    STFT incremental equivalente a librosa.stft(center=True, pad_mode='constant').
+
+    Se alimenta con bloques de muestras consecutivas (`push`) y devuelve las
+    magnitudes de los frames que ya están completos, con forma (frames, bins).
+    `finish` añade el relleno final y entrega los frames restantes.
+    """
+
+    def __init__(self, n_fft=2048, hop_length=512):
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.window = librosa.filters.get_window('hann', n_fft, fftbins=True)
+        self.n_bins = n_fft // 2 + 1
+
+        # Buffer con las muestras pendientes; arranca con el relleno de center=True
+        self._buffer = np.zeros(n_fft // 2, dtype=np.float32)
+        self.frames_done = 0
+        self.samples_seen = 0
+
+    def push(self, samples):
+        return self.magnitude(self.push_span(samples))
+
+    def finish(self):
+        """Procesa la cola final. Devuelve los últimos frames."""
+        return self.magnitude(self.finish_span())
+
+    def push_span(self, samples):
+        """
+        Como push, pero sin transformar: devuelve el trozo de señal que cubre los
+        frames ya completos (solapamiento incluido), para pasárselo a magnitude o
+        a analyze_span desde otro hilo. Trozos consecutivos dan los mismos frames
+        que una sola llamada.
+        """
+        samples = np.asarray(samples, dtype=np.float32)
+        self.samples_seen += len(samples)
+        self._buffer = np.concatenate((self._buffer, samples))
+        return self._take(limit=None)
+
+    def finish_span(self):
+        self._buffer = np.concatenate((self._buffer, np.zeros(self.n_fft // 2, dtype=np.float32)))
+        total_frames = 1 + self.samples_seen // self.hop_length
+        return self._take(limit=total_frames - self.frames_done)
+
+    def magnitude(self, span):
+        """Magnitudes (frames, bins) de un trozo devuelto por push_span/finish_span."""
+        return stft_magnitude(span_frames(span, self.n_fft, self.hop_length), self.window)
+
+    def _take(self, limit):
+        available = 0
+        if len(self._buffer) >= self.n_fft:
+            available = 1 + (len(self._buffer) - self.n_fft) // self.hop_length
+        if limit is not None:
+            available = min(available, limit)
+        if available <= 0:
+            return self._buffer[:0]
+
+        # El buffer nunca se modifica en el sitio, así que la vista sigue siendo válida
+        span = self._buffer[:(available - 1) * self.hop_length + self.n_fft]
+
+        # Descartar las muestras que ya no necesita ningún frame futuro
+        self._buffer = self._buffer[available * self.hop_length:]
+        self.frames_done += available
+        return span
+
+
+def span_frames(span, n_fft, hop_length):
+    """Vista (frames, n_fft) de los frames contenidos en un trozo de señal."""
+    if len(span) < n_fft:
+        return np.zeros((0, n_fft), dtype=np.float32)
+    return np.lib.stride_tricks.sliding_window_view(span, n_fft)[::hop_length]
+
+
+def analyze_span(span, stft, filterbank, spec_dtype):
+    """
+    Todo el trabajo por frame de un trozo de señal: STFT, dB compactados y bandas.
+    Devuelve (spec_db, bands_db, magnitud máxima). Los trozos son independientes,
+    así que se pueden repartir entre hilos (NumPy suelta el GIL en la FFT y en
+    las operaciones por elemento) y el resultado es idéntico al secuencial.
+    """
+    mag = stft.magnitude(span)
+    block_max = mag.max() if len(mag) else np.float32(0)
+    return encode_db(amplitude_to_abs_db(mag), spec_dtype), band_power_db(mag, filterbank), block_max
+
+
+def stft_magnitude(frames, window):
+    """Magnitud de la FFT de cada frame (frames, n_fft) -> (frames, bins) float32."""
+    spec = np.fft.rfft(window * frames, axis=-1).astype(np.complex64)
+    return np.abs(spec)
+
+
+def log_band_filterbank(sr, n_fft, n_bands=64, fmin=40.0, fmax=None):
+    """
+    Matriz (bins, bandas) que promedia la potencia de los bins de la FFT en bandas
+    espaciadas logarítmicamente entre fmin y fmax.
+    Cada banda cubre al menos un bin, así los graves no salen repetidos.
+    """
+    fmax = fmax or sr / 2
+    n_bins = n_fft // 2 + 1
+    bin_hz = sr / n_fft
+
+    lo = max(1, int(round(fmin / bin_hz)))
+    hi = min(n_bins, int(round(fmax / bin_hz)) + 1)
+    edges = np.round(np.geomspace(lo, hi, n_bands + 1)).astype(int)
+    for b in range(1, len(edges)):
+        edges[b] = max(edges[b], edges[b - 1] + 1)
+    edges = np.minimum(edges, n_bins)
+
+    weights = np.zeros((n_bins, n_bands), dtype=np.float32)
+    for b in range(n_bands):
+        start, stop = edges[b], max(edges[b + 1], edges[b] + 1)
+        start = min(start, n_bins - 1)
+        weights[start:stop, b] = 1.0 / (min(stop, n_bins) - start)
+    return weights
+
+
+def band_power_db(mag, filterbank):
+    """Magnitudes (frames, bins) -> potencia por banda en dB absolutos (frames, bandas)."""
+    power = np.square(mag) @ filterbank
+    return 10.0 * np.log10(np.maximum(AMIN ** 2, power))
+
+
+def envelope_coefficient(seconds, frame_rate):
+    """Coeficiente por frame de un filtro de un polo con constante de tiempo `seconds` (0: instantáneo)."""
+    if seconds <= 0:
+        return 1.0
+    return float(1.0 - np.exp(-1.0 / (seconds * frame_rate)))
+
+
+class EnvelopeFollower:
+    """
+    Suavizado ataque/liberación (IIR de un polo) de una tabla (frames, ancho) a lo
+    largo del tiempo: sube con el coeficiente `attack` y baja con `release`.
+
+    Es causal, así que se puede aplicar por bloques consecutivos (process guarda
+    el último valor) o a la tabla entera de una vez; el resultado es el mismo.
+    El coeficiente depende de si la señal sube o baja, así que no es un filtro
+    lineal: se recorre el eje del tiempo una vez, con cada paso vectorizado
+    sobre todas las bandas.
+    """
+
+    def __init__(self, attack, release):
+        self.attack = np.float32(attack)
+        self.release = np.float32(release)
+        self._y = None
+
+    def process(self, rows):
+        rows = np.asarray(rows, dtype=np.float32)
+        out = np.empty_like(rows)
+        if len(rows) == 0:
+            return out
+        if self._y is None:
+            self._y = rows[0].copy()
+        y = self._y
+        diff = np.empty_like(y)
+        coef = np.empty_like(y)
+        for i in range(len(rows)):
+            np.subtract(rows[i], y, out=diff)
+            coef.fill(self.release)
+            coef[diff > 0] = self.attack
+            diff *= coef
+            y += diff
+            out[i] = y
+        return out
+
+
+class RowBuffer:
+    """
+    Tabla (frames, ancho) en RAM que se rellena por filas durante el análisis.
+    Si la duración estimada se quedó corta, crece copiando a un array nuevo
+    (los lectores que tenían el array anterior siguen viendo datos válidos).
+    """
+
+    def __init__(self, rows, width, dtype):
+        self.array = np.zeros((rows, width), dtype=dtype)
+
+    def write(self, start, values):
+        end = start + len(values)
+        if end > len(self.array):
+            grown = np.zeros((max(end, int(len(self.array) * 1.25)),) + self.array.shape[1:], dtype=self.array.dtype)
+            grown[:start] = self.array[:start]
+            self.array = grown
+        self.array[start:end] = values
+
+    def finish(self, rows):
+        self.array = self.array[:rows]
+        return self.array
+
+    def close(self):
+        pass
+
+
+class SharedSegment:
+    """
+    Un bloque de multiprocessing.shared_memory y los arrays de NumPy sobre él.
+
+    Un array creado sobre shm.buf no mantiene vivo el mapeo (su base es el mmap
+    y no retiene el buffer), así que cerrar el bloque con vistas vivas las
+    dejaría apuntando a memoria desmapeada. Los arrays de array() tienen este
+    objeto como base: sigue vivo mientras quede una vista y, al caer la última,
+    cierra el bloque (weakref.finalize). Borrar su nombre (unlink) es cosa de
+    quien lo creó.
+    """
+
+    def __init__(self, shm):
+        self.name = shm.name
+        self.size = shm.size
+        # El array temporal solo sirve para leer la dirección: no retiene el buffer
+        address = np.frombuffer(shm.buf, dtype=np.uint8).ctypes.data
+        self.__array_interface__ = {"shape": (shm.size,), "typestr": "|u1", "data": (address, False), "version": 3}
+        weakref.finalize(self, shm.close)
+
+    def array(self, shape, dtype):
+        """Array (shape, dtype) sobre el principio del bloque."""
+        nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        return np.asarray(self)[:nbytes].view(dtype).reshape(shape)
+
+
+class SharedRowBuffer:
+    """
+    Tabla (frames, ancho) sobre un SharedSegment que otro proceso ya reservó
+    con `rows` filas. No puede crecer: si la duración
+    estimada se quedó corta, las filas sobrantes se descartan (y truncated
+    pasa a True).
+    """
+
+    def __init__(self, segment, rows, width, dtype):
+        self.segment = segment
+        self.array = segment.array((rows, width), dtype)
+        self.truncated = False
+
+    def write(self, start, values):
+        end = min(start + len(values), len(self.array))
+        if end < start + len(values) and not self.truncated:
+            self.truncated = True
+            print("[ENGINE LOG] Shared table full, dropping frames past the estimated duration")
+        if end > start:
+            self.array[start:end] = values[:end - start]
+
+    def finish(self, rows):
+        self.array = self.array[:min(rows, len(self.array))]
+        return self.array
+
+    def close(self):
+        pass
+
+
+class DiskRowBuffer:
+    """
+    Igual que RowBuffer, pero la tabla vive en un archivo .npy.
+
+    Las filas se escriben con escrituras de archivo normales (no quedan páginas
+    sucias en la memoria del proceso) y la lectura se hace con un memory-map de
+    solo lectura, así el uso de RAM no depende de la duración de la pista.
+    NumPy deja holgura en la cabecera .npy para crecer en el eje 0, así que
+    cambiar el número de filas solo reescribe la cabecera.
+    """
+
+    def __init__(self, path, rows, width, dtype):
+        self.path = path
+        # open_memmap escribe la cabecera y reserva el archivo (disperso)
+        mm = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=(rows, width))
+        self._data_offset = mm.offset
+        del mm
+        if self._data_offset != self.data_offset(width, dtype):
+            raise IOError(f"Cabecera inesperada en {path}")
+        self._width = width
+        self._dtype = np.dtype(dtype)
+        self._row_bytes = width * self._dtype.itemsize
+        self._file = open(path, 'r+b')
+        self.array = np.load(path, mmap_mode='r')
+
+    @staticmethod
+    def data_offset(width, dtype):
+        """Posición de los datos en el archivo: no depende del número de filas."""
+        header = io.BytesIO()
+        np.lib.format.write_array_header_1_0(header, {
+            'descr': np.lib.format.dtype_to_descr(np.dtype(dtype)),
+            'fortran_order': False,
+            'shape': (0, width),
+        })
+        return header.tell()
+
+    @classmethod
+    def map_rows(cls, path, rows, width, dtype):
+        """
+        Memory-map de solo lectura de las primeras `rows` filas de una tabla
+        que otro proceso está escribiendo con DiskRowBuffer. No lee la cabecera,
+        que el escritor reescribe al crecer, así que nunca la ve a medias.
+        """
+        return np.memmap(path, dtype=dtype, mode='r', offset=cls.data_offset(width, dtype), shape=(rows, width))
+
+    def _set_rows(self, rows):
+        header = {
+            'descr': np.lib.format.dtype_to_descr(self._dtype),
+            'fortran_order': False,
+            'shape': (rows, self._width),
+        }
+        self._file.seek(0)
+        np.lib.format.write_array_header_1_0(self._file, header)
+        if self._file.tell() != self._data_offset:
+            raise IOError(f"No se pudo redimensionar {self.path} en el sitio")
+        self._file.flush()
+        self.array = np.load(self.path, mmap_mode='r')
+
+    def write(self, start, values):
+        end = start + len(values)
+        self._file.seek(self._data_offset + start * self._row_bytes)
+        self._file.write(np.ascontiguousarray(values, dtype=self._dtype).tobytes())
+        self._file.flush()
+        if end > len(self.array):
+            self._set_rows(max(end, int(len(self.array) * 1.25)))
+
+    def finish(self, rows):
+        if rows != len(self.array):
+            self._set_rows(rows)
+        self.close()
+        return self.array
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
@@ -0,0 +1,178 @@
+import re
+import subprocess
+import numpy as np
+
+# Tamaño por defecto de cada bloque decodificado (en segundos de audio)
+DEFAULT_BLOCK_SECONDS = 2.0
+
+# Formatos que se listan en la biblioteca: los que pygame.mixer.music puede
+# reproducir (m4a no: no se podría escuchar, así que tampoco se lista)
+PLAYABLE_EXTENSIONS = ('.mp3', '.wav', '.flac', '.ogg')
+
+# Calidad del remuestreo: nombre -> calidad de soxr.
+# "native" no remuestrea: se analiza a la frecuencia original del archivo
+# (ver TrackAnalyzer, que escala hop_length y n_fft para conservar la resolución temporal).
+RESAMPLE_QUALITIES = {"hq": "HQ", "fast": "LQ", "native": None}
+
+
+class AudioStream:
+    """
+    Decodifica un archivo de audio por bloques, ya en mono y a la frecuencia `sr`
+    (sr=None: a la frecuencia nativa del archivo).
+
+    Backends, en orden de preferencia:
+    - soundfile (wav, flac, ogg, mp3): lectura por bloques sin procesos externos.
+    - ffmpeg (el binario de imageio-ffmpeg): lo que soundfile no abra (p. ej. mp3
+      con una libsndfile anterior a 1.1); el PCM llega por una tubería, por bloques.
+    - librosa.load como último recurso (carga el archivo entero).
+    En los dos primeros el remuestreo es incremental con soxr y la memoria usada
+    no depende de la duración.
+    """
+
+    def __init__(self, filepath, sr, block_seconds=DEFAULT_BLOCK_SECONDS, quality="hq"):
+        if quality not in RESAMPLE_QUALITIES:
+            raise ValueError(f"Calidad de remuestreo desconocida: {quality}")
+        self.filepath = filepath
+        self.sr = sr
+        self.block_seconds = block_seconds
+        self.quality = quality
+        self.native_sr = None
+        self.native_frames = None
+        self.estimated_samples = None # Longitud estimada ya remuestreada
+        self.backend = None
+        self._probe()
+
+        if self.sr is None or quality == "native":
+            self.sr = self.native_sr or sr or 22050
+        if self.native_frames:
+            self.estimated_samples = int(np.ceil(self.native_frames * self.sr / self.native_sr))
+        self.block_size = max(1, int(block_seconds * self.sr))
+
+    def _probe(self):
+        try:
+            import soundfile as sf
+            info = sf.info(self.filepath)
+            self.native_sr = info.samplerate
+            self.native_frames = info.frames if info.frames > 0 else None
+            self.backend = "soundfile"
+            return
+        except Exception:
+            pass
+
+        try:
+            self.native_sr, duration = _ffmpeg_probe(self.filepath)
+            if duration:
+                self.native_frames = int(np.ceil(duration * self.native_sr))
+            self.backend = "ffmpeg"
+            return
+        except Exception as e:
+            print(f"[ENGINE LOG] ffmpeg probe failed ({e}), falling back to librosa")
+
+        import librosa
+        self.backend = "librosa"
+        try:
+            self.native_sr = librosa.get_samplerate(self.filepath)
+            self.native_frames = int(np.ceil(librosa.get_duration(path=self.filepath) * self.native_sr))
+        except Exception:
+            self.native_frames = None
+
+    def __iter__(self):
+        if self.backend == "soundfile":
+            return self._resampled(self._blocks_soundfile())
+        if self.backend == "ffmpeg":
+            return self._resampled(self._blocks_ffmpeg())
+        return self._iter_librosa()
+
+    def _native_block(self):
+        return max(1, int(self.block_seconds * self.native_sr))
+
+    def _resampled(self, blocks):
+        """Remuestrea por bloques (mono, float32) de native_sr a sr."""
+        import soxr
+
+        resampler = None
+        if self.native_sr != self.sr:
+            resampler = soxr.ResampleStream(self.native_sr, self.sr, 1, dtype='float32',
+                                            quality=RESAMPLE_QUALITIES[self.quality] or "HQ")
+
+        for mono in blocks:
+            if resampler is not None:
+                mono = resampler.resample_chunk(mono, last=False)
+            if len(mono):
+                yield mono
+
+        if resampler is not None:
+            tail = resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True)
+            if len(tail):
+                yield tail
+
+    def _blocks_soundfile(self):
+        import soundfile as sf
+        with sf.SoundFile(self.filepath) as f:
+            for block in f.blocks(blocksize=self._native_block(), dtype='float32', always_2d=True):
+                yield _downmix(block)
+
+    def _blocks_ffmpeg(self):
+        import imageio_ffmpeg
+        # Mezcla a mono en ffmpeg, pero sin remuestrear: eso lo hace soxr con la calidad elegida
+        cmd = [imageio_ffmpeg.get_ffmpeg_exe(), "-v", "error", "-nostdin", "-i", self.filepath,
+               "-vn", "-ac", "1", "-ar", str(self.native_sr), "-f", "f32le", "-"]
+        block_bytes = self._native_block() * 4
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                creationflags=_NO_WINDOW)
+        try:
+            pending = b""
+            while True:
+                chunk = proc.stdout.read(block_bytes)
+                if not chunk:
+                    break
+                chunk = pending + chunk
+                usable = len(chunk) - len(chunk) % 4
+                pending = chunk[usable:]
+                if usable:
+                    yield np.frombuffer(chunk[:usable], dtype=np.float32)
+        finally:
+            # Si el consumidor deja de iterar (p. ej. análisis cancelado), cortar ffmpeg
+            if proc.poll() is None:
+                proc.kill()
+            proc.stdout.close()
+            proc.wait()
+
+    def _iter_librosa(self):
+        import librosa
+        y, _ = librosa.load(self.filepath, sr=self.sr)
+        for start in range(0, len(y), self.block_size):
+            yield y[start:start + self.block_size]
+
+
+def _downmix(block):
+    """Mezcla a mono un bloque (muestras, canales) en float32; mismo resultado que mean(axis=1)."""
+    # mean(axis=1) reduce fila a fila (dos valores por fila en estéreo) y en mp3 se
+    # llevaba más tiempo que la propia decodificación; sumar columnas es vectorial
+    mono = block[:, 0].copy()
+    for c in range(1, block.shape[1]):
+        mono += block[:, c]
+    if block.shape[1] > 1:
+        mono /= np.float32(block.shape[1])
+    return mono
+
+
+# En Windows, que ffmpeg no abra una consola por cada pista
+_NO_WINDOW = getattr(subprocess, "CREATE_NO_WINDOW", 0)
+
+
+def _ffmpeg_probe(filepath):
+    """Devuelve (frecuencia nativa, duración en segundos o None) leyendo la salida de `ffmpeg -i`."""
+    import imageio_ffmpeg
+    proc = subprocess.run([imageio_ffmpeg.get_ffmpeg_exe(), "-hide_banner", "-nostdin", "-i", filepath],
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, creationflags=_NO_WINDOW)
+    text = proc.stderr.decode("utf-8", errors="replace")
+
+    rate = re.search(r"Stream #.*?Audio:.*?(\d+) Hz", text)
+    if rate is None:
+        raise IOError(f"ffmpeg no encontró una pista de audio en {filepath}")
+    duration = None
+    m = re.search(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)", text)
+    if m:
+        duration = int(m.group(1)) * 3600 + int(m.group(2)) * 60 + float(m.group(3))
+    return int(rate.group(1)), duration
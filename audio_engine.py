@@ -1,35 +1,157 @@
 import pygame
-import librosa
 import numpy as np
-import threading
 import os
+from analysis_cache import AnalysisCache
+from analysis_scheduler import AnalysisScheduler
+from audio_analysis import normalize_db, fps_aligned_params
+from audio_features import FeatureStore, ContinuousTravel
+from playback_clock import PlaybackClock
+from live_input import LiveInput, FileCapture, PygameCapture
+from track_analyzer import TrackAnalyzer, AnalysisCancelled
+from subprocess_analyzer import SubprocessTrackAnalyzer, get_executor, shutdown_executor
+
+# Tamaño del buffer de salida del mezclador (muestras): fija la latencia de salida
+MIXER_BUFFER = 512
 
 class AudioEngine:
-    def __init__(self):
+    def __init__(self, cache_dir=None, cache_max_mb=2048):
         # Inicializar Pygame Mixer
-        pygame.mixer.init()
+        pygame.mixer.init(buffer=MIXER_BUFFER)
         
         self.current_file = None
-        self.y = None # Audio array
-        self.sr = None # Sample rate
-        self.duration = 0
         
-        # Datos de análisis
-        self.spec = None # Espectrograma
-        self.spec_db = None
+        # Análisis de la pista actual (ver TrackAnalyzer); los datos de análisis
+        # (spec_db, bands_db, ref_db, sr, duration...) se leen de aquí
+        self.analysis = None
+        
+        # Características bajo demanda de la pista actual (RMS, onsets, beats...;
+        # ver audio_features.FeatureStore y get_features)
+        self.features = None
+        
+        # Parámetros del análisis
+        self.target_sr = 22050 # Frecuencia de muestreo usada para el análisis
         self.hop_length = 512
         self.n_fft = 2048
+        self.n_bands = 64 # Bandas que devuelve get_audio_data
+        
+        # Almacenamiento compacto: el espectrograma se guarda como float16 o uint8
+        # (ver audio_analysis.encode_db) y no se conservan ni la STFT compleja ni
+        # el audio crudo, salvo que keep_raw_audio sea True
+        self.spec_dtype = "float16"
+        self.keep_raw_audio = False
+        
+        # Análisis progresivo: decodifica y transforma por bloques y marca la pista
+        # como lista en cuanto hay frames, sin esperar a procesar el archivo entero
+        self.streaming_analysis = True
+        
+        # Pistas más largas que esto (segundos) se analizan fuera de memoria: las
+        # tablas se escriben en archivos y se leen con memory-map, así la RAM usada
+        # no crece con la duración. None lo desactiva, 0 lo usa siempre.
+        self.out_of_core_seconds = 20 * 60
+        
+        # Analizar en un proceso aparte (ver SubprocessTrackAnalyzer): la
+        # decodificación y la STFT no compiten por el GIL con la UI. Las tablas
+        # llegan por memoria compartida, sin copiar arrays entre procesos.
+        self.analysis_in_subprocess = True
+        if self.analysis_in_subprocess:
+            get_executor() # Arrancar el proceso ya, así la primera pista no espera
+        
+        # Calidad del remuestreo a target_sr: "hq", "fast" o "native" (sin remuestrear,
+        # analizando a la frecuencia del archivo; ver audio_decode.RESAMPLE_QUALITIES)
+        self.resample_quality = "hq"
+        
+        # Suavizado ataque/liberación de las bandas (segundos), precalculado en el
+        # análisis para toda la pista: sigue siendo de acceso aleatorio por tiempo.
+        # None lo desactiva.
+        self.band_smoothing = (0.005, 0.12)
+        
+        # Hilos para transformar los trozos de la STFT en paralelo (None: uno por núcleo)
+        self.analysis_workers = None
+        
+        # Exportar con un análisis propio cuyo hop sale del FPS del video, así cada
+        # frame de video lee exactamente una columna precalculada (ver analysis_for_fps)
+        self.export_aligned_hop = True
+        
+        # Vista previa: interpolar linealmente entre los dos frames de análisis
+        # vecinos en vez de repetir el anterior (get_audio_data/get_audio_frames)
+        self.preview_interpolation = False
+        
+        # Caché persistente del análisis (None si no se pudo crear)
+        try:
+            self.cache = AnalysisCache(cache_dir, max_size_mb=cache_max_mb)
+        except Exception as e:
+            print(f"[ENGINE LOG] Analysis cache disabled: {e}")
+            self.cache = None
         
         # Estado
         self.is_loaded = False
         self.is_playing = False
         self.is_paused = False # [NEW] Nuevo estado para saber si estamos pausados
-        self.loading_thread = None
+        
+        # Reloj de reproducción (ver get_audio_time). Su latency es el retardo
+        # entre lo que entrega el mezclador y lo que suena; por defecto un buffer.
+        # clock.error mide la deriva frente al mezclador.
+        freq = (pygame.mixer.get_init() or (44100,))[0]
+        self.clock = PlaybackClock(latency=MIXER_BUFFER / freq)
+        self._play_offset = 0.0 # Posición de pista del último play() (get_pos cuenta desde ahí)
+        self._start_position = None # Salto pedido en pausa/parado: se aplica al reproducir
+        
+        # Lista de reproducción: con playlist_mode, la pista que sigue a la actual
+        # en playlist se encola en el mezclador (sin silencio entre pistas) y se
+        # pre-analiza en segundo plano; al llegar al final se cambia de tablas de
+        # análisis sin pasar por el estado "sin pista". on_track_change recibe la
+        # ruta de la nueva pista.
+        self.playlist = []
+        self.playlist_mode = False
+        self.on_track_change = None
+        self._queued_path = None # Pista que el mezclador tiene encolada
+        self._next = None # (ruta, analizador) pre-análisis de la pista siguiente
+        self._next_submitted = False
+        self._last_mixer_ms = None # Última lectura de get_pos (para detectar el cambio de pista)
+        
+        # Entrada en vivo (ver start_live_input): mientras está activa, los
+        # visualizadores leen de ella en vez de la pista cargada
+        self.live = None
+        
+        # "travel" de la vista previa sin saltos al llegar la característica o
+        # cambiar de pista (ver get_features)
+        self._travel = ContinuousTravel()
+        
+        # Un solo análisis a la vez: cambiar de pista cancela el anterior
+        self.scheduler = AnalysisScheduler()
+
+    # Accesos directos a los resultados del análisis actual
+    @property
+    def sr(self):
+        return self.analysis.sr if self.analysis else None
+
+    @property
+    def duration(self):
+        return self.analysis.duration if self.analysis else 0
+
+    @property
+    def spec_db(self):
+        return self.analysis.spec_db if self.analysis else None
+
+    @property
+    def bands_db(self):
+        return self.analysis.bands_db if self.analysis else None
+
+    def analysis_settings(self):
+        """Parámetros actuales del análisis, como kwargs para TrackAnalyzer."""
+        return {
+            "sr": self.target_sr, "n_fft": self.n_fft, "hop_length": self.hop_length,
+            "n_bands": self.n_bands, "spec_dtype": self.spec_dtype,
+            "streaming": self.streaming_analysis, "out_of_core_seconds": self.out_of_core_seconds,
+            "keep_raw_audio": self.keep_raw_audio, "resample_quality": self.resample_quality,
+            "analysis_workers": self.analysis_workers, "band_smoothing": self.band_smoothing,
+        }
 
     def load_track(self, filepath, callback_ready=None):
         """
         Carga el audio para reproducción (Pygame) y análisis (Librosa).
-        El análisis pesado se hace en un hilo separado.
+        El análisis pesado se hace en segundo plano (ver AnalysisScheduler):
+        si llega otra pista antes de terminar, este análisis se cancela.
         """
         if not os.path.exists(filepath):
             print(f"Error: Archivo no encontrado {filepath}")
@@ -39,56 +161,224 @@ class AudioEngine:
         self.audio_file = filepath # Alias para compatibilidad
         self.is_loaded = False
         self.is_paused = False # Resetear estado
+        self.clock.stop()
+        self._start_position = None
+        self._drop_next()
+        self._queued_path = None # music.load vacía la cola del mezclador
         print(f"[ENGINE LOG] Loading track: {filepath}")
         
+        # Soltar los arrays de la pista anterior antes de analizar la siguiente
+        if self.analysis is not None:
+            self.analysis.release()
+        self.analysis = self._new_analyzer(filepath)
+        self.features = FeatureStore(self.analysis, self.cache)
+        
         # Cargar en Mixer (Rápido, para reproducción inmediata si se requiere)
         try:
             pygame.mixer.music.load(filepath)
         except Exception as e:
             print(f"Error cargando mixer: {e}")
 
-        # Iniciar análisis en background
-        self.loading_thread = threading.Thread(target=self._analyze_audio, args=(filepath, callback_ready))
-        self.loading_thread.start()
+        # Iniciar análisis en background (reemplaza al de la pista anterior)
+        self.scheduler.submit(self.analysis, on_ready=self._make_on_ready(self.analysis, callback_ready))
+
+    def _new_analyzer(self, filepath):
+        analyzer_cls = SubprocessTrackAnalyzer if self.analysis_in_subprocess else TrackAnalyzer
+        return analyzer_cls(filepath, cache=self.cache, **self.analysis_settings())
 
-    def _analyze_audio(self, filepath, callback):
-        print("Iniciando análisis de audio con Librosa...")
+    # --- Lista de reproducción ---
+    def set_playlist(self, files):
+        """Fija el orden de reproducción (rutas); la pista actual sigue sonando."""
+        self.playlist = list(files)
+        if self.is_playing or self.is_paused:
+            self._queue_next()
+
+    def _next_file(self):
+        if not self.playlist_mode or self.current_file not in self.playlist:
+            return None
+        index = self.playlist.index(self.current_file) + 1
+        return self.playlist[index] if index < len(self.playlist) else None
+
+    def _queue_next(self):
+        """
+        Encola en el mezclador la pista siguiente y prepara su análisis (ver
+        _update_playlist). El mezclador no permite quitar una pista encolada: si
+        se desactiva la lista, la que ya estaba encolada todavía suena.
+        """
+        path = self._next_file()
+        if path is None:
+            return
+        if self._next is None or self._next[0] != path:
+            self._drop_next()
+            self._next = (path, self._new_analyzer(path))
+            self._next_submitted = False
         try:
-            # 1. Cargar audio (puede tardar unos segundos en archivos largos)
-            self.y, self.sr = librosa.load(filepath, sr=22050)
-            self.duration = librosa.get_duration(y=self.y, sr=self.sr)
-            
-            # 2. Calcular STFT (Short-Time Fourier Transform)
-            # Esto nos da la magnitud de frecuencias a lo largo del tiempo
-            self.spec = librosa.stft(self.y, n_fft=self.n_fft, hop_length=self.hop_length)
-            
-            # 3. Convertir a escala de decibelios (dB) para mejor visualización
-            # Solo usamos la parte de magnitud (abs)
-            self.spec_db = librosa.amplitude_to_db(np.abs(self.spec), ref=np.max)
-            
-            # Normalizar entre 0 y 1 para facilitar el dibujo
-            self.spec_db = (self.spec_db + 80) / 80
-            self.spec_db = np.clip(self.spec_db, 0, 1)
-            
+            pygame.mixer.music.queue(path)
+            self._queued_path = path
+        except pygame.error as e:
+            print(f"[ENGINE ERROR] Could not queue next track: {e}")
+
+    def _drop_next(self):
+        if self._next is not None:
+            if self._next_submitted:
+                self.scheduler.cancel_prefetch()
+            self._next[1].release()
+            self._next = None
+
+    def _update_playlist(self, mixer_ms):
+        """Se llama en cada lectura del reloj: lanza el pre-análisis y detecta el cambio de pista."""
+        # Pre-analizar la siguiente solo cuando la actual ya terminó (no compiten)
+        if (self._next is not None and not self._next_submitted
+                and self.analysis is not None and self.analysis.done.is_set()):
+            self.scheduler.prefetch(self._next[1])
+            self._next_submitted = True
+        # El mezclador pasa solo a la pista encolada y get_pos vuelve a contar desde 0
+        last, self._last_mixer_ms = self._last_mixer_ms, mixer_ms
+        if self._queued_path is not None and last is not None and mixer_ms < last - 500:
+            self._advance_playlist(mixer_ms / 1000.0)
+            return True
+        return False
+
+    def _advance_playlist(self, position):
+        """Pasa a la pista encolada, que el mezclador ya está reproduciendo."""
+        path, self._queued_path = self._queued_path, None
+        analysis = None
+        if self._next is not None and self._next[0] == path:
+            analysis = self._next[1]
+            self._next = None
+        if analysis is None or not self._next_submitted or analysis.error is not None \
+                or (analysis.done.is_set() and analysis.bands_db is None):
+            # Sin pre-análisis (o se descartó): analizarla ya, como pista actual
+            if analysis is None or analysis.done.is_set():
+                analysis = self._new_analyzer(path)
+            self.scheduler.submit(analysis)
+
+        # Un solo cambio de referencia: los lectores ven las tablas viejas o las
+        # nuevas, y is_loaded no pasa por False (nada de ruido de relleno)
+        old = self.analysis
+        self.analysis = analysis
+        self.features = FeatureStore(analysis, self.cache)
+        self.current_file = self.audio_file = path
+        self._play_offset = 0.0
+        self.clock.start(position)
+        if old is not None:
+            old.release()
+        print(f"[ENGINE LOG] Gapless transition to {os.path.basename(path)} "
+              f"({'pre-analyzed' if analysis.done.is_set() else 'analyzing'})")
+        self._queue_next()
+        if self.on_track_change:
+            self.on_track_change(path)
+
+    def _make_on_ready(self, analysis, callback):
+        def on_ready():
+            # Solo publicar si esta sigue siendo la pista actual
+            if analysis is not self.analysis:
+                return
             self.is_loaded = True
-            print(f"[ENGINE LOG] Analysis completed. is_loaded={self.is_loaded}")
-            
+            print(f"[ENGINE LOG] Track ready. is_loaded={self.is_loaded}")
             if callback:
                 callback()
-                
-        except Exception as e:
-            print(f"Error en análisis Librosa: {e}")
+        return on_ready
+
+    def shutdown(self):
+        """Corta el análisis en curso y cierra el proceso de análisis."""
+        self.stop_live_input()
+        self._drop_next()
+        self.scheduler.cancel()
+        if self.analysis is not None:
+            self.analysis.release()
+        shutdown_executor()
+
+    def start_live_input(self, source=None):
+        """
+        Visualiza audio en vivo en vez de la pista. source es el nombre de un
+        dispositivo de captura (None: el predeterminado) o la ruta de un archivo
+        de audio, que se entrega en tiempo real como si llegara de la tarjeta
+        (para pruebas). Las bandas salen con la misma distribución que en modo archivo.
+        """
+        self.stop_live_input()
+        capture = FileCapture(source) if source and os.path.isfile(source) else PygameCapture(source)
+        live = LiveInput(capture, target_sr=self.target_sr, n_fft=self.n_fft, n_bands=self.n_bands,
+                         band_smoothing=self.band_smoothing)
+        live.start()
+        self.live = live
+        print(f"[ENGINE LOG] Live input started ({type(capture).__name__}, {live.sr} Hz)")
+
+    def stop_live_input(self):
+        if self.live is not None:
+            self.live.stop()
+            self.live = None
+            print("[ENGINE LOG] Live input stopped")
+
+    def snapshot(self, analysis=None, should_cancel=None):
+        """
+        TrackAnalysis inmutable del análisis `analysis` (por defecto el de la
+        pista actual), para exportar sin depender del estado del motor: la UI
+        puede seguir cambiando de pista. Espera a que el análisis termine; si se
+        canceló (p. ej. se cambió de pista antes), analiza el archivo aquí
+        (suele salir de la caché). None si no hay pista.
+        """
+        analysis = analysis or self.analysis
+        if analysis is None:
+            return None
+        try:
+            return analysis.snapshot()
+        except AnalysisCancelled:
+            settings = self.analysis_settings()
+            settings.update(keep_raw_audio=False)
+            return self._run_private(analysis.filepath, settings, should_cancel)
+
+    def _run_private(self, filepath, settings, should_cancel):
+        # Análisis propio (fuera del scheduler) del que solo queda la instantánea
+        analyzer = TrackAnalyzer(filepath, cache=self.cache, **settings)
+        try:
+            analyzer.run(should_cancel=should_cancel)
+            return analyzer.snapshot()
+        finally:
+            analyzer.release()
+
+    def analysis_for_fps(self, fps, source=None, should_cancel=None):
+        """
+        TrackAnalysis de la pista de `source` (un TrackAnalyzer o TrackAnalysis;
+        por defecto la actual) con hop alineado a `fps` (ver fps_aligned_params),
+        para exportar: el frame de video i es la fila i de bands_db. Si el
+        análisis de origen ya está alineado se usa ese; si no, se calcula aquí
+        (bloquea, pero suele salir de la caché a partir de la segunda exportación).
+        """
+        source = source or self.analysis
+        if source is None:
+            return None
+        sr, hop_length = fps_aligned_params(fps, self.target_sr)
+        if source.sr == sr and source.hop_length == hop_length:
+            try:
+                return source.snapshot()
+            except AnalysisCancelled:
+                pass
+
+        settings = self.analysis_settings()
+        settings.update(sr=sr, hop_length=hop_length, keep_raw_audio=False,
+                        resample_quality="fast" if self.resample_quality == "fast" else "hq")
+        print(f"[ENGINE LOG] Analyzing for export: {fps} FPS -> hop {hop_length} @ {sr} Hz")
+        return self._run_private(source.filepath, settings, should_cancel)
+
+    def wait_for_analysis(self, timeout=None):
+        """Bloquea hasta que el análisis de la pista actual termine por completo."""
+        if self.analysis is None:
+            return False
+        return self.analysis.done.wait(timeout)
 
     def play(self):
         print(f"[ENGINE LOG] Attempting play... current_file={self.current_file}, is_paused={self.is_paused}")
         if self.current_file:
             try:
-                if self.is_paused:
+                if self.is_paused and self._start_position is None:
                     print("[ENGINE LOG] Calling unpause()...")
                     pygame.mixer.music.unpause()
+                    self.clock.resume()
                 else:
                     print("[ENGINE LOG] Calling play()...")
-                    pygame.mixer.music.play()
+                    self._start_mixer(self._start_position or 0.0)
+                    self._start_position = None
                 
                 self.is_playing = True
                 self.is_paused = False
@@ -96,59 +386,164 @@ class AudioEngine:
             except Exception as e:
                 print(f"[ENGINE ERROR] Error in play(): {e}")
 
+    def _start_mixer(self, position):
+        """Arranca el mezclador en `position` (segundos) y rebasa el reloj ahí."""
+        pygame.mixer.music.play(start=position)
+        self._play_offset = position
+        self._last_mixer_ms = None
+        self.clock.start(position)
+        self._queue_next() # Tras stop() la cola del mezclador está vacía
+
+    def seek(self, t):
+        """
+        Salta a t (segundos). Sonando, rearranca el mezclador en esa posición; en
+        pausa o parado, el salto se aplica al reproducir. El reloj se rebasa al
+        momento, y como el análisis ya está precalculado (y es de acceso aleatorio)
+        el visualizador se resincroniza en el siguiente frame sin recalcular nada.
+        """
+        if not self.current_file:
+            return
+        t = max(float(t), 0.0)
+        if self.duration:
+            t = min(t, self.duration)
+        if self.is_playing:
+            try:
+                self._start_mixer(t)
+            except pygame.error as e:
+                print(f"[ENGINE ERROR] Seek failed: {e}")
+        else:
+            self._start_position = t
+            self.clock.seek(t)
+
     def pause(self):
         pygame.mixer.music.pause()
+        self.clock.pause()
         self.is_playing = False
         self.is_paused = True # Marcar como pausado
 
     def unpause(self):
-        pygame.mixer.music.unpause()
+        if self._start_position is not None:
+            self._start_mixer(self._start_position)
+            self._start_position = None
+        else:
+            pygame.mixer.music.unpause()
+            self.clock.resume()
         self.is_playing = True
         self.is_paused = False
         
     def stop(self):
         pygame.mixer.music.stop()
+        self.clock.stop()
+        self._start_position = None
+        self._queued_path = None
         self.is_playing = False
         self.is_paused = False
 
     def get_audio_time(self):
-        """Devuelve el tiempo actual de reproducción en segundos."""
+        """
+        Devuelve el tiempo actual de reproducción en segundos (también en pausa).
+        Sale del reloj de alta resolución, corregido con la posición del mezclador
+        y con la latencia de salida descontada (ver PlaybackClock).
+        """
         if self.is_playing:
-            # get_pos devuelve ms, convertimos a segundos
-            return pygame.mixer.music.get_pos() / 1000.0
-        return 0
+            # get_pos devuelve ms desde el último play(); -1 si no hay música sonando
+            pos = pygame.mixer.music.get_pos()
+            if pos >= 0 and not self._update_playlist(pos):
+                self.clock.sync(self._play_offset + pos / 1000.0)
+        t = self.clock.time()
+        return min(t, self.duration) if self.duration else t
 
     def get_audio_data(self, t=None):
         """
-        Devuelve el array de frecuencias correspondiente al instante actual o al tiempo t.
+        Devuelve las bandas de frecuencia (escala logarítmica, valores 0-1)
+        correspondientes al instante actual o al tiempo t.
         Si no hay audio cargado o analizado, devuelve ruido o ceros.
         """
-        if not self.is_loaded or self.spec_db is None:
+        if self.live is not None:
+            return self.live.bands()
+        a = self.analysis
+        if not self.is_loaded or a is None:
             # Devolver dummy data (pequeño ruido suave) para que no se vea muerto
             return np.random.rand(50) * 0.1
+        if a.bands_db is None:
+            # Pista siguiente de la lista aún sin frames: silencio, no ruido
+            return np.zeros(self.n_bands)
 
         # 1. Obtener tiempo (si no se pasa t, usamos tiempo real de playback)
         if t is None:
             t = self.get_audio_time()
+        if self.preview_interpolation:
+            return self.get_audio_frames([t], interpolate=True)[0]
         
-        # 2. Calcular índice del frame correspondiente en el espectrograma
-        frame_index = librosa.time_to_frames(t, sr=self.sr, hop_length=self.hop_length)
+        # 2. Índice del frame: cálculo directo, sin pasar por librosa en cada llamada
+        frame_index = int(max(t, 0) * a.sr / a.hop_length)
         
-        # 3. Extraer columna segura
-        if frame_index < self.spec_db.shape[1]:
-            # Obtenemos todas las frecuencias de este instante
-            # Reducimos/Promediamos para tener menos barras (ej. 64 barras)
-            full_spectrum = self.spec_db[:, int(frame_index)]
-            
-            # Remuestrear simple para obtener 64 bandas
-            # Tomamos frecuencias bajas a medias principalmente (indices 0 a 100 del FFT suelen ser graves/medios)
-            bands = 64
-            # Usamos lógica simple de rebanado por ahora
-            step = len(full_spectrum) // bands
-            if step == 0: step = 1
-            simplified_spectrum = full_spectrum[::step][:bands]
-            
-            return simplified_spectrum
+        # 3. Leer la fila precalculada (solo frames ya analizados)
+        if frame_index < a.frames_ready:
+            return normalize_db(a.display_bands[frame_index], a.ref_db)
             
-        return np.zeros(64)
+        return np.zeros(a.n_bands)
+
+    def get_features(self, names, t=None):
+        """
+        Valores de las características pedidas (ver audio_features.FEATURES) en el
+        instante actual o en t, como dict nombre -> valor. La primera vez que se
+        pide una característica se calcula en segundo plano; mientras tanto vale 0.
+        "travel" siempre tiene valor, continuo (ver audio_features.ContinuousTravel).
+        """
+        a = self.analysis
+        result = {}
+        if names and self.is_loaded and a is not None and self.features is not None and self.live is None:
+            if t is None:
+                t = self.get_audio_time()
+            self.features.request(names)
+            result = self.features.values(names, max(t, 0) * a.sr / a.hop_length)
+        if names and "travel" in names:
+            result["travel"] = self._travel(result.get("travel"), self.features)
+        return result
+
+    def get_waveform(self, width, seconds, t=None):
+        """
+        Forma de onda real alrededor del instante actual (o de t): ventana de
+        `seconds` segundos en `width` columnas, como (mínimos, máximos) en [-1, 1].
+        Se lee de la pirámide min/max (ver waveform.WaveformPyramid); None si aún no hay.
+        Con la entrada en vivo, los últimos `seconds` segundos capturados.
+        """
+        if self.live is not None:
+            return self.live.waveform(seconds, width)
+        a = self.analysis
+        if not self.is_loaded or a is None or a.waveform is None:
+            return None
+        if t is None:
+            t = self.get_audio_time()
+        return a.waveform.window(t, seconds, width)
+
+    def get_audio_frames(self, times, interpolate=None):
+        """
+        Versión vectorizada de get_audio_data para muchos instantes a la vez.
+        Devuelve un bloque contiguo float32 de forma (len(times), n_bands);
+        los instantes fuera de la pista o aún sin analizar quedan en cero.
+        Con interpolate (por defecto preview_interpolation) mezcla linealmente
+        los dos frames de análisis que rodean cada instante.
+        """
+        a = self.analysis
+        times = np.asarray(times, dtype=np.float64)
+        if not self.is_loaded or a is None or a.bands_db is None:
+            return np.zeros((len(times), self.n_bands), dtype=np.float32)
+        if interpolate is None:
+            interpolate = self.preview_interpolation
+
+        frames = np.zeros((len(times), a.n_bands), dtype=np.float32)
+        position = np.maximum(times, 0) * a.sr / a.hop_length
+        frame_index = position.astype(np.int64)
+        valid = frame_index < a.frames_ready
+        idx = frame_index[valid]
+        bands = a.display_bands
+        frames[valid] = normalize_db(bands[idx], a.ref_db)
+        if interpolate and len(idx):
+            # El frame siguiente (o el mismo, en el último frame disponible)
+            nxt = normalize_db(bands[np.minimum(idx + 1, a.frames_ready - 1)], a.ref_db)
+            frac = (position[valid] - idx).astype(np.float32)[:, None]
+            frames[valid] += frac * (nxt - frames[valid])
+        return frames
 
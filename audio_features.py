@@ -0,0 +1,243 @@
+import threading
+import time
+import numpy as np
+import librosa
+from audio_analysis import decode_db, normalize_db
+
+# Subir este número si cambia cómo se calcula alguna característica
+FEATURES_VERSION = 1
+
+# Frames por trozo al recorrer el espectrograma (acota la memoria en pistas largas)
+_CHUNK_FRAMES = 4096
+
+# Movimiento de "travel" (el de Cosmic Particles): avanza a
+# 1 + TRAVEL_BASS * bajo + TRAVEL_ONSET * ataque unidades por frame a TRAVEL_FPS,
+# con el bajo como media de las TRAVEL_BASS_BANDS primeras bandas
+TRAVEL_FPS = 60
+TRAVEL_BASS = 50
+TRAVEL_ONSET = 30
+TRAVEL_BASS_BANDS = 5
+
+
+def _magnitude_chunks(analysis):
+    """Recorre spec_db por trozos: (inicio, magnitudes (frames, bins) float32)."""
+    spec = analysis.spec_db
+    for start in range(0, analysis.frames_ready, _CHUNK_FRAMES):
+        stop = min(start + _CHUNK_FRAMES, analysis.frames_ready)
+        yield start, np.power(np.float32(10.0), decode_db(spec[start:stop]) / np.float32(20.0))
+
+
+def _normalized(values):
+    peak = values.max() if len(values) else 0
+    return (values / peak).astype(np.float32) if peak > 0 else values.astype(np.float32)
+
+
+def _rms(store):
+    """Energía RMS por frame (igual que librosa.feature.rms con S), escalada a [0, 1]."""
+    a = store.analysis
+    out = np.zeros(a.frames_ready, dtype=np.float32)
+    for start, mag in _magnitude_chunks(a):
+        power = np.square(mag)
+        total = 2.0 * power.sum(axis=1) - power[:, 0]
+        if a.n_fft % 2 == 0:
+            total -= power[:, -1]
+        out[start:start + len(mag)] = np.sqrt(np.maximum(total, 0)) / a.n_fft
+    return _normalized(out)
+
+
+def _onset(store):
+    """Flujo espectral positivo sobre las bandas en dB, escalado a [0, 1]."""
+    bands = np.asarray(store.analysis.bands_db[:store.analysis.frames_ready], dtype=np.float32)
+    flux = np.zeros(len(bands), dtype=np.float32)
+    if len(bands) > 1:
+        flux[1:] = np.maximum(np.diff(bands, axis=0), 0).mean(axis=1)
+    return _normalized(flux)
+
+
+def _beat_phase(store):
+    """
+    Fase dentro del pulso: 0 justo en cada beat, creciendo hasta ~1 antes del
+    siguiente. Los beats salen de librosa.beat.beat_track sobre la envolvente de onset.
+    """
+    a = store.analysis
+    onset = store.get("onset")
+    _, beats = librosa.beat.beat_track(onset_envelope=onset, sr=a.sr, hop_length=a.hop_length)
+    frames = np.arange(a.frames_ready)
+    if len(beats) < 2:
+        return np.zeros(a.frames_ready, dtype=np.float32)
+
+    period = np.median(np.diff(beats))
+    # Extender la rejilla de beats a ambos lados con el periodo mediano
+    grid = np.concatenate(([beats[0] - period], beats, [beats[-1] + period]))
+    idx = np.clip(np.searchsorted(grid, frames, side='right') - 1, 0, len(grid) - 2)
+    span = grid[idx + 1] - grid[idx]
+    phase = (frames - grid[idx]) / span
+    return np.mod(phase, 1.0).astype(np.float32)
+
+
+def _centroid(store):
+    """Centroide espectral por frame, como fracción de la frecuencia de Nyquist."""
+    a = store.analysis
+    freqs = np.linspace(0, 1, a.n_fft // 2 + 1, dtype=np.float32)
+    out = np.zeros(a.frames_ready, dtype=np.float32)
+    for start, mag in _magnitude_chunks(a):
+        total = mag.sum(axis=1)
+        out[start:start + len(mag)] = np.where(total > 0, (mag @ freqs) / np.maximum(total, 1e-10), 0)
+    return out
+
+
+def _chroma(store):
+    """Cromagrama (frames, 12) normalizado por frame (norma infinito, como librosa)."""
+    a = store.analysis
+    fb = librosa.filters.chroma(sr=a.sr, n_fft=a.n_fft).T.astype(np.float32)
+    out = np.zeros((a.frames_ready, 12), dtype=np.float32)
+    for start, mag in _magnitude_chunks(a):
+        chroma = np.square(mag) @ fb
+        peak = chroma.max(axis=1, keepdims=True)
+        out[start:start + len(mag)] = np.where(peak > 0, chroma / np.maximum(peak, 1e-10), 0)
+    return out
+
+
+def _travel(store):
+    """
+    Avance acumulado, al inicio de cada frame, de un movimiento que acelera con
+    el bajo y con los ataques (ver TRAVEL_*). Es la integral de su velocidad
+    sobre la pista, así que la posición en cualquier instante sale directamente,
+    sin simular frame a frame: da igual en qué orden o a qué ritmo se pida.
+    """
+    a = store.analysis
+    bands = np.asarray(a.display_bands[:a.frames_ready, :TRAVEL_BASS_BANDS])
+    bass = normalize_db(bands, a.ref_db).mean(axis=1)
+    speed = 1 + TRAVEL_BASS * bass + TRAVEL_ONSET * store.get("onset")
+    travel = np.zeros(a.frames_ready, dtype=np.float64)
+    np.cumsum(speed[:-1] * (TRAVEL_FPS * a.hop_length / a.sr), out=travel[1:])
+    return travel
+
+
+class ContinuousTravel:
+    """
+    "travel" sin saltos para la vista previa. Sin la característica (entrada en
+    vivo, sin pista o aún calculándose) avanza a velocidad base con el reloj
+    (una unidad por frame a TRAVEL_FPS). Cuando cambia la fuente (llega la
+    característica, cambia la pista o se pierde) se fija un desfase para seguir
+    desde el último valor; dentro de una misma fuente se siguen sus saltos
+    (p. ej. al buscar en la pista).
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.offset = 0.0
+        self._source = None
+        self._last = None
+
+    def __call__(self, travel, source=None):
+        """Valor a dibujar: `travel` de `source` (p. ej. su FeatureStore), o None si no lo hay."""
+        if travel is None:
+            travel, source = self.clock() * TRAVEL_FPS, None
+        if self._last is None:
+            self.offset = -travel # Empieza en 0
+        elif source is not self._source:
+            self.offset = self._last - travel
+        self._source = source
+        self._last = travel + self.offset
+        return self._last
+
+
+# Nombre -> (función, valor por defecto mientras no esté calculada)
+FEATURES = {
+    "rms": (_rms, 0.0),
+    "onset": (_onset, 0.0),
+    "beat_phase": (_beat_phase, 0.0),
+    "centroid": (_centroid, 0.0),
+    "chroma": (_chroma, np.zeros(12, dtype=np.float32)),
+    "travel": (_travel, None),
+}
+
+# Características continuas: entre dos frames se interpolan linealmente
+INTERPOLATED = ("travel",)
+
+
+class FeatureStore:
+    """
+    Características por frame de una pista (ver FEATURES), calculadas bajo demanda.
+
+    Cada característica se calcula una sola vez, sobre la pista entera y de forma
+    vectorizada, cuando alguien la pide; se guarda junto al espectrograma en la
+    caché de análisis. Lo que nadie pide no se calcula. Hace falta que el
+    análisis haya terminado: hasta entonces se devuelven valores por defecto.
+    """
+
+    def __init__(self, analysis, cache=None):
+        self.analysis = analysis
+        self.cache = cache
+        self._features = {}
+        self._lock = threading.RLock() # beat_phase pide onset desde dentro de get
+        self._requested = set()
+
+    def get(self, name):
+        """Devuelve el array de la característica, calculándolo si hace falta (bloquea)."""
+        if name not in FEATURES:
+            raise KeyError(f"Característica desconocida: {name}")
+        with self._lock:
+            if name in self._features:
+                return self._features[name]
+            values = self._load_cached(name)
+            if values is None:
+                values = FEATURES[name][0](self)
+                self._store_cached(name, values)
+            self._features[name] = values
+            return values
+
+    def request(self, names):
+        """Calcula en segundo plano las características aún no disponibles."""
+        missing = [n for n in names if n not in self._requested]
+        if not missing:
+            return
+        self._requested.update(missing)
+        threading.Thread(target=self._compute, args=(missing,), daemon=True).start()
+
+    def _compute(self, names):
+        self.analysis.done.wait()
+        if self.analysis.error is not None:
+            return
+        for name in names:
+            try:
+                self.get(name)
+            except Exception as e:
+                print(f"[ENGINE LOG] Could not compute feature '{name}': {e}")
+
+    def values(self, names, position, wait=False):
+        """
+        Valor de cada característica en un frame, como dict nombre -> valor.
+        `position` puede ser fraccionaria: las de INTERPOLATED se interpolan
+        entre los dos frames que la rodean y el resto toman el frame entero.
+        Sin wait, las que aún no están listas valen su valor por defecto.
+        """
+        if wait:
+            self.analysis.done.wait()
+        frame_index = int(position)
+        result = {}
+        for name in names:
+            values = self._features.get(name)
+            if values is None and wait and self.analysis.error is None:
+                values = self.get(name)
+            if values is not None and 0 <= frame_index < len(values):
+                result[name] = values[frame_index]
+                if name in INTERPOLATED and frame_index + 1 < len(values):
+                    result[name] += (position - frame_index) * (values[frame_index + 1] - values[frame_index])
+            else:
+                result[name] = FEATURES[name][1]
+        return result
+
+    # --- Caché ---
+    def _cache_name(self, name):
+        return f"feature_{name}_v{FEATURES_VERSION}"
+
+    def _load_cached(self, name):
+        if self.cache is None:
+            return None
+        return self.cache.load_array(self.analysis.cache_key(), self._cache_name(name))
+
+    def _store_cached(self, name, values):
+        if self.cache is not None:
+            self.cache.store_array(self.analysis.cache_key(), self._cache_name(name), values)
@@ -34,6 +34,10 @@ class ConfigManager:
         return {
             "random_pool": [],
             "last_music_folder": "",
+            "analysis_cache_dir": "",
+            "analysis_cache_max_mb": 2048,
+            "preanalysis_workers": 2,
+            "particle_count": 200,
             "export_settings": {
                 "resolution": "1920x1080 (HD)",
                 "fps": 60,
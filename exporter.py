@@ -2,7 +2,10 @@ from moviepy import VideoClip, AudioFileClip
 from proglog import ProgressBarLogger
 import numpy as np
 import visualizer
+import raster
 import os
+from audio_analysis import normalize_db
+from audio_features import FeatureStore
 
 class CancellableProgressBarLogger(ProgressBarLogger):
     def __init__(self, progress_callback, cancel_check_func):
@@ -19,23 +22,83 @@ class CancellableProgressBarLogger(ProgressBarLogger):
             percentage = (value / self.bars[bar]['total']) * 100
             self.progress_notifier(percentage)
 
-def render_video(audio_engine, output_filepath, width, height, fps, viz_mode, progress_callback=None, cancel_check_func=None, draw_func=None, use_random=False, random_pool=None):
+class AudioPrefetcher:
+    """
+    Lee del análisis (un TrackAnalysis inmutable) los datos de bandas por
+    segmentos de frames, en una sola operación vectorizada, en lugar de una
+    lectura por frame.
+    Con un análisis alineado al FPS (AudioEngine.analysis_for_fps) el frame de
+    video i es directamente la fila i de bands_db: sin buscar ni remuestrear.
+    """
+    def __init__(self, analysis, fps, segment_frames=1024):
+        self.analysis = analysis
+        self.fps = fps
+        self.segment_frames = segment_frames
+        self.aligned = analysis.sr == analysis.hop_length * fps
+        self.segment_start = None
+        self.segment = None
+
+    def position(self, t):
+        """Posición (fraccionaria) del instante t en el análisis."""
+        if self.aligned:
+            return float(round(t * self.fps))
+        return t * self.analysis.sr / self.analysis.hop_length
+
+    def get(self, t):
+        frame = int(round(t * self.fps))
+        if self.segment is None or not (self.segment_start <= frame < self.segment_start + len(self.segment)):
+            self.segment_start = frame
+            self.segment = self._fetch(frame)
+        return self.segment[frame - self.segment_start]
+
+    def _fetch(self, frame):
+        a = self.analysis
+        rows = np.zeros((self.segment_frames, a.n_bands), dtype=np.float32)
+        if self.aligned:
+            stop = min(frame + self.segment_frames, a.frames_ready)
+            if stop > frame:
+                rows[:stop - frame] = normalize_db(a.display_bands[frame:stop], a.ref_db)
+            return rows
+
+        times = np.arange(frame, frame + self.segment_frames) / self.fps
+        index = (np.maximum(times, 0) * a.sr / a.hop_length).astype(np.int64)
+        valid = index < a.frames_ready
+        rows[valid] = normalize_db(a.display_bands[index[valid]], a.ref_db)
+        return rows
+
+def render_video(audio_engine, output_filepath, width, height, fps, viz_mode, progress_callback=None, cancel_check_func=None, draw_func=None, use_random=False, random_pool=None, analysis=None):
     """
     Renderiza el video usando moviepy.
     Si use_random=True, cambia automáticamente de visualizador cada 5-10 segundos.
+    analysis es el análisis de la pista a exportar (por defecto la actual del
+    motor): se toma de él una instantánea inmutable (TrackAnalysis) y a partir
+    de ahí no se lee nada del motor, así que la UI puede seguir cambiando de
+    pista y reproduciendo, y se pueden exportar varias pistas a la vez.
     """
-    if not audio_engine.is_loaded or not audio_engine.current_file:
+    source = analysis or audio_engine.analysis
+    if source is None:
         print("Error: No audio loaded to export.")
         return
 
-    # Usar function de dibujo personalizada o la por defecto
-    current_draw_func = draw_func or visualizer.draw_frame
+    # Usar function de dibujo personalizada o la por defecto. Dibujan en un
+    # buffer del pool (ver visualizer.render_frame) que va tal cual al encoder
+    current_draw_func = draw_func or visualizer.render_frame
+    frame_pool = raster.FramePool(width, height)
 
     print(f"Iniciando render: {width}x{height} @ {fps}FPS. Mode: {viz_mode}")
     if use_random:
         print(f"[EXPORT] AUTO RANDOM activado con pool de {len(random_pool) if random_pool else 0} visualizadores")
     
-    duration = audio_engine.duration
+    # Con el análisis progresivo la pista se puede reproducir antes de que termine
+    # el análisis; para exportar necesitamos todos los frames y la duración exacta
+    # (la instantánea espera a que termine)
+    if audio_engine.export_aligned_hop:
+        track = audio_engine.analysis_for_fps(fps, source, should_cancel=cancel_check_func)
+    else:
+        track = audio_engine.snapshot(source, should_cancel=cancel_check_func)
+    duration = track.duration
+    audio_frames = AudioPrefetcher(track, fps)
+    feature_store = FeatureStore(track, audio_engine.cache)
     
     # Logger especial
     my_logger = CancellableProgressBarLogger(progress_callback, cancel_check_func or (lambda: False))
@@ -68,14 +131,24 @@ def render_video(audio_engine, output_filepath, width, height, fps, viz_mode, pr
             next_change_time = t + rnd.uniform(5.0, 10.0)
             print(f"[EXPORT RANDOM] t={t:.1f}s - Cambiando a: {current_viz}")
              
-        # 1. Obtener datos de audio para el tiempo t
-        data = audio_engine.get_audio_data(t=t)
+        # 1. Obtener datos de audio para el tiempo t (precargados por segmentos)
+        data = audio_frames.get(t)
+        
+        # 2. Características que pide el visualizador (se calculan una vez por pista)
+        features = {}
+        names = visualizer.required_features(current_viz)
+        if names:
+            features = feature_store.values(names, audio_frames.position(t), wait=True)
         
-        # 2. Dibujar frame con el visualizador actual
-        pil_img = current_draw_func(data, width, height, mode=current_viz, t=t)
+        # 3. Forma de onda real, para los visualizadores que la dibujan
+        waveform = None
+        if current_viz in visualizer.WAVEFORM_MODES and track.waveform is not None:
+            waveform = track.waveform.window(t, visualizer.WAVEFORM_SECONDS, width)
         
-        # 3. Convertir a numpy array
-        return np.array(pil_img)
+        # 4. Dibujar frame con el visualizador actual, directamente en el array
+        #    que recibe moviepy
+        return current_draw_func(frame_pool.acquire(), data, mode=current_viz, t=t, features=features,
+                                 waveform=waveform)
 
     audio_clip = None
     video = None
@@ -84,7 +157,7 @@ def render_video(audio_engine, output_filepath, width, height, fps, viz_mode, pr
     temp_audio_path = output_filepath + ".temp_audio.m4a"
 
     try:
-        audio_clip = AudioFileClip(audio_engine.current_file)
+        audio_clip = AudioFileClip(track.filepath)
         video = VideoClip(make_frame, duration=duration)
         
         # Compatibilidad de versiones de moviepy (v1 vs v2)
@@ -0,0 +1,149 @@
+import os
+import sys
+import threading
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, CancelledError
+from analysis_cache import AnalysisCache
+from track_analyzer import TrackAnalyzer, AnalysisCancelled
+
+# Estado global de cada proceso trabajador (se fija en _init_worker)
+_cancel_event = None
+_progress_queue = None
+
+
+def _lower_priority():
+    """Baja la prioridad del proceso actual para no competir con la UI ni el audio."""
+    try:
+        if sys.platform == "win32":
+            import ctypes
+            BELOW_NORMAL_PRIORITY_CLASS = 0x4000
+            handle = ctypes.windll.kernel32.GetCurrentProcess()
+            ctypes.windll.kernel32.SetPriorityClass(handle, BELOW_NORMAL_PRIORITY_CLASS)
+        else:
+            os.nice(10)
+    except Exception as e:
+        print(f"[PREANALYSIS] Could not lower worker priority: {e}")
+
+
+def _init_worker(cancel_event, progress_queue):
+    global _cancel_event, _progress_queue
+    _cancel_event = cancel_event
+    _progress_queue = progress_queue
+    _lower_priority()
+
+
+def _preanalyze(filepath, cache_dir, cache_max_mb, settings):
+    """Analiza una pista dentro de un proceso trabajador y la deja en la caché."""
+    if _cancel_event.is_set():
+        return "cancelled"
+
+    cache = AnalysisCache(cache_dir, max_size_mb=cache_max_mb)
+    analyzer = TrackAnalyzer(filepath, cache=cache, **settings)
+    last = [0.0]
+
+    def on_progress(fraction):
+        # Limitar los mensajes a saltos de ~5%
+        if fraction - last[0] >= 0.05:
+            last[0] = fraction
+            _progress_queue.put((filepath, fraction))
+
+    try:
+        analyzer.run(should_cancel=_cancel_event.is_set, on_progress=on_progress)
+    except AnalysisCancelled:
+        return "cancelled"
+    return "cached" if analyzer.from_cache else "analyzed"
+
+
+class LibraryPreAnalyzer:
+    """
+    Pre-analiza en segundo plano todas las pistas de una carpeta con un pool de
+    procesos de baja prioridad, dejando los resultados en la caché de análisis.
+
+    on_progress(filepath, fraction, status) se llama desde un hilo secundario;
+    status es "queued", "analyzing", "cached", "analyzed", "cancelled" o "error".
+    """
+
+    def __init__(self, cache, settings, workers=2, on_progress=None):
+        self.cache_dir = cache.cache_dir
+        self.cache_max_mb = cache.max_bytes / (1024 * 1024)
+        # El paralelismo ya viene de los procesos: un hilo de STFT por trabajador
+        self.settings = dict(settings, streaming=True, analysis_workers=1)
+        self.workers = max(1, int(workers))
+        self.on_progress = on_progress
+
+        self._executor = None
+        self._cancel_event = None
+        self._progress_queue = None
+        self._monitor = None
+        self._futures = {}
+
+    @property
+    def is_running(self):
+        return self._monitor is not None and self._monitor.is_alive()
+
+    def start(self, filepaths):
+        if self.is_running:
+            return
+        ctx = multiprocessing.get_context("spawn")
+        self._cancel_event = ctx.Event()
+        self._progress_queue = ctx.Queue()
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=ctx,
+            initializer=_init_worker, initargs=(self._cancel_event, self._progress_queue)
+        )
+        print(f"[PREANALYSIS] Pre-analyzing {len(filepaths)} tracks with {self.workers} workers")
+
+        self._futures = {}
+        for path in filepaths:
+            self._notify(path, 0.0, "queued")
+            future = self._executor.submit(_preanalyze, path, self.cache_dir, self.cache_max_mb, self.settings)
+            self._futures[future] = path
+
+        self._monitor = threading.Thread(target=self._monitor_loop, daemon=True)
+        self._monitor.start()
+
+    def cancel(self):
+        """Cancela las pistas pendientes y corta las que estén a medias."""
+        if self._cancel_event is not None:
+            self._cancel_event.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _notify(self, path, fraction, status):
+        if self.on_progress:
+            try:
+                self.on_progress(path, fraction, status)
+            except Exception as e:
+                print(f"[PREANALYSIS] Progress callback error: {e}")
+
+    def _drain_progress(self):
+        while True:
+            try:
+                path, fraction = self._progress_queue.get_nowait()
+            except Exception:
+                return
+            self._notify(path, fraction, "analyzing")
+
+    def _monitor_loop(self):
+        pending = set(self._futures)
+        while pending:
+            self._drain_progress()
+            finished = {f for f in pending if f.done()}
+            for future in finished:
+                path = self._futures[future]
+                try:
+                    status = future.result()
+                except CancelledError:
+                    status = "cancelled"
+                except Exception as e:
+                    print(f"[PREANALYSIS] Failed {os.path.basename(path)}: {e}")
+                    status = "error"
+                self._notify(path, 1.0 if status in ("cached", "analyzed") else 0.0, status)
+            pending -= finished
+            if pending:
+                time.sleep(0.2)
+
+        self._drain_progress()
+        self._executor.shutdown(wait=True)
+        print("[PREANALYSIS] Finished")
@@ -0,0 +1,224 @@
+import threading
+import time
+import numpy as np
+import librosa
+from audio_analysis import (log_band_filterbank, band_power_db, ref_db_from_max, normalize_db,
+                            EnvelopeFollower, envelope_coefficient, scaled_fft_size)
+from audio_decode import AudioStream
+
+# Muestras por bloque de captura: a 44.1 kHz llega audio nuevo cada ~6 ms
+CAPTURE_BLOCK = 256
+
+# Segundos de audio que guarda el buffer circular (cubre la ventana de la FFT
+# y la de la forma de onda con mucho margen)
+RING_SECONDS = 4.0
+
+# La referencia de normalización sigue al pico reciente: baja estos dB por
+# segundo cuando la señal se calma, pero nunca más de REF_RANGE_DB por debajo
+# del fondo de escala (si no, el silencio se vería como ruido a todo volumen)
+REF_DECAY_DB_PER_SECOND = 6.0
+REF_RANGE_DB = 40.0
+
+
+class RingBuffer:
+    """
+    Buffer circular de muestras para un productor (el hilo de captura) y un
+    consumidor (quien visualiza), sin locks.
+
+    Cada muestra se guarda dos veces (en i y en i + capacidad), así las últimas
+    n muestras son siempre un trozo contiguo. El productor escribe primero las
+    muestras y después avanza `written`; el consumidor lee `written` y luego el
+    trozo, que no se pisa mientras n sea bastante menor que la capacidad.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = 1 << int(np.ceil(np.log2(max(2, capacity))))
+        self._data = np.zeros(2 * self.capacity, dtype=np.float32)
+        self.written = 0 # Muestras escritas en total
+        self.updated = time.perf_counter() # Momento de la última escritura
+
+    def write(self, samples):
+        samples = np.asarray(samples, dtype=np.float32)
+        total = len(samples)
+        samples = samples[-self.capacity:]
+        n = len(samples)
+        pos = (self.written + total - n) % self.capacity
+        first = min(n, self.capacity - pos)
+        for base in (0, self.capacity):
+            self._data[base + pos:base + pos + first] = samples[:first]
+            self._data[base:base + n - first] = samples[first:]
+        self.written += total
+        self.updated = time.perf_counter()
+
+    def latest(self, n):
+        """Vista de las últimas n muestras (ceros antes de que lleguen)."""
+        n = min(int(n), self.capacity)
+        start = (self.written - n) % self.capacity
+        return self._data[start:start + n]
+
+
+class FileCapture:
+    """
+    Dispositivo de captura de prueba: entrega un archivo de audio en tiempo real,
+    por bloques y desde otro hilo, como lo haría la tarjeta de sonido.
+    """
+
+    def __init__(self, filepath, block=CAPTURE_BLOCK):
+        self.filepath = filepath
+        self.block = block
+        self._stream = AudioStream(filepath, None, quality="native")
+        self.sr = self._stream.sr
+        self._stop = threading.Event()
+        self._thread = None
+
+    def open(self):
+        pass
+
+    def start(self, on_samples):
+        self._thread = threading.Thread(target=self._run, args=(on_samples,), daemon=True)
+        self._thread.start()
+
+    def _run(self, on_samples):
+        start = time.perf_counter()
+        delivered = 0
+        for chunk in self._stream:
+            for i in range(0, len(chunk), self.block):
+                block = chunk[i:i + self.block]
+                delivered += len(block)
+                # Cada bloque llega cuando se habría terminado de capturar
+                wait = start + delivered / self.sr - time.perf_counter()
+                if wait > 0 and self._stop.wait(wait):
+                    return
+                if self._stop.is_set():
+                    return
+                on_samples(block)
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+
+
+class PygameCapture:
+    """
+    Captura de una entrada de la tarjeta de sonido (micrófono, línea o el monitor
+    de la salida) con SDL2 a través de pygame. device=None usa la predeterminada.
+    """
+
+    def __init__(self, device=None, sr=44100, block=CAPTURE_BLOCK):
+        self.device = device
+        self.sr = sr
+        self.block = block
+        self._device = None
+        self._channels = 1
+        self._on_samples = None
+
+    @staticmethod
+    def devices():
+        """Nombres de los dispositivos de captura disponibles."""
+        from pygame._sdl2 import audio as sdl_audio
+        return list(sdl_audio.get_audio_device_names(True))
+
+    def open(self):
+        import pygame
+        from pygame._sdl2 import audio as sdl_audio
+        if not pygame.mixer.get_init():
+            pygame.mixer.init() # Inicializa el subsistema de audio de SDL
+        self._device = sdl_audio.AudioDevice(
+            devicename=self.device, iscapture=True, frequency=self.sr,
+            audioformat=sdl_audio.AUDIO_F32, numchannels=1, chunksize=self.block,
+            allowed_changes=sdl_audio.AUDIO_ALLOW_FREQUENCY_CHANGE,
+            callback=self._callback,
+        )
+        self.sr = self._device.frequency
+        self._channels = self._device.numchannels
+
+    def _callback(self, device, memory):
+        if self._on_samples is not None:
+            frames = np.frombuffer(memory, dtype=np.float32)
+            self._on_samples(frames.reshape(-1, self._channels).mean(axis=1, dtype=np.float32))
+
+    def start(self, on_samples):
+        self._on_samples = on_samples
+        self._device.pause(0)
+
+    def close(self):
+        if self._device is not None:
+            self._device.pause(1)
+            self._device.close()
+            self._device = None
+
+
+class LiveInput:
+    """
+    Fuente de audio en vivo para los visualizadores.
+
+    La captura escribe en un RingBuffer y cada lectura (bands) transforma la
+    ventana más reciente con la misma distribución de bandas que el análisis de
+    archivos (mismas frecuencias, misma resolución en Hz), así que los
+    visualizadores no notan la diferencia. La latencia del análisis (antigüedad
+    del audio más viejo del último bloque capturado más el cálculo) queda en
+    `latency`.
+    """
+
+    def __init__(self, capture, target_sr=22050, n_fft=2048, n_bands=64, band_smoothing=None):
+        self.capture = capture
+        self.target_sr = target_sr
+        self.n_fft_requested = n_fft
+        self.n_bands = n_bands
+        self.band_smoothing = tuple(band_smoothing) if band_smoothing else None
+        self.ring = None
+        self.ref_db = None
+        self.latency = 0.0
+        self._last_read = None
+
+    @property
+    def sr(self):
+        return self.capture.sr
+
+    def start(self):
+        self.capture.open()
+        self.n_fft = scaled_fft_size(self.n_fft_requested, self.sr, self.target_sr)
+        self._window = librosa.filters.get_window('hann', self.n_fft, fftbins=True).astype(np.float32)
+        # Mismo reparto de bandas que TrackAnalyzer._filterbank
+        self._filterbank = log_band_filterbank(self.sr, self.n_fft, self.n_bands, fmax=self.target_sr / 2)
+        self._ref_floor = ref_db_from_max(self._window.sum() / 2) - REF_RANGE_DB
+        self._follower = EnvelopeFollower(1.0, 1.0) if self.band_smoothing else None
+        self.ring = RingBuffer(int(RING_SECONDS * self.sr))
+        self.capture.start(self.ring.write)
+
+    def stop(self):
+        self.capture.close()
+
+    def frame_db(self):
+        """Bandas en dB absolutos de la ventana de n_fft muestras más reciente, y su magnitud máxima."""
+        frame = self.ring.latest(self.n_fft) * self._window
+        mag = np.abs(np.fft.rfft(frame))[None, :]
+        return band_power_db(mag, self._filterbank)[0], mag.max()
+
+    def bands(self):
+        """Bandas actuales en [0, 1] (como AudioEngine.get_audio_data en modo archivo)."""
+        now = time.perf_counter()
+        dt = max(now - self._last_read, 1e-3) if self._last_read is not None else 1 / 30
+        self._last_read = now
+
+        db, peak = self.frame_db()
+        decayed = self.ref_db - REF_DECAY_DB_PER_SECOND * dt if self.ref_db is not None else self._ref_floor
+        self.ref_db = max(ref_db_from_max(peak), decayed, self._ref_floor)
+
+        if self._follower is not None:
+            # Las lecturas no llegan a ritmo fijo: coeficientes para el intervalo real
+            attack, release = self.band_smoothing
+            self._follower.attack = np.float32(envelope_coefficient(attack, 1 / dt))
+            self._follower.release = np.float32(envelope_coefficient(release, 1 / dt))
+            db = self._follower.process(db[None, :])[0]
+
+        self.latency = time.perf_counter() - self.ring.updated + self.capture.block / self.sr
+        return normalize_db(db, self.ref_db)
+
+    def waveform(self, seconds, width):
+        """(mínimos, máximos) de los últimos `seconds` segundos en `width` columnas."""
+        width = max(1, int(width))
+        samples = np.array(self.ring.latest(int(seconds * self.sr)))
+        starts = np.linspace(0, len(samples), width, endpoint=False).astype(np.int64)
+        return np.minimum.reduceat(samples, starts), np.maximum.reduceat(samples, starts)
@@ -1,16 +1,19 @@
 import customtkinter as ctk
 import os
 import random
-from ui_components import create_control_panel, ExportDialog, toggle_inputs
+from ui_components import create_control_panel, ExportDialog
 from random_config_dialog import RandomConfigDialog
 from config_manager import ConfigManager
 from audio_engine import AudioEngine
+from audio_decode import PLAYABLE_EXTENSIONS
+from library_preanalyzer import LibraryPreAnalyzer
 import visualizer
 import exporter
 import threading
 import time
 import queue
-from PIL import Image
+import functools
+import numpy as np
 
 # ... (Configuración inicial igual) ...
 
@@ -23,15 +26,16 @@ class MusicVisualizerApp(ctk.CTk):
         self.geometry("1000x700")
         self.minsize(800, 600)
         
-        # Iniciar Motor de Audio
-        self.engine = AudioEngine()
         self.current_viz_mode = "Bars Spectrum"
         self.app_start_time = time.time()
         
         # Variables de Estado de Exportación
         self.last_export_settings = {} # Persistencia
-        self.is_exporting = False
-        self.cancel_export_flag = False
+        # Exportaciones en marcha: cada una trabaja sobre su propia instantánea
+        # del análisis (ver exporter.render_video), así que la UI sigue libre y
+        # puede haber varias a la vez. Cada trabajo es un dict con cancel,
+        # progress (0-100) y start.
+        self.export_jobs = []
         
         # Variables de Auto-Random Rotation
         self.auto_random_enabled = False
@@ -51,6 +55,17 @@ class MusicVisualizerApp(ctk.CTk):
         self.current_folder = self.config_manager.get("last_music_folder", "")
         self.random_pool = self.config_manager.get("random_pool", [])
         self.last_export_settings = self.config_manager.get("export_settings", {})
+        visualizer.PARTICLE_COUNT = int(self.config_manager.get("particle_count", visualizer.PARTICLE_COUNT))
+        
+        # Iniciar Motor de Audio (con la caché de análisis configurada)
+        self.engine = AudioEngine(
+            cache_dir=self.config_manager.get("analysis_cache_dir") or None,
+            cache_max_mb=self.config_manager.get("analysis_cache_max_mb", 2048)
+        )
+        
+        # Pre-análisis en segundo plano de la carpeta actual
+        self.preanalyzer = None
+        self.song_buttons = {} # filename -> botón de la lista
         
         # Canal seguro para renderizado OpenGL desde hilos secundarios
         self.gl_render_queue = queue.Queue(maxsize=1)
@@ -81,13 +96,19 @@ class MusicVisualizerApp(ctk.CTk):
             play_callback=self.play_music,
             pause_callback=self.pause_music,
             stop_callback=self.stop_music,
-            export_callback=self.export_video, # Ahora actúa como Exportar/Cancelar
-            visualization_callback=self.change_visualization
+            export_callback=self.export_video,
+            visualization_callback=self.change_visualization,
+            seek_callback=self.seek_music
         )
         
         # Conectar callbacks de Auto-Random
         self.ui_elements["btn_config_random"].configure(command=self.open_random_config)
         self.ui_elements["btn_auto_random"].configure(command=self.toggle_auto_random)
+        self.ui_elements["btn_preanalyze"].configure(command=self.toggle_preanalysis)
+        self.ui_elements["btn_live"].configure(command=self.toggle_live_input)
+        self.ui_elements["btn_playlist"].configure(command=self.toggle_playlist)
+        self.ui_elements["btn_cancel_export"].configure(command=self.cancel_exports)
+        self.engine.on_track_change = lambda path: self.after(0, self._on_track_change, path)
 
         # Iniciar bucles de fondo
         self.after(33, self.update_visuals)
@@ -114,20 +135,30 @@ class MusicVisualizerApp(ctk.CTk):
 
     def update_visuals(self):
         """Bucle de actualización de la interfaz y visualizadores."""
-        if self.is_exporting:
-            self.update_idletasks()
-            self.after(100, self.update_visuals)
-            return
-
         w = self.visualizer_frame.winfo_width()
         h = self.visualizer_frame.winfo_height()
         if w < 10 or h < 10: w, h = 800, 400
         
-        data = self.engine.get_audio_data()
+        # Un solo instante para el visualizador y la barra de desplazamiento
+        t = self.engine.get_audio_time()
+        data = self.engine.get_audio_data(t)
+        features = self.engine.get_features(visualizer.required_features(self.current_viz_mode), t)
+        waveform = None
+        if self.current_viz_mode in visualizer.WAVEFORM_MODES:
+            waveform = self.engine.get_waveform(w, visualizer.WAVEFORM_SECONDS, t)
         elapsed = time.time() - self.app_start_time
-        pil_image = visualizer.draw_frame(data, w, h, mode=self.current_viz_mode, t=elapsed)
-        self.current_image = ctk.CTkImage(light_image=pil_image, dark_image=pil_image, size=(w, h))
-        self.lbl_viz.configure(image=self.current_image)
+        pil_image = visualizer.draw_frame(data, w, h, mode=self.current_viz_mode, t=elapsed,
+                                          features=features, waveform=waveform)
+        # Se reutiliza el CTkImage: solo cambia la imagen que muestra
+        if self.current_image is None:
+            self.current_image = ctk.CTkImage(light_image=pil_image, dark_image=pil_image, size=(w, h))
+            self.lbl_viz.configure(image=self.current_image)
+        else:
+            self.current_image.configure(light_image=pil_image, dark_image=pil_image, size=(w, h))
+        
+        analysis = self.engine.analysis if self.engine.is_loaded and self.engine.live is None else None
+        self.ui_elements["scrub_bar"].refresh(t, self.engine.duration if analysis else 0,
+                                              analysis.waveform if analysis else None)
         
         if self.engine.is_loaded and self.ui_elements["lbl_status"].cget("text") == "ANALYZING...":
              self.ui_elements["lbl_status"].configure(text="READY TO PLAY")
@@ -140,8 +171,8 @@ class MusicVisualizerApp(ctk.CTk):
             while not self.gl_render_queue.empty():
                 try:
                     req = self.gl_render_queue.get_nowait()
-                    data, w, h, mode, t, event, container = req
-                    container['img'] = visualizer.draw_frame(data, w, h, mode, t)
+                    data, w, h, mode, t, features, event, container = req
+                    container['img'] = visualizer.draw_frame(data, w, h, mode, t, features)
                     event.set()
                 except queue.Empty:
                     break
@@ -165,8 +196,9 @@ class MusicVisualizerApp(ctk.CTk):
         # Limpiar lista actual
         for widget in self.ui_elements["song_list_frame"].winfo_children():
             widget.destroy()
+        self.song_buttons = {}
         
-        files = [f for f in os.listdir(self.current_folder) if f.lower().endswith(('.mp3', '.wav'))]
+        files = [f for f in os.listdir(self.current_folder) if f.lower().endswith(PLAYABLE_EXTENSIONS)]
         
         if not files:
             lbl = ctk.CTkLabel(self.ui_elements["song_list_frame"], text="No audio files found", font=("Roboto", 10))
@@ -186,6 +218,51 @@ class MusicVisualizerApp(ctk.CTk):
                 command=lambda f=filename: self.load_selected_track(f)
             )
             btn.pack(fill="x", padx=2, pady=1)
+            self.song_buttons[filename] = btn
+
+        # La lista de reproducción sigue el orden de la biblioteca
+        self.engine.set_playlist([os.path.join(self.current_folder, f) for f in files])
+
+    # --- PRE-ANÁLISIS DE LA CARPETA ---
+    def toggle_preanalysis(self):
+        """Lanza (o cancela) el pre-análisis de todas las pistas de la carpeta."""
+        if self.preanalyzer and self.preanalyzer.is_running:
+            self.preanalyzer.cancel()
+            self.ui_elements["btn_preanalyze"].configure(text="CANCELLING...")
+            return
+
+        if self.engine.cache is None or not self.song_buttons:
+            return
+
+        self.preanalyzer = LibraryPreAnalyzer(
+            self.engine.cache,
+            self.engine.analysis_settings(),
+            workers=self.config_manager.get("preanalysis_workers", 2),
+            on_progress=lambda path, fraction, status: self.after(0, self._on_preanalysis_progress, path, fraction, status)
+        )
+        self.preanalyzer.start([os.path.join(self.current_folder, f) for f in self.song_buttons])
+        self.ui_elements["btn_preanalyze"].configure(text="CANCEL PRE-ANALYSIS", fg_color="#D50000", hover_color="#B71C1C")
+        self.after(500, self._check_preanalysis_done)
+
+    def _on_preanalysis_progress(self, path, fraction, status):
+        filename = os.path.basename(path)
+        btn = self.song_buttons.get(filename)
+        if btn is None:
+            return
+        suffix = {
+            "queued": "  ·",
+            "analyzing": f"  {int(fraction * 100)}%",
+            "cached": "  ✓",
+            "analyzed": "  ✓",
+            "error": "  ✗",
+        }.get(status, "")
+        btn.configure(text=f"{filename}{suffix}")
+
+    def _check_preanalysis_done(self):
+        if self.preanalyzer and self.preanalyzer.is_running:
+            self.after(500, self._check_preanalysis_done)
+            return
+        self.ui_elements["btn_preanalyze"].configure(text="PRE-ANALYZE ⚡", fg_color="#333333", hover_color="#444444")
 
     def load_selected_track(self, filename):
         """Carga la pista seleccionada de la lista."""
@@ -226,6 +303,37 @@ class MusicVisualizerApp(ctk.CTk):
         self.engine.stop()
         self.ui_elements["lbl_status"].configure(text="STOPPED")
 
+    def toggle_playlist(self):
+        """Activa/desactiva la reproducción continua de la carpeta (sin silencios entre pistas)."""
+        self.engine.playlist_mode = not self.engine.playlist_mode
+        on = self.engine.playlist_mode
+        self.ui_elements["btn_playlist"].configure(text=f"PLAYLIST: {'ON' if on else 'OFF'}",
+                                                   fg_color="#00C853" if on else "#333333")
+        self.engine.set_playlist(self.engine.playlist)
+
+    def _on_track_change(self, path):
+        self.ui_elements["lbl_file"].configure(text=f"Selected: {os.path.basename(path)}")
+
+    def toggle_live_input(self):
+        """Activa/desactiva la visualización de la entrada en vivo (dispositivo de captura predeterminado)."""
+        if self.engine.live is not None:
+            self.engine.stop_live_input()
+            self.ui_elements["btn_live"].configure(text="LIVE INPUT 🎤", fg_color="#333333", hover_color="#444444")
+            self.ui_elements["lbl_status"].configure(text="READY TO PLAY" if self.engine.is_loaded else "LIVE INPUT OFF")
+            return
+        try:
+            self.engine.start_live_input(self.config_manager.get("live_input_device"))
+        except Exception as e:
+            print(f"[ERROR] Could not start live input: {e}")
+            self.ui_elements["lbl_status"].configure(text="NO INPUT DEVICE")
+            return
+        self.ui_elements["btn_live"].configure(text="STOP LIVE INPUT", fg_color="#D50000", hover_color="#B71C1C")
+        self.ui_elements["lbl_status"].configure(text="LIVE")
+
+    def seek_music(self, t):
+        if not self.engine.is_loaded: return
+        self.engine.seek(t)
+
     def change_visualization(self, v): self.current_viz_mode = v
 
     # --- AUTO-RANDOM ROTATION METHODS ---
@@ -304,31 +412,25 @@ class MusicVisualizerApp(ctk.CTk):
 
     # --- LÓGICA DE EXPORTACIÓN FINAL ---
     def export_video(self):
-        # Si YA está exportando, este botón funciona como CANCELAR
-        if self.is_exporting:
-            self.cancel_export_flag = True
-            
-            self.ui_elements["lbl_status"].configure(text="CANCELLING...")
-            return
-
         if not self.engine.is_loaded:
             self.ui_elements["lbl_status"].configure(text="NO TRACK TO EXPORT!")
             return
 
         print("EXPORT presionado")
-        self.engine.pause() 
         self.ui_elements["lbl_status"].configure(text="CONFIGURING EXPORT...")
         
-        # Abrir diálogo pasando settings previos
+        # Abrir diálogo pasando settings previos. La pista a exportar es la de
+        # ahora, aunque se cambie de pista con el diálogo abierto
         print(f"[DEBUG] Abriendo ExportDialog con settings: {self.last_export_settings}")
         try:
-            ExportDialog(self, initial_settings=self.last_export_settings, on_export_start=self.start_export_process)
+            ExportDialog(self, initial_settings=self.last_export_settings,
+                         on_export_start=functools.partial(self.start_export_process, analysis=self.engine.analysis))
         except Exception as e:
             print(f"[ERROR] Error al abrir ExportDialog: {e}")
             import traceback
             traceback.print_exc()
 
-    def start_export_process(self, width, height, fps, folder, settings):
+    def start_export_process(self, width, height, fps, folder, settings, analysis=None):
         # Guardar settings para la próxima
         self.last_export_settings = settings
         self.config_manager.update_export_settings(settings)
@@ -343,30 +445,30 @@ class MusicVisualizerApp(ctk.CTk):
             print("[EXPORT] Desactivando AUTO RANDOM de la UI durante exportación")
             self.toggle_auto_random()  # Apagar el modo random de la UI
         
-        # Bloquear UI
-        self.is_exporting = True
-        self.cancel_export_flag = False
-        toggle_inputs(self.ui_elements, enabled=False)
+        job = {"cancel": False, "progress": 0.0, "start": time.time()}
+        self.export_jobs.append(job)
         
-        # Cambiar botón Export a Cancelar
-        self.ui_elements["btn_export"].configure(text="CANCEL RENDER", fg_color="#D50000", hover_color="#B71C1C")
-        
-        # Mostrar barra progreso
+        # Mostrar barra progreso y el botón de cancelar
+        self.ui_elements["btn_cancel_export"].pack(pady=(0, 5))
         self.progress_bar.place(relx=0.5, rely=0.8, anchor="center")
-        self.progress_bar.set(0)
-        self.ui_elements["lbl_status"].configure(text="RENDERING... 0%")
-        
-        # Tracking de tiempo
-        self.export_start_time = time.time()
+        self._show_export_progress()
         
         # Ruta salida con auto-incremento
-        base_name = os.path.splitext(os.path.basename(self.engine.current_file))[0]
+        analysis = analysis or self.engine.analysis
+        base_name = os.path.splitext(os.path.basename(analysis.filepath))[0]
         filename = f"{base_name}_visualizer.mp4"
         output_path = self.get_unique_path(folder, filename)
         
         # Hilo
         threading.Thread(target=self._run_export_thread, 
-                        args=(output_path, width, height, fps, self.current_viz_mode, use_random)).start()
+                        args=(job, analysis, output_path, width, height, fps, self.current_viz_mode, use_random)).start()
+
+    def cancel_exports(self):
+        """Cancela todas las exportaciones en marcha."""
+        for job in self.export_jobs:
+            job["cancel"] = True
+        if self.export_jobs:
+            self.ui_elements["lbl_status"].configure(text="CANCELLING...")
 
     def get_unique_path(self, folder, filename):
         """Si el archivo existe, agrega (1), (2), etc."""
@@ -378,7 +480,7 @@ class MusicVisualizerApp(ctk.CTk):
             counter += 1
         return final_path
 
-    def _run_export_thread(self, output_file, width, height, fps, viz_mode, use_random=False):
+    def _run_export_thread(self, job, analysis, output_file, width, height, fps, viz_mode, use_random=False):
         import exporter
         
         # Lista de visualizadores que usan GPU/OpenGL
@@ -390,20 +492,22 @@ class MusicVisualizerApp(ctk.CTk):
         ]
         
         # Wrapper para delegar renderizado al hilo principal si es GPU
-        def safe_draw(data, w, h, mode, t):
+        def safe_draw(out, data, mode, t, features=None, waveform=None):
             # Si el modo usa GPU, delegar al hilo principal
             if mode in gpu_modes:
                 event = threading.Event()
                 container = {}
                 # Postear solicitud
-                self.gl_render_queue.put((data, w, h, mode, t, event, container))
+                self.gl_render_queue.put((data, out.shape[1], out.shape[0], mode, t, features, event, container))
                 # Esperar a que el hilo principal (process_gl_queue) lo procese
                 if not event.wait(timeout=10.0): # Timeout aumentado
                     print(f"GL Render Timeout for mode: {mode}")
-                    return Image.new('RGB', (w, h), (0,0,0))
-                return container.get('img')
+                    out.fill(0)
+                    return out
+                out[:] = np.asarray(container.get('img'))
+                return out
             else:
-                return visualizer.draw_frame(data, w, h, mode, t)
+                return visualizer.render_frame(out, data, mode, t, features, waveform)
 
         try:
             # === STANDARD MOVIEPY PIPELINE ===
@@ -414,57 +518,69 @@ class MusicVisualizerApp(ctk.CTk):
                 height, 
                 fps, 
                 viz_mode=viz_mode,
-                progress_callback=self._update_progress_from_thread,
-                cancel_check_func=lambda: self.cancel_export_flag,
+                progress_callback=lambda percentage: self._update_progress_from_thread(job, percentage),
+                cancel_check_func=lambda: job["cancel"],
                 draw_func=safe_draw,
                 use_random=use_random,
-                random_pool=self.random_pool if use_random else None
+                random_pool=self.random_pool if use_random else None,
+                analysis=analysis
             )
-            self.after(0, self._export_finished, True)
+            self.after(0, self._export_finished, job, True)
 
         except Exception as e:
             print(f"Export failed/cancelled: {e}")
-            self.after(0, self._export_finished, False)
+            self.after(0, self._export_finished, job, False)
 
-    def _update_progress_from_thread(self, percentage):
+    def _update_progress_from_thread(self, job, percentage):
         # Actualizar UI desde hilo principal usando after o directamente si tkinter es thread-safe (a veces lo es para configure)
         # Lo seguro es usar after, pero para progreso simple a veces funciona directo.
         # Haremos un wrapper seguro
-        self.after(0, lambda: self._set_progress(percentage))
+        self.after(0, lambda: self._set_progress(job, percentage))
 
-    def _set_progress(self, percentage):
+    def _set_progress(self, job, percentage):
+        job["progress"] = percentage
+        self._show_export_progress()
+
+    def _show_export_progress(self):
+        """Barra y estado con el progreso medio de las exportaciones en marcha."""
+        if not self.export_jobs:
+            return
+        percentage = sum(job["progress"] for job in self.export_jobs) / len(self.export_jobs)
         self.progress_bar.set(percentage / 100)
         
-        # Calculo de ETA
-        elapsed = time.time() - self.export_start_time
-        if percentage > 0:
-            total_estimated = elapsed * (100 / percentage)
-            remaining = total_estimated - elapsed
+        # Calculo de ETA (la de la exportación que más tarde en terminar)
+        remaining = []
+        for job in self.export_jobs:
+            if job["progress"] > 0:
+                elapsed = time.time() - job["start"]
+                remaining.append(elapsed * (100 / job["progress"]) - elapsed)
+        if len(remaining) == len(self.export_jobs):
             # Formato MM:SS
-            m, s = divmod(int(remaining), 60)
+            m, s = divmod(int(max(remaining)), 60)
             eta_str = f"{m:02d}:{s:02d}"
         else:
             eta_str = "--:--"
             
-        self.ui_elements["lbl_status"].configure(text=f"RENDERING... {int(percentage)}% (ETA: {eta_str})")
+        count = f" {len(self.export_jobs)} EXPORTS" if len(self.export_jobs) > 1 else ""
+        self.ui_elements["lbl_status"].configure(text=f"RENDERING{count}... {int(percentage)}% (ETA: {eta_str})")
 
 
-    def _export_finished(self, success):
-        self.is_exporting = False
-        
-        # Restaurar UI
-        toggle_inputs(self.ui_elements, enabled=True)
-        self.ui_elements["btn_export"].configure(text="EXPORT VIDEO", fg_color="#6200EA", hover_color="#651FFF")
+    def _export_finished(self, job, success):
+        self.export_jobs.remove(job)
+        if self.export_jobs:
+            self._show_export_progress()
+            return
         
-        # Ocultar barra
+        # Ocultar barra y botón de cancelar
         self.progress_bar.place_forget()
+        self.ui_elements["btn_cancel_export"].pack_forget()
         
         if success:
             self.ui_elements["lbl_status"].configure(text="EXPORT COMPLETE!")
             # Opcional: Abrir carpeta
             # os.startfile(os.path.dirname(output_file))
         else:
-            if self.cancel_export_flag:
+            if job["cancel"]:
                 self.ui_elements["lbl_status"].configure(text="EXPORT CANCELLED")
             else:
                 self.ui_elements["lbl_status"].configure(text="EXPORT ERROR")
@@ -475,4 +591,9 @@ if __name__ == "__main__":
         app.mainloop()
     except KeyboardInterrupt:
         app.engine.stop()
+    finally:
+        # No dejar procesos de pre-análisis trabajando al cerrar
+        if app.preanalyzer:
+            app.preanalyzer.cancel()
+        app.engine.shutdown()
 
@@ -3,8 +3,24 @@ import pygame
 from OpenGL.GL import *
 from OpenGL.GL.shaders import compileProgram, compileShader
 import numpy as np
+import re
 from PIL import Image
 
+# Características de audio (ver audio_features) que un shader puede pedir
+# declarando el uniform correspondiente; solo se calculan las que alguno usa
+FEATURE_UNIFORMS = {
+    "rms": "u_rms",
+    "onset": "u_onset",
+    "beat_phase": "u_beat_phase",
+    "centroid": "u_centroid",
+    "chroma": "u_chroma",
+}
+
+def shader_features(fragment_src):
+    """Características que declara un shader (por sus uniforms)."""
+    return tuple(name for name, uniform in FEATURE_UNIFORMS.items()
+                 if re.search(rf"\buniform\s+float\s+{uniform}\b", fragment_src))
+
 class OpenGLEngine:
     def __init__(self, width=800, height=600):
         self.width = width
@@ -85,7 +101,7 @@ class OpenGLEngine:
             print(f"[GL ERROR] Shader compilation failed: {e}")
             return False
             
-    def render_frame(self, time, audio_data):
+    def render_frame(self, time, audio_data, features=None):
         """Renders a frame using the current shader and returns it as a PIL Image."""
         # Detect size change
         # Usually handled by the visualizer.py updating self.width/height
@@ -120,6 +136,17 @@ class OpenGLEngine:
                  # Check if the uniform array size matches (max 64)
                  glUniform1fv(u_audio_loc, min(len(audio_arr), 64), audio_arr[:64])
         
+        # Características declaradas por el shader (u_rms, u_chroma...)
+        for name, value in (features or {}).items():
+             loc = glGetUniformLocation(self.shader, FEATURE_UNIFORMS[name])
+             if loc == -1:
+                 continue
+             value = np.atleast_1d(np.asarray(value, dtype=np.float32))
+             if len(value) == 1:
+                 glUniform1f(loc, float(value[0]))
+             else:
+                 glUniform1fv(loc, len(value), value)
+        
         # Draw Quad
         glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
         position = glGetAttribLocation(self.shader, "position")
@@ -786,6 +813,7 @@ CHAOS_FRAGMENT = """
 uniform float u_time;
 uniform vec2 u_resolution;
 uniform float u_audio[64];
+uniform float u_onset;
 
 out vec4 fragColor;
 
@@ -817,7 +845,7 @@ void main() {
     float bass = u_audio[1] * 2.5;
     float mid = u_audio[15] * 2.0;
     float high = u_audio[45] * 3.5;
-    float energy = (bass + mid + high) / 3.0;
+    float energy = (bass + mid + high) / 3.0 + u_onset;
 
     // --- ENHANCED CAMERA MOVEMENTS ---
     // Panning (Left/Right) based on bass
@@ -0,0 +1,102 @@
+import numpy as np
+import raster
+
+# Partículas de referencia: con este número tienen su tamaño original (1-4 px).
+# Con más, el tamaño baja con la raíz cúbica del número, así que el área total
+# encendida (y el coste de dibujarlas) solo crece como n^(1/3): con 100k son
+# estrellas de menos de un píxel, unas 8 veces el área de 200, no una pantalla
+# blanca.
+REFERENCE_COUNT = 200
+
+# Constantes de splitmix64 (ver _uniform_hash)
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_MIX1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX2 = np.uint64(0x94D049BB133111EB)
+
+
+def _particle_keys(seed, index):
+    """Parte del hash de _uniform_hash que solo depende de (semilla, partícula): se calcula una vez."""
+    seed_mix = np.uint64((seed * int(_GOLDEN)) & 0xFFFFFFFFFFFFFFFF)
+    return seed_mix ^ (index.astype(np.uint64) * _MIX1)
+
+
+def _uniform_hash(keys, lap):
+    """
+    Número en [0, 1) que solo depende de (semilla, partícula, vuelta): un
+    splitmix64 sobre los tres (keys, de _particle_keys, junta los dos
+    primeros), vectorizado. Sustituye a pedir otro número al generador en
+    cada reaparición, que dependería de cuántas hubo antes.
+    """
+    # Todo en el sitio: con 100k partículas cada temporal nuevo cuesta más que la operación
+    z = lap.astype(np.uint64)
+    shifted = np.empty_like(z)
+    z *= _MIX2
+    z ^= keys
+    z += _GOLDEN
+    for shift, mix in ((30, _MIX1), (27, _MIX2), (31, None)):
+        np.right_shift(z, np.uint64(shift), out=shifted)
+        z ^= shifted
+        if mix is not None:
+            z *= mix
+    z >>= np.uint64(11)
+    u = z.astype(np.float64)
+    u *= 1.0 / (1 << 53)
+    return u
+
+
+class ParticleSystem:
+    """
+    Campo de estrellas de "Cosmic Particles": `count` partículas que cruzan la
+    pantalla de derecha a izquierda y vuelven a entrar por la derecha a otra
+    altura.
+
+    La simulación es de forma cerrada: cada partícula tiene una posición de
+    salida y una velocidad, y lo que ha avanzado hasta un instante es su
+    velocidad por el avance acumulado del audio (la característica "travel",
+    ver audio_features). Su posición, su vuelta y la altura de esa vuelta
+    (_uniform_hash) salen directamente de ahí, así que el frame en t es el
+    mismo se dibuje en el orden que sea, en el hilo que sea y a cualquier FPS.
+    Nada cambia tras el constructor: se comparte entre hilos sin bloqueos.
+    """
+
+    def __init__(self, count, seed=0):
+        self.count = count
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        self.start = rng.random(count) # Posición de salida, en fracción del ancho
+        self.speed = rng.random(count) * 5 + 2 # px por frame a TRAVEL_FPS, antes del empuje del audio
+        self.scale = min(1.0, (REFERENCE_COUNT / max(count, 1)) ** (1 / 3))
+        self.size = (rng.random(count) * 3 + 1) * self.scale
+        self.colors = rng.random((count, 3)) # RGB 0-1
+        self._colors255 = (self.colors * 255).astype(np.float32)
+        self._keys = _particle_keys(seed, np.arange(count))
+
+    def positions(self, travel, width, height):
+        """Posiciones (x, y) en píxeles tras un avance acumulado `travel`."""
+        x = self.speed * -travel
+        offset = self.start * width
+        x += offset
+        # Vuelta en la que va cada una: cada vez que sale por la izquierda
+        # reaparece por la derecha a una altura nueva
+        lap = np.multiply(x, -1 / width)
+        np.floor(lap, out=lap)
+        lap += 1
+        x += np.multiply(lap, width, out=offset)
+        y = _uniform_hash(self._keys, lap)
+        y *= height
+        return x, y
+
+    def draw(self, buf, travel, bass):
+        """Suma al buffer las partículas tras `travel`; el bajo las agranda y les da brillo."""
+        h, w = buf.shape[:2]
+        x, y = self.positions(travel, w, h)
+        # El bajo las agranda en proporción a su tamaño de referencia: con
+        # muchas, siguen siendo de un píxel y el coste no se dispara
+        size = self.size * (1 + bass * 5 * self.scale)
+        colors = self._colors255 * np.float32(1 + bass * 2)
+        np.minimum(colors, 255, out=colors)
+        # Como ImageDraw.ellipse([x, y, x + s, y + s]): (x, y) es la esquina
+        half = size * 0.5
+        x += half
+        y += half
+        raster.splat_discs(buf, x, y, size, colors)
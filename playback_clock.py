@@ -0,0 +1,98 @@
+import time
+
+
+class PlaybackClock:
+    """
+    Reloj de reproducción: posición en la pista (segundos) con la resolución de
+    time.perf_counter, correcta tras pausar, reanudar o saltar.
+
+    La posición avanza con el reloj monotónico desde el último anclaje (start,
+    resume, seek) y se corrige hacia la posición que informa el mezclador
+    (sync), que es la referencia real pero llega a saltos. La corrección es de
+    velocidad: el reloj corre algo más rápido o más lento (hasta
+    max_rate_change) para absorber el error en unos correction_time segundos,
+    así que la posición nunca retrocede mientras corre; solo start y seek la
+    llevan hacia atrás. Si el reloj va por delante más de max_error (p. ej. el
+    audio se atascó) se para hasta que el mezclador lo alcanza; si va por
+    detrás más de max_error, salta hacia delante.
+
+    latency es el retardo de salida (segundos): se resta a la posición para que
+    lo que se ve coincida con lo que se oye. error guarda la última diferencia
+    medida entre el mezclador y el reloj, para poder vigilar la deriva.
+    """
+
+    def __init__(self, latency=0.0, correction_time=0.5, max_rate_change=0.5, max_error=0.1,
+                 clock=time.perf_counter):
+        self.latency = latency
+        self.correction_time = correction_time # Segundos en los que se absorbe un error
+        self.max_rate_change = max_rate_change # Máxima desviación de la velocidad normal (1.0)
+        self.max_error = max_error
+        self.error = 0.0
+        self._clock = clock
+        self._running = False
+        self._anchor_position = 0.0
+        self._anchor_time = 0.0
+        self._rate = 1.0
+
+    @property
+    def running(self):
+        return self._running
+
+    def _position(self, now=None):
+        if not self._running:
+            return self._anchor_position
+        if now is None:
+            now = self._clock()
+        return self._anchor_position + (now - self._anchor_time) * self._rate
+
+    def start(self, position=0.0):
+        """Empieza a contar desde `position` (segundos de pista)."""
+        self.seek(position)
+        self._running = True
+
+    def _reanchor(self, now):
+        # Anclar en la posición actual: cambiar la velocidad no la mueve
+        self._anchor_position = self._position(now)
+        self._anchor_time = now
+
+    def pause(self):
+        self._anchor_position = self._position()
+        self._running = False
+
+    def resume(self):
+        if not self._running:
+            self._anchor_time = self._clock()
+            self._running = True
+
+    def stop(self):
+        self._running = False
+        self._anchor_position = 0.0
+        self._rate = 1.0
+        self.error = 0.0
+
+    def seek(self, position):
+        self._anchor_position = float(position)
+        self._anchor_time = self._clock()
+        self._rate = 1.0
+
+    def sync(self, mixer_position):
+        """Corrige la deriva con la posición (segundos de pista) que informa el mezclador."""
+        if not self._running:
+            return
+        now = self._clock()
+        self._reanchor(now)
+        self.error = mixer_position - self._anchor_position
+        if self.error > self.max_error:
+            # Muy por detrás: saltar hacia delante
+            self._anchor_position = mixer_position
+            self._rate = 1.0
+        elif self.error < -self.max_error:
+            # Muy por delante: esperar al mezclador sin retroceder
+            self._rate = 0.0
+        else:
+            change = min(max(self.error / self.correction_time, -self.max_rate_change), self.max_rate_change)
+            self._rate = 1.0 + change
+
+    def time(self):
+        """Posición audible actual: la del reloj menos la latencia de salida (nunca negativa)."""
+        return max(0.0, self._position() - self.latency)
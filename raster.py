@@ -0,0 +1,519 @@
+import functools
+import threading
+
+import numpy as np
+
+# Rasterizador con NumPy para los visualizadores CPU de primitivas (barras,
+# rectángulos, círculos, líneas): dibuja directamente en un buffer uint8
+# (alto, ancho, 3) preasignado, sin ImageDraw ni un Image.new por frame.
+#
+# Las coordenadas siguen el convenio de PIL.ImageDraw, así que el resultado
+# coincide con el de ImageDraw: el centro del píxel (x, y) está en (x, y), los
+# rectángulos incluyen sus dos bordes (coordenadas truncadas hacia cero) y los
+# contornos de grosor w crecen hacia dentro.
+#
+# En un buffer de 3 canales las escrituras con máscara van byte a byte y son
+# más lentas que el propio ImageDraw, así que los rellenos se reducen a tramos
+# contiguos: una fila de color precalculada que se copia sobre un rango de
+# filas (una copia de memoria por fila); las máscaras y distancias solo dicen
+# dónde empiezan y acaban. La línea con antialiasing y los discos sumados
+# (splat_discs), que mezclan cada píxel, escriben solo los píxeles que tocan.
+
+_buffers = threading.local()
+
+# Pesos de los canales (rojo, verde, azul) al empaquetarlos en splat_discs
+_PACK_SHIFTS = np.array([2.0 ** 34, 2.0 ** 17, 1.0])
+
+
+def frame_buffer(width, height):
+    """
+    Buffer (alto, ancho, 3) uint8 del hilo actual, reutilizado entre frames.
+    Su contenido es el del frame anterior: visualizer.render_frame lo limpia.
+    """
+    buf = getattr(_buffers, "frame", None)
+    if buf is None or buf.shape[:2] != (height, width):
+        buf = np.empty((height, width, 3), dtype=np.uint8)
+        _buffers.frame = buf
+    return buf
+
+
+class FramePool:
+    """
+    Unos pocos buffers (alto, ancho, 3) uint8 que se reparten en rueda para
+    visualizer.render_frame: el frame se dibuja en uno y se entrega tal cual al
+    consumidor (el encoder del exportador), sin Image.fromarray ni np.array.
+    Un buffer no se vuelve a repartir hasta `size` frames después, margen de
+    sobra para que el consumidor haya terminado con él.
+    """
+
+    def __init__(self, width, height, size=3):
+        self.width = width
+        self.height = height
+        self._buffers = [np.empty((height, width, 3), dtype=np.uint8) for _ in range(size)]
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Siguiente buffer de la rueda (con el contenido de su último uso)."""
+        with self._lock:
+            buf = self._buffers[self._next]
+            self._next = (self._next + 1) % len(self._buffers)
+        return buf
+
+
+def _pixel(coords):
+    # Truncar hacia cero como ImageDraw
+    return np.trunc(np.asarray(coords, dtype=np.float64)).astype(np.int64)
+
+
+def _color_row(width, color):
+    # Fila (ancho, 3) de un solo color: copiarla sobre un tramo es una copia contigua
+    row = np.empty((width, 3), dtype=np.uint8)
+    row[:] = color
+    return row
+
+
+def column_spans(buf, top, bottom, colors, background=(0, 0, 0)):
+    """
+    Pinta el buffer entero: en cada columna x las filas [top[x], bottom[x]] del
+    color colors[x] (o uno solo para todas) y el resto del fondo.
+
+    Recorre el buffer de arriba abajo: la fila de colores solo cambia en las
+    filas donde empieza o acaba algún tramo, y entre dos de ellas se copia tal
+    cual sobre todas las filas del rango.
+    """
+    h, w = buf.shape[:2]
+    top = np.clip(np.asarray(top, dtype=np.int64), 0, h)
+    end = np.clip(np.asarray(bottom, dtype=np.int64) + 1, 0, h)
+    empty = top >= end
+    top[empty] = h
+    end[empty] = h
+    colors = np.broadcast_to(np.asarray(colors, dtype=np.uint8), (w, 3))
+    row = _color_row(w, background)
+
+    cuts = np.unique(np.concatenate(([0, h], top, end)))
+    on = np.argsort(top, kind="stable")
+    off = np.argsort(end, kind="stable")
+    # Columnas que se encienden / apagan hasta cada corte
+    n_on = np.searchsorted(top[on], cuts, side="right")
+    n_off = np.searchsorted(end[off], cuts, side="right")
+    for k in range(len(cuts) - 1):
+        turned_on = on[n_on[k - 1] if k else 0:n_on[k]]
+        row[turned_on] = colors[turned_on]
+        row[off[n_off[k - 1] if k else 0:n_off[k]]] = background
+        buf[cuts[k]:cuts[k + 1]] = row
+
+
+def bars(buf, x0, y0, x1, y1, colors, background=(0, 0, 0)):
+    """
+    Rectángulos rellenos [x0, x1] x [y0, y1] (uno por elemento, colors (n, 3))
+    que no se solapan en x y van de izquierda a derecha, como las barras de un
+    espectro. Pinta el buffer entero (ver column_spans).
+    """
+    w = buf.shape[1]
+    x0, x1, y0, y1 = _pixel(x0), _pixel(x1), _pixel(y0), _pixel(y1)
+    if len(x0) == 0:
+        buf[:] = background
+        return
+    xs = np.arange(w)
+    owner = np.clip(np.searchsorted(x0, xs, side="right") - 1, 0, len(x0) - 1) # Barra de cada columna
+    inside = (xs >= x0[owner]) & (xs <= x1[owner])
+    column_spans(buf, np.where(inside, y0[owner], 0), np.where(inside, y1[owner], -1),
+                 np.asarray(colors, dtype=np.uint8)[owner], background)
+
+
+def rect_outlines(buf, x0, y0, x1, y1, colors, width=1):
+    """
+    Contornos de rectángulos de grosor `width` hacia dentro (como
+    ImageDraw.rectangle con outline y width), pintados en orden: cuatro franjas
+    por rectángulo, así que solo se tocan los píxeles del trazo.
+    """
+    h, w = buf.shape[:2]
+    for left, top, right, bottom, color in zip(_pixel(x0), _pixel(y0), _pixel(x1) + 1, _pixel(y1) + 1, colors):
+        l, r = max(left, 0), min(right, w)
+        t, b = max(top, 0), min(bottom, h)
+        if l >= r or t >= b:
+            continue
+        # Límites interiores del trazo, recortados al buffer
+        inner_t, inner_b = min(max(top + width, t), b), max(bottom - width, t)
+        inner_l, inner_r = min(max(left + width, l), r), max(right - width, l)
+        row = _color_row(r - l, color)
+        buf[t:inner_t, l:r] = row # Arriba
+        buf[inner_b:b, l:r] = row # Abajo
+        buf[t:b, l:inner_l] = row[:inner_l - l] # Izquierda
+        buf[t:b, inner_r:r] = row[:r - inner_r] # Derecha
+
+
+def _quarter_ellipse(a, b):
+    # Puntos (x, y) de un cuarto de elipse de ejes a y b, en medios píxeles:
+    # el mismo recorrido de Bresenham que Pillow (quarter_next en Draw.c)
+    if a < 0 or b < 0:
+        return
+    a2, b2 = a * a, b * b
+    a2b2 = a2 * b2
+
+    def delta(x, y):
+        return abs(a2 * y * y + b2 * x * x - a2b2)
+
+    x, y = a, b % 2
+    while True:
+        yield x, y
+        if x == a % 2 and y == b:
+            return
+        nx, ny = x, y + 2
+        best = delta(nx, ny)
+        if nx > 1:
+            d = delta(x - 2, y + 2)
+            if best > d:
+                nx, ny, best = x - 2, y + 2, d
+            if best > delta(x - 2, y):
+                nx, ny = x - 2, y
+        x, y = nx, ny
+
+
+@functools.lru_cache(maxsize=1024)
+def _ellipse_spans(a, b, width):
+    """
+    Tramos (fila, primera columna, última columna) de la elipse de contorno
+    `width` en una caja de a x b píxeles (relativos a su esquina), como
+    ellipse_next de Pillow. Con width >= a + b es la elipse rellena.
+    Solo depende de la caja en enteros: se guarda (unos KB por caja) para los
+    frames siguientes.
+    """
+    spans = []
+    outer = _quarter_ellipse(a, b)
+    first = next(outer, None)
+    if width < 1 or first is None:
+        return np.zeros((0, 3), dtype=np.int32)
+    leftmost = a % 2
+    right, next_y = first
+    inner = _quarter_ellipse(a - 2 * (width - 1), b - 2 * (width - 1))
+    next_left = leftmost
+    finished = False
+    while not finished:
+        y, left, r = next_y, next_left, right
+        # Siguiente fila del contorno exterior y último punto del interior en esta
+        point = next(((px, py) for px, py in outer if py > y), None)
+        if point is None:
+            finished = True
+        else:
+            right, next_y = point
+        next_left = leftmost
+        for px, py in inner:
+            if py > y:
+                next_left = px
+                break
+            left = px
+        for row in ((y, -y) if y > 0 else (-y,)):
+            if left > 0 or left < r:
+                spans.append((row, 2 if left == 0 else left, r))
+            spans.append((row, -r, -left))
+    # De medios píxeles centrados a píxeles de la caja; en cada fila, los
+    # tramos que se tocan se juntan (el relleno son dos mitades)
+    rows = {}
+    for y, lo, hi in spans:
+        y, lo, hi = (y + b) // 2, (lo + a) // 2, (hi + a) // 2
+        row = rows.setdefault(y, [])
+        if row and lo <= row[-1][1] + 1 and hi >= row[-1][0] - 1:
+            row[-1] = (min(lo, row[-1][0]), max(hi, row[-1][1]))
+        else:
+            row.append((lo, hi))
+    return np.array([(y, lo, hi) for y, row in rows.items() for lo, hi in row], dtype=np.int32).reshape(-1, 3)
+
+
+def _paint_spans(buf, x0, y0, spans, color):
+    h, w = buf.shape[:2]
+    row = _color_row(w, color)
+    for y, lo, hi in spans.tolist():
+        y += y0
+        lo, hi = max(lo + x0, 0), min(hi + x0 + 1, w)
+        if 0 <= y < h and lo < hi:
+            buf[y, lo:hi] = row[lo:hi]
+
+
+def circle(buf, cx, cy, radius, fill=None, outline=None, width=1):
+    """
+    Círculo con relleno y/o contorno de grosor `width`, con los mismos píxeles
+    que ImageDraw.ellipse([cx - r, cy - r, cx + r, cy + r], ...): la caja se
+    trunca a enteros como en Pillow (incluye su borde derecho e inferior) y los
+    tramos de cada fila salen del mismo recorrido (_ellipse_spans).
+    """
+    x0, y0 = int(cx - radius), int(cy - radius)
+    a, b = int(cx + radius) - x0, int(cy + radius) - y0
+    if a < 0 or b < 0:
+        return
+    if fill is not None:
+        _paint_spans(buf, x0, y0, _ellipse_spans(a, b, a + b), fill)
+    if outline is not None and width != 0 and tuple(outline) != (tuple(fill) if fill is not None else None):
+        _paint_spans(buf, x0, y0, _ellipse_spans(a, b, width), outline)
+
+
+def fill_between(buf, xs, top, bottom, color, background=(0, 0, 0)):
+    """
+    Rellena, para una curva por columnas (xs crecientes), la franja entre top y
+    bottom: el polígono de una envolvente min/max, como ImageDraw.polygon con
+    relleno y contorno del mismo color. Entre dos puntos la franja se extiende
+    hasta la mitad del salto, igual que el borde del polígono. Pinta el buffer
+    entero (ver column_spans).
+    """
+    h, w = buf.shape[:2]
+    xs = np.asarray(xs, dtype=np.float64)
+    lo = np.full(w, h, dtype=np.int64)
+    hi = np.full(w, -1, dtype=np.int64)
+    if len(xs):
+        cols = np.arange(max(int(np.ceil(xs[0])), 0), min(int(np.floor(xs[-1])), w - 1) + 1)
+    else:
+        cols = np.arange(0)
+    if len(cols):
+        a = np.interp(cols, xs, top)
+        b = np.interp(cols, xs, bottom)
+        a, b = np.minimum(a, b), np.maximum(a, b)
+        # Cada columna llega hasta la mitad del camino hacia sus vecinas
+        if len(cols) > 1:
+            mid_a, mid_b = (a[1:] + a[:-1]) / 2, (b[1:] + b[:-1]) / 2
+            a[1:] = np.minimum(a[1:], mid_a)
+            a[:-1] = np.minimum(a[:-1], mid_a)
+            b[1:] = np.maximum(b[1:], mid_b)
+            b[:-1] = np.maximum(b[:-1], mid_b)
+        lo[cols] = np.round(a)
+        hi[cols] = np.round(b)
+    column_spans(buf, lo, hi, color, background)
+
+
+def polyline(buf, xs, ys, color, width=1.0):
+    """
+    Línea poligonal con antialiasing por los puntos (xs, ys), con xs crecientes
+    (una curva y(x), como la de un espectro o una onda), de grosor `width`.
+
+    Para cada columna se acota el rango de filas al que llega la línea (más el
+    grosor); solo esos píxeles se evalúan, con la distancia al segmento más
+    cercano como cobertura, y se mezclan con lo que ya hay en el buffer.
+    """
+    h, w = buf.shape[:2]
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    if len(xs) < 2:
+        return
+    reach = width / 2 + 1.0
+    col0 = max(int(np.floor(xs[0] - reach)), 0)
+    col1 = min(int(np.ceil(xs[-1] + reach)) + 1, w)
+    if col0 >= col1:
+        return
+    px = np.arange(col0, col1, dtype=np.float64)
+
+    # Segmentos [first, last] que pasan a menos de `reach` de cada columna
+    n_seg = len(xs) - 1
+    first = np.clip(np.searchsorted(xs[1:], px - reach, side="left"), 0, n_seg - 1)
+    last = np.clip(np.searchsorted(xs[:-1], px + reach, side="right") - 1, 0, n_seg - 1)
+    last = np.maximum(last, first)
+    depth = int((last - first).max()) + 1
+    # Filas que cubren esos segmentos: los extremos de la ventana de la columna
+    # y los vértices que caen dentro de ella, más el grosor
+    left, right = np.interp(px - reach, xs, ys), np.interp(px + reach, xs, ys)
+    lo, hi = np.minimum(left, right), np.maximum(left, right)
+    for offset in range(1, depth + 1):
+        vertex = np.minimum(first + offset, last + 1)
+        inside = np.abs(xs[vertex] - px) <= reach
+        lo = np.where(inside, np.minimum(lo, ys[vertex]), lo)
+        hi = np.where(inside, np.maximum(hi, ys[vertex]), hi)
+    lo = np.clip(np.floor(lo - reach), 0, h).astype(np.int64)
+    hi = np.clip(np.ceil(hi + reach), -1, h - 1).astype(np.int64)
+
+    # Píxeles candidatos aplanados: en cada columna las filas [lo, hi]. Todo lo
+    # que depende solo de la columna se calcula por columna y se repite.
+    counts = np.maximum(hi - lo + 1, 0)
+    total = int(counts.sum())
+    if total == 0:
+        return
+    rows = np.arange(total)
+    rows -= np.repeat(np.cumsum(counts) - counts - lo, counts)
+    y = rows.astype(np.float32)
+    distance2 = np.full(total, np.inf, dtype=np.float32)
+    for offset in range(depth):
+        k = np.minimum(first + offset, last)
+        sx, sy = xs[k + 1] - xs[k], ys[k + 1] - ys[k]
+        inv_len2 = 1.0 / np.maximum(sx * sx + sy * sy, 1e-12)
+        ex = px - xs[k]
+        # Proyección del píxel sobre el segmento k: t = t0 + t1 * y en cada columna
+        t0 = (ex * sx - ys[k] * sy) * inv_len2
+        t1 = sy * inv_len2
+        t = np.repeat(t1.astype(np.float32), counts)
+        t *= y
+        t += np.repeat(t0.astype(np.float32), counts)
+        np.clip(t, 0.0, 1.0, out=t)
+        # Distancia² al punto proyectado
+        gx = np.repeat(sx.astype(np.float32), counts)
+        gx *= t
+        gx -= np.repeat(ex.astype(np.float32), counts)
+        t *= np.repeat(sy.astype(np.float32), counts)
+        t += np.repeat(ys[k].astype(np.float32), counts)
+        t -= y
+        gx *= gx
+        t *= t
+        gx += t
+        np.minimum(distance2, gx, out=distance2)
+    distance = np.sqrt(distance2)
+
+    alpha = np.clip(width / 2 + 0.5 - distance, 0.0, 1.0)
+    hit = np.flatnonzero(alpha > 0)
+    pixel = rows[hit] * w
+    pixel += np.repeat(np.arange(col0, col1), counts)[hit]
+    alpha = alpha[hit][:, None]
+    # Leer con take y escribir como elementos de 3 bytes (void): mucho más
+    # rápido que indexar filas (N, 3)
+    flat = buf.reshape(-1, 3)
+    pixels = np.take(flat, pixel, axis=0).astype(np.float32)
+    blended = (pixels + alpha * (np.asarray(color, dtype=np.float32) - pixels) + 0.5).astype(np.uint8)
+    rgb = np.dtype((np.void, 3))
+    flat.view(rgb)[:, 0][pixel] = blended.view(rgb)[:, 0]
+
+
+def _disc_stencil(diameter):
+    # Desplazamientos (fila, columna) de un disco de `diameter` píxeles desde
+    # la esquina superior izquierda de su caja
+    u = np.arange(diameter) - (diameter - 1) / 2
+    rows, cols = np.nonzero(u[:, None] ** 2 + u[None, :] ** 2 <= (diameter / 2) ** 2 + 0.25)
+    return rows, cols
+
+
+def _scratch(name, shape, dtype):
+    """
+    Array de trabajo `name` del hilo actual, reutilizado entre llamadas (crece
+    si hace falta). En splat_discs, con 100k discos, pedir memoria nueva para
+    cada temporal (fallos de página incluidos) cuesta más que el cálculo.
+    """
+    arrays = getattr(_buffers, "scratch", None)
+    if arrays is None:
+        arrays = _buffers.scratch = {}
+    size = shape[0] * shape[1] if isinstance(shape, tuple) else int(shape)
+    arr = arrays.get(name)
+    if arr is None or arr.dtype != dtype or len(arr) < size:
+        arr = arrays[name] = np.empty(size + size // 4, dtype=dtype)
+    return arr[:size].reshape(shape)
+
+
+def _single_pixel_taps(cx, cy, packed, h, w):
+    # Discos de un píxel: el píxel de cada centro, sin plantillas. Los que caen
+    # fuera del buffer pasan a sumar 0 al píxel 0 (en vez de quitarlos con
+    # compress, que copia los dos arrays)
+    n = len(cx)
+    rows = np.round(cy, out=_scratch("rows", n, np.float64))
+    cols = np.round(cx, out=_scratch("cols", n, np.float64))
+    valid = np.greater_equal(rows, 0, out=_scratch("valid", n, bool))
+    inside = _scratch("inside", n, bool)
+    valid &= np.less(rows, h, out=inside)
+    valid &= np.greater_equal(cols, 0, out=inside)
+    valid &= np.less(cols, w, out=inside)
+    rows *= w
+    rows += cols
+    outside = np.logical_not(valid, out=inside)
+    np.copyto(rows, 0.0, where=outside)
+    np.copyto(packed, 0.0, where=outside)
+    taps = _scratch("taps", n, np.int64)
+    taps[:] = rows
+    return taps, packed
+
+
+def _stencil_taps(cx, cy, diameter, packed, h, w):
+    # Discos de varios tamaños: por grupos del mismo diámetro en píxeles, cada
+    # uno con su plantilla
+    pixels = np.maximum(np.round(diameter), 1).astype(np.int64)
+    taps, values = [], []
+    for size in np.flatnonzero(np.bincount(pixels)):
+        group = np.flatnonzero(pixels == size)
+        # Esquina superior izquierda de la caja de cada disco del grupo
+        row0 = np.round(cy[group] - (size - 1) / 2)
+        col0 = np.round(cx[group] - (size - 1) / 2)
+        d_rows, d_cols = _disc_stencil(size)
+        rows = (row0[:, None] + d_rows[None, :]).ravel()
+        cols = (col0[:, None] + d_cols[None, :]).ravel()
+        valid = (rows >= 0) & (rows < h) & (cols >= 0) & (cols < w)
+        taps.append((rows * w + cols)[valid].astype(np.int64))
+        values.append(np.repeat(packed[group], len(d_rows))[valid])
+    return np.concatenate(taps), np.concatenate(values)
+
+
+def _sum_by_pixel(taps, values):
+    # Píxeles distintos (en orden de memoria) y la suma de sus valores. Se
+    # ordena una sola clave por toque, píxel y posición empaquetados, en vez de
+    # np.unique con return_inverse (un argsort, varias veces más lento); la
+    # posición dice de qué valor es cada toque y cada tramo de píxeles iguales
+    # se suma con reduceat
+    n = len(taps)
+    bits = n.bit_length()
+    index = getattr(_buffers, "index", None)
+    if index is None or len(index) < n:
+        index = _buffers.index = np.arange(n + n // 4)
+    taps <<= bits
+    taps |= index[:n]
+    taps.sort()
+    order = np.bitwise_and(taps, (1 << bits) - 1, out=_scratch("order", n, np.int64))
+    taps >>= bits
+    first = _scratch("first", n, bool)
+    first[0] = True
+    np.not_equal(taps[1:], taps[:-1], out=first[1:])
+    starts = np.flatnonzero(first)
+    m = len(starts)
+    ordered = np.take(values, order, out=_scratch("ordered", n, np.float64))
+    total = np.add.reduceat(ordered, starts, out=_scratch("total", m, np.float64))
+    return np.take(taps, starts, out=_scratch("pixel", m, np.int64)), total
+
+
+def splat_discs(buf, cx, cy, diameter, colors):
+    """
+    Suma al buffer discos de color centrados en (cx, cy) (arrays de n), con
+    saturación a 255: donde se solapan, se suman. Un disco de menos de un píxel
+    es un solo píxel con su área como cobertura (su color atenuado), así que el
+    brillo no salta al cruzar ese tamaño.
+
+    Los discos se convierten en píxeles tocados (si todos son de un píxel,
+    directamente; si no, por grupos del mismo diámetro, cada uno con su
+    plantilla) y la suma por píxel va con los tres canales empaquetados en un
+    entero: 17 bits por canal, exacto mientras no coincidan más de 514 discos
+    de brillo máximo en el mismo píxel. Solo se leen y escriben los píxeles
+    tocados (un np.bincount sobre el frame entero, 2M píxeles a 1080p, cuesta
+    más que todo lo demás con 100k discos) y los temporales son de _scratch.
+    """
+    h, w = buf.shape[:2]
+    cx = np.asarray(cx, dtype=np.float64)
+    cy = np.asarray(cy, dtype=np.float64)
+    diameter = np.asarray(diameter, dtype=np.float64)
+    n = len(cx)
+    if n == 0:
+        return
+
+    # Color de cada disco (los de menos de un píxel, atenuados); en float32 es
+    # exacto (enteros de 8 bits) y mueve la mitad de memoria
+    coverage = np.minimum(diameter, 1.0, out=_scratch("coverage", n, np.float32))
+    coverage *= coverage
+    channels = np.clip(colors, 0.0, 255.0, out=_scratch("channels", (n, 3), np.float32))
+    channels *= coverage[:, None]
+    channels += 0.5
+    np.floor(channels, out=channels)
+    packed = np.matmul(channels, _PACK_SHIFTS, out=_scratch("packed", n, np.float64))
+
+    if diameter.max() < 1.5:
+        taps, values = _single_pixel_taps(cx, cy, packed, h, w)
+    else:
+        taps, values = _stencil_taps(cx, cy, diameter, packed, h, w)
+    if len(taps) == 0:
+        return
+
+    pixel, total = _sum_by_pixel(taps, values)
+    m = len(pixel)
+    packed_total = _scratch("packed_total", m, np.int64)
+    packed_total[:] = total
+    # Cada canal se satura antes de sumarlo al buffer, así cabe en uint16
+    added = _scratch("added", (m, 3), np.uint16)
+    channel = _scratch("channel", m, np.int64)
+    for c, shift in enumerate((34, 17, 0)):
+        np.right_shift(packed_total, shift, out=channel)
+        channel &= 0x1FFFF
+        np.minimum(channel, 255, out=added[:, c], casting="unsafe")
+    flat = buf.reshape(-1, 3)
+    current = np.take(flat, pixel, axis=0, out=_scratch("current", (m, 3), np.uint8))
+    added += current
+    np.minimum(added, 255, out=added)
+    current[:] = added
+    rgb = np.dtype((np.void, 3))
+    flat.view(rgb)[:, 0][pixel] = current.view(rgb)[:, 0]
@@ -0,0 +1,277 @@
+import os
+import time
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from analysis_cache import AnalysisCache
+from audio_analysis import SharedRowBuffer, SharedSegment, DiskRowBuffer
+from track_analyzer import TrackAnalyzer, AnalysisCancelled
+from waveform import WaveformPyramid
+
+# Cada cuánto el proceso principal mira el progreso del trabajador
+POLL_SECONDS = 0.02
+
+# Bloque de control compartido (float64): frames listos, ref_db, bandera de
+# cancelación y entradas listas del nivel 0 de la forma de onda
+_CTRL_FRAMES, _CTRL_REF, _CTRL_CANCEL, _CTRL_WAVE = 0, 1, 2, 3
+_CTRL_SIZE = 4
+
+_executor = None
+
+
+def _warm_up():
+    # Importar (y ejercitar) librosa y compañía por adelantado: el primer análisis no paga ese coste
+    from audio_analysis import StreamingSTFT, log_band_filterbank
+    StreamingSTFT().push(np.zeros(4096, dtype=np.float32))
+    log_band_filterbank(22050, 2048)
+    return True
+
+
+def get_executor():
+    """Proceso de análisis compartido (uno solo, se crea bajo demanda y queda caliente)."""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+        _executor.submit(_warm_up)
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _analyze_job(filepath, settings, cache_dir, cache_max_mb, ctrl_name, table_names, rows, table_folder):
+    """Se ejecuta en el proceso trabajador. Devuelve solo metadatos pequeños."""
+    # Cada bloque se cierra solo cuando caen las vistas del análisis (ver SharedSegment)
+    shared = {table: SharedSegment(shared_memory.SharedMemory(name=name)) for table, name in table_names.items()}
+    ctrl = SharedSegment(shared_memory.SharedMemory(name=ctrl_name)).array((_CTRL_SIZE,), np.float64)
+
+    cache = AnalysisCache(cache_dir, max_size_mb=cache_max_mb) if cache_dir else None
+    analyzer = TrackAnalyzer(filepath, cache=cache, shared_buffers=(shared, rows), table_folder=table_folder,
+                             **settings)
+
+    def publish(_fraction=None):
+        # Primero la referencia y después los frames: el lector nunca ve frames sin su ref
+        ctrl[_CTRL_REF] = float(analyzer.ref_db)
+        ctrl[_CTRL_FRAMES] = analyzer.frames_ready if table_folder else min(analyzer.frames_ready, rows)
+        if analyzer.waveform is not None:
+            ctrl[_CTRL_WAVE] = analyzer.waveform.count
+
+    try:
+        analyzer.run(should_cancel=lambda: ctrl[_CTRL_CANCEL] != 0, on_progress=publish)
+        if not analyzer.from_cache:
+            publish()
+        return {
+            "frames": analyzer.frames_ready if table_folder else min(analyzer.frames_ready, rows),
+            "duration": analyzer.duration,
+            "ref_db": float(analyzer.ref_db),
+            "wave_entries": analyzer.waveform.count,
+            "truncated": analyzer.truncated,
+            # Fuera de memoria la entrada la publica el proceso principal; nunca se guarda truncada
+            "in_cache": cache is not None and not analyzer.truncated and (analyzer.from_cache or not table_folder),
+        }
+    except AnalysisCancelled:
+        return {"cancelled": True}
+    finally:
+        # Soltar ya los memory-map de table_folder: el proceso principal va a renombrarla
+        analyzer.release()
+
+
+class SubprocessTrackAnalyzer(TrackAnalyzer):
+    """
+    TrackAnalyzer que decodifica y transforma en un proceso aparte, así el
+    análisis no compite por el GIL con la UI ni con el dibujado.
+
+    El proceso principal reserva las tablas de bandas, el espectrograma y el
+    nivel 0 de la forma de onda en multiprocessing.shared_memory; el trabajador
+    escribe ahí directamente y publica el progreso en un pequeño bloque de
+    control, así que no se serializa ningún array grande.
+    Fuera de memoria (pistas largas) no hay nada compartido en RAM: el
+    trabajador escribe las tablas en disco (DiskRowBuffer), en una entrada de la
+    caché a medio escribir o en una carpeta temporal, y este proceso las lee
+    con memory-map; al terminar publica la entrada.
+    """
+
+    def __init__(self, filepath, cache=None, **settings):
+        settings["streaming"] = True # El trabajador siempre analiza por bloques
+        super().__init__(filepath, cache=cache, **settings)
+        self._settings = settings
+        self._shm = []
+        self._released = False
+        self._in_process = False # Pista sin duración conocida: se analiza aquí (ver _analyze_streaming)
+
+    def _create_shm(self, size):
+        shm = shared_memory.SharedMemory(create=True, size=max(1, int(size)))
+        self._shm.append(shm) # Para el unlink en _release_shared
+        return SharedSegment(shm)
+
+    def _store_in_cache(self):
+        if self._in_process:
+            super()._store_in_cache()
+        # Si no, lo hace el proceso trabajador
+
+    def _analyze_streaming(self, on_ready, should_cancel, on_progress):
+        if self._released or (should_cancel and should_cancel()):
+            raise AnalysisCancelled(self.filepath)
+        # Solo consultar la duración (sin decodificar) para dimensionar las tablas;
+        # también fija sr, n_fft y hop_length igual que hará el trabajador
+        estimated = self.open_stream().estimated_samples
+        if estimated is None:
+            # Sin duración no se pueden dimensionar las tablas compartidas (no
+            # crecen): analizar en este proceso, con tablas que sí crecen
+            print("[ENGINE LOG] Unknown track length, analyzing in-process")
+            self._in_process = True
+            return super()._analyze_streaming(
+                on_ready, lambda: self._released or bool(should_cancel and should_cancel()), on_progress)
+        print("Iniciando análisis en proceso separado...")
+        n_frames = 1 + estimated // self.hop_length
+        rows = n_frames + n_frames // 50 + 64 # Margen por si la estimación se queda corta
+        self.duration = estimated / self.sr
+        out_of_core = self.out_of_core_seconds is not None and self.duration >= self.out_of_core_seconds
+
+        ctrl_segment = self._create_shm(_CTRL_SIZE * 8)
+        ctrl = ctrl_segment.array((_CTRL_SIZE,), np.float64)
+        ctrl[:] = 0
+        table_names = {}
+        folder = entry_key = None
+        if out_of_core:
+            # El trabajador escribe todas las tablas a disco (ver _map_folder)
+            if self.cache is not None:
+                entry_key = self.cache_key()
+                folder = self.cache.begin_entry(entry_key)
+            else:
+                folder = self._scratch_dir = tempfile.mkdtemp(prefix="music_visual_")
+            wave_rows = WaveformPyramid.rows_for(estimated)
+            wave = self.waveform = WaveformPyramid(self.sr)
+        else:
+            for name, width, dtype in self._tables():
+                segment = self._create_shm(rows * width * np.dtype(dtype).itemsize)
+                setattr(self, name, segment.array((rows, width), dtype))
+                table_names[name] = segment.name
+            wave_rows = WaveformPyramid.rows_for(rows * self.hop_length)
+            wave_segment = self._create_shm(wave_rows * 2 * 4)
+            # Referencia local: release puede vaciar self.waveform mientras se sondea
+            wave = self.waveform = WaveformPyramid(self.sr, buffer=SharedRowBuffer(wave_segment, wave_rows, 2, np.float32))
+            table_names["waveform"] = wave_segment.name
+
+        cache_dir = self.cache.cache_dir if self.cache is not None else None
+        cache_mb = self.cache.max_bytes / (1024 * 1024) if self.cache is not None else 0
+        future = get_executor().submit(
+            _analyze_job, self.filepath, self._settings, cache_dir, cache_mb,
+            ctrl_segment.name, table_names, rows, folder
+        )
+
+        ready = False
+        while True:
+            if self._released or (should_cancel and should_cancel()):
+                ctrl[_CTRL_CANCEL] = 1
+            frames = int(ctrl[_CTRL_FRAMES])
+            if self._released:
+                pass # Nada que publicar: solo esperar a que el trabajador lo deje
+            elif folder is None:
+                frames = min(frames, rows)
+                wave.count = min(int(ctrl[_CTRL_WAVE]), wave_rows)
+            elif frames > 0:
+                self._map_folder(folder, wave, frames, int(ctrl[_CTRL_WAVE]), n_frames, wave_rows)
+            if not self._released:
+                self.ref_db = np.float32(ctrl[_CTRL_REF])
+                self.frames_ready = frames
+            if frames > 0:
+                if on_progress:
+                    on_progress(min(1.0, frames / n_frames))
+                if not ready:
+                    ready = True
+                    if on_ready:
+                        on_ready()
+            if future.done():
+                break
+            time.sleep(POLL_SECONDS)
+
+        del ctrl
+        try:
+            result = future.result() # Propaga errores del trabajador
+        except Exception:
+            self._discard_entry(entry_key, folder)
+            self._release_shared()
+            raise
+        if result.get("cancelled") or self._released:
+            self._discard_entry(entry_key, folder)
+            self._release_shared()
+            raise AnalysisCancelled(self.filepath)
+
+        self.duration = result["duration"]
+        if result["in_cache"] and self.load_cached():
+            # Las tablas definitivas ya están en la caché (memory-map): soltar la memoria compartida
+            self.from_cache = False
+            self._release_shared()
+            self._discard_entry(entry_key, folder)
+        elif folder is not None:
+            self.ref_db = np.float32(result["ref_db"])
+            self._adopt_folder(folder, entry_key)
+        else:
+            frames = min(result["frames"], rows)
+            if result["truncated"]:
+                print("[ENGINE LOG] Track longer than estimated, the end was not analyzed")
+            self.ref_db = np.float32(result["ref_db"])
+            wave.count = min(result["wave_entries"], wave_rows)
+            wave.finish()
+            for name, _, _ in self._tables():
+                setattr(self, name, getattr(self, name)[:frames])
+            self.frames_ready = frames
+
+        if not ready and on_ready:
+            on_ready()
+
+    def _map_folder(self, folder, wave, frames, wave_count, n_frames, wave_rows):
+        """
+        Lee (memory-map) lo que el trabajador lleva escrito en `folder`. Los
+        archivos se reservan con la duración estimada, así que solo se vuelven
+        a mapear si la pista resulta más larga.
+        """
+        for name, width, dtype in self._tables():
+            table = getattr(self, name)
+            if table is None or len(table) < frames:
+                path = os.path.join(folder, f"{name}.npy")
+                setattr(self, name, DiskRowBuffer.map_rows(path, max(frames, n_frames), width, dtype))
+        if wave_count > 0:
+            if not isinstance(wave.base, np.memmap) or len(wave.base) < wave_count:
+                path = os.path.join(folder, "waveform.npy")
+                wave.base = DiskRowBuffer.map_rows(path, max(wave_count, wave_rows), 2, np.float32)
+            wave.count = wave_count
+
+    def _adopt_folder(self, folder, entry_key):
+        """Tablas terminadas que el trabajador escribió en `folder`; con caché, la publica como entrada."""
+        for name, _, _ in self._tables():
+            setattr(self, name, np.load(os.path.join(folder, f"{name}.npy"), mmap_mode='r'))
+        self.waveform = WaveformPyramid.from_base(np.load(os.path.join(folder, "waveform.npy"), mmap_mode='r'), self.sr)
+        self.frames_ready = len(self.bands_db)
+        if entry_key is not None:
+            names = [name for name, _, _ in self._tables()] + ["waveform"]
+            if not self.cache.finish_entry(entry_key, folder, names, self._cache_meta()):
+                self._scratch_dir = folder # Sigue siendo nuestra: se borra en release
+
+    def _discard_entry(self, entry_key, folder):
+        # La carpeta temporal sin cache se borra en release (es _scratch_dir)
+        if entry_key is not None:
+            self.cache.abort_entry(folder)
+
+    def _release_shared(self):
+        # Solo el nombre: cada bloque se desmapea cuando cae su última vista
+        # (un lector o una instantánea pueden seguir usándolo, ver SharedSegment)
+        for shm in self._shm:
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+        self._shm = []
+
+    def release(self):
+        # Si el trabajador sigue analizando, el bucle de sondeo lo cancela
+        self._released = True
+        super().release()
+        self._release_shared()
@@ -0,0 +1,36 @@
+"""
+Tiempo por frame de "Cosmic Particles" (visualizer.render_frame, un hilo).
+
+    python tests/bench_particles.py [partículas] [ancho] [alto]
+
+Por defecto 100k partículas a 1080p; para 60 FPS la mediana tiene que quedar
+por debajo de 16.7 ms.
+"""
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import visualizer
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    width = int(sys.argv[2]) if len(sys.argv) > 2 else 1920
+    height = int(sys.argv[3]) if len(sys.argv) > 3 else 1080
+    visualizer.PARTICLE_COUNT = count
+    out = np.empty((height, width, 3), dtype=np.uint8)
+    data = np.random.default_rng(0).random(64).astype(np.float32)
+    times = []
+    for i in range(305):
+        start = time.perf_counter()
+        visualizer.render_frame(out, data, "Cosmic Particles", t=i / 60, features={"travel": i * 3.0})
+        times.append(time.perf_counter() - start)
+    times = np.array(times[5:]) * 1000 # Los primeros crean el sistema y los buffers
+    print(f"{count} particles at {width}x{height}: median {np.median(times):.2f} ms, "
+          f"p95 {np.percentile(times, 95):.2f} ms ({1000 / np.median(times):.0f} FPS)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import threading
+import time
+from analysis_scheduler import AnalysisScheduler
+from track_analyzer import AnalysisCancelled
+
+# Bloques de un análisis falso y lo que tarda cada uno (~0.3 s en total); los
+# primeros frames están tras READY_CHUNKS (~0.1 s, más que entre dos clics)
+CHUNKS = 30
+READY_CHUNKS = 10
+CHUNK_SECONDS = 0.01
+
+
+class FakeAnalyzer:
+    """Imita TrackAnalyzer.run: consulta should_cancel en cada bloque y avisa tras READY_CHUNKS."""
+
+    def __init__(self, name):
+        self.name = name
+        self.done = threading.Event()
+        self.chunks = 0
+        self.finished = False
+        self.cancelled = False
+
+    def run(self, on_ready=None, should_cancel=None, on_progress=None):
+        try:
+            for _ in range(CHUNKS):
+                if should_cancel and should_cancel():
+                    self.cancelled = True
+                    raise AnalysisCancelled(self.name)
+                time.sleep(CHUNK_SECONDS)
+                self.chunks += 1
+                if self.chunks == READY_CHUNKS and on_ready:
+                    on_ready()
+            self.finished = True
+        finally:
+            self.done.set()
+
+
+def wait_all(analyzers, timeout=10):
+    for analyzer in analyzers:
+        assert analyzer.done.wait(timeout), f"{analyzer.name} no terminó"
+
+
+def test_burst_of_submits_runs_at_most_one_full_analysis():
+    scheduler = AnalysisScheduler()
+    analyzers = [FakeAnalyzer(f"pista {i}") for i in range(20)]
+    ready = []
+    lock = threading.Lock()
+
+    def on_ready(name):
+        with lock:
+            ready.append(name)
+
+    # 20 clics en un segundo
+    for analyzer in analyzers:
+        scheduler.submit(analyzer, on_ready=lambda name=analyzer.name: on_ready(name))
+        time.sleep(1 / 20)
+    wait_all(analyzers)
+
+    assert scheduler.completed <= 1
+    assert [a.name for a in analyzers if a.finished] == ["pista 19"]
+    assert ready == ["pista 19"]
+    # Ninguno de los viejos llegó al final: o no arrancó o se canceló en un bloque
+    assert all(a.chunks < CHUNKS for a in analyzers[:-1])
+    assert scheduler.completed + scheduler.cancelled + scheduler.skipped == len(analyzers)
+
+
+def test_cancel_stops_the_running_job_without_publishing():
+    scheduler = AnalysisScheduler()
+    analyzer = FakeAnalyzer("pista")
+    ready = []
+    scheduler.submit(analyzer, on_ready=lambda: ready.append(True))
+    time.sleep(CHUNK_SECONDS * 5)
+    scheduler.cancel()
+    wait_all([analyzer])
+
+    assert analyzer.cancelled and not analyzer.finished
+    assert scheduler.completed == 0
+
+
+def test_submit_cancels_running_prefetch():
+    scheduler = AnalysisScheduler()
+    prefetch = FakeAnalyzer("siguiente")
+    scheduler.prefetch(prefetch)
+    time.sleep(CHUNK_SECONDS * 5) # El prefetch ya arrancó (no había otro trabajo)
+    current = FakeAnalyzer("seleccionada")
+    ready = []
+    scheduler.submit(current, on_ready=lambda: ready.append(True))
+    wait_all([prefetch, current])
+
+    assert 0 < prefetch.chunks < CHUNKS and prefetch.cancelled
+    assert current.finished and ready == [True]
+    assert scheduler.completed == 1
+
+
+def test_prefetch_waits_for_current_job():
+    scheduler = AnalysisScheduler()
+    current = FakeAnalyzer("seleccionada")
+    prefetch = FakeAnalyzer("siguiente")
+    order = []
+    scheduler.submit(current, on_ready=lambda: order.append(prefetch.chunks))
+    scheduler.prefetch(prefetch)
+    wait_all([current, prefetch])
+
+    # Cuando la seleccionada estuvo lista el prefetch aún no había empezado
+    assert order == [0]
+    assert current.finished and prefetch.finished
+    assert scheduler.completed == 2
+
+
+def test_newer_prefetch_replaces_waiting_one():
+    scheduler = AnalysisScheduler()
+    current = FakeAnalyzer("seleccionada")
+    scheduler.submit(current)
+    stale = FakeAnalyzer("siguiente vieja")
+    scheduler.prefetch(stale)
+    fresh = FakeAnalyzer("siguiente")
+    scheduler.prefetch(fresh)
+    wait_all([current, stale, fresh])
+
+    assert stale.chunks == 0 and not stale.finished
+    assert fresh.finished
+    assert scheduler.skipped == 1
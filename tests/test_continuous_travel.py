@@ -0,0 +1,44 @@
+from audio_features import ContinuousTravel, TRAVEL_FPS
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_starts_at_zero_and_follows_the_clock_without_feature():
+    fake = FakeClock()
+    travel = ContinuousTravel(clock=fake)
+    assert travel(None) == 0.0
+    fake.now += 0.5
+    assert travel(None) == 0.5 * TRAVEL_FPS
+
+
+def test_no_jump_when_the_feature_arrives_or_the_track_changes():
+    fake = FakeClock()
+    travel = ContinuousTravel(clock=fake)
+    first, second = object(), object() # FeatureStore de dos pistas
+    travel(None)
+    fake.now += 2.0
+    before = travel(None)
+    # La característica llega a mitad de pista, muy lejos del valor del reloj
+    assert travel(5000.0, first) == before
+    assert travel(5003.0, first) == before + 3.0
+    # Siguiente pista: vuelve a empezar desde 0, pero no se ve el salto
+    assert travel(0.0, second) == before + 3.0
+    assert travel(1.0, second) == before + 4.0
+    # Se pierde (entrada en vivo): sigue con el reloj desde ahí
+    fake.now += 1.0
+    assert travel(None) == before + 4.0
+    fake.now += 1.0
+    assert travel(None) == before + 4.0 + TRAVEL_FPS
+
+
+def test_seek_within_a_track_still_moves():
+    travel = ContinuousTravel(clock=FakeClock())
+    store = object()
+    travel(100.0, store)
+    assert travel(40.0, store) == travel(100.0, store) - 60.0
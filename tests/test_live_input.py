@@ -0,0 +1,63 @@
+import time
+import numpy as np
+import soundfile as sf
+from audio_analysis import log_band_filterbank, normalize_db
+from live_input import LiveInput, FileCapture
+from track_analyzer import TrackAnalyzer
+
+SR = 44100
+TONE_HZ = 1000.0
+SECONDS = 1.5
+# Los parámetros por defecto de AudioEngine
+TARGET_SR, N_FFT, N_BANDS = 22050, 2048, 64
+BAND_SMOOTHING = (0.005, 0.12)
+# Presupuesto de latencia del análisis en vivo
+LATENCY_BUDGET = 0.020
+
+
+def write_sine(path):
+    t = np.arange(int(SR * SECONDS)) / SR
+    sf.write(path, (0.5 * np.sin(2 * np.pi * TONE_HZ * t)).astype(np.float32), SR)
+
+
+def expected_band():
+    """Banda que más pesa el bin del tono en el reparto de bandas del análisis de archivos."""
+    filterbank = log_band_filterbank(TARGET_SR, N_FFT, N_BANDS, fmax=TARGET_SR / 2)
+    return int(np.argmax(filterbank[int(round(TONE_HZ * N_FFT / TARGET_SR))]))
+
+
+def file_mode_bands(path):
+    """Lo que devuelve get_audio_data en modo archivo a mitad del tono."""
+    analyzer = TrackAnalyzer(path, sr=TARGET_SR, n_fft=N_FFT, n_bands=N_BANDS, band_smoothing=BAND_SMOOTHING)
+    analyzer.run()
+    return normalize_db(analyzer.display_bands[analyzer.frames_ready // 2], analyzer.ref_db)
+
+
+def test_live_input_matches_file_bands_within_latency_budget(tmp_path):
+    path = str(tmp_path / "sine.wav")
+    write_sine(path)
+    expected = file_mode_bands(path)
+
+    live = LiveInput(FileCapture(path), target_sr=TARGET_SR, n_fft=N_FFT, n_bands=N_BANDS,
+                     band_smoothing=BAND_SMOOTHING)
+    live.start()
+    try:
+        time.sleep(0.3) # Más que la ventana de la FFT y que el suavizado
+        frames, latencies, compute = [], [], []
+        for _ in range(30): # Medio segundo leyendo a 60 FPS
+            start = time.perf_counter()
+            frames.append(live.bands())
+            compute.append(time.perf_counter() - start)
+            latencies.append(live.latency)
+            time.sleep(1 / 60)
+    finally:
+        live.stop()
+
+    bands = frames[-1]
+    assert bands.shape == expected.shape == (N_BANDS,)
+    assert int(np.argmax(expected)) == expected_band()
+    assert all(int(np.argmax(f)) == expected_band() for f in frames)
+    # Tono estable: mismas bandas que el archivo, no solo el mismo pico
+    assert np.abs(bands - expected).max() < 0.05
+    assert np.percentile(latencies, 95) < LATENCY_BUDGET, latencies
+    assert np.median(compute) < LATENCY_BUDGET
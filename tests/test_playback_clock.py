@@ -0,0 +1,76 @@
+import numpy as np
+from playback_clock import PlaybackClock
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def run(clock, fake, mixer, seconds, step=1 / 60):
+    """Avanza `seconds` sincronizando cada frame con mixer(tiempo real); devuelve las posiciones."""
+    times = []
+    for _ in range(int(seconds / step)):
+        fake.now += step
+        clock.sync(mixer(fake.now))
+        times.append(clock.time())
+    return np.array(times)
+
+
+def test_negative_error_never_moves_backward():
+    fake = FakeClock()
+    clock = PlaybackClock(clock=fake)
+    clock.start(10.0)
+    start = fake.now
+    # El mezclador va 80 ms por detrás y llega a saltos de 20 ms
+    mixer = lambda now: np.floor((now - start - 0.08) / 0.02) * 0.02 + 10.0
+    times = run(clock, fake, mixer, 3.0)
+    assert (np.diff(times) >= 0).all()
+    assert abs(clock.error) < 0.02
+
+
+def test_clock_ahead_by_more_than_max_error_holds():
+    fake = FakeClock()
+    clock = PlaybackClock(clock=fake)
+    clock.start(5.0)
+    start = fake.now
+    mixer = lambda now: now - start + 4.5 # Medio segundo por detrás (p. ej. se atascó)
+    times = run(clock, fake, mixer, 2.0)
+    assert (np.diff(times) >= 0).all()
+    assert abs(times[-1] - mixer(fake.now)) < 0.02
+
+
+def test_clock_behind_by_more_than_max_error_jumps_forward():
+    fake = FakeClock()
+    clock = PlaybackClock(clock=fake)
+    clock.start(0.0)
+    fake.now += 0.1
+    clock.sync(2.0)
+    assert clock.time() == 2.0
+
+
+def test_seek_and_start_move_backward():
+    fake = FakeClock()
+    clock = PlaybackClock(clock=fake)
+    clock.start(30.0)
+    fake.now += 1.0
+    clock.seek(3.0)
+    assert clock.time() == 3.0
+    clock.start(1.0)
+    assert clock.time() == 1.0
+
+
+def test_pause_keeps_position():
+    fake = FakeClock()
+    clock = PlaybackClock(clock=fake)
+    clock.start(0.0)
+    fake.now += 2.0
+    clock.pause()
+    fake.now += 5.0
+    assert clock.time() == 2.0
+    clock.resume()
+    fake.now += 1.0
+    assert clock.time() == 3.0
@@ -0,0 +1,97 @@
+import numpy as np
+import raster
+
+H, W = 60, 80
+
+
+def single_pixel_reference(buf, cx, cy, diameter, colors):
+    # Discos de menos de un píxel: su color por su área, sumado en el píxel de su centro
+    total = np.zeros((H * W, 3), dtype=np.int64)
+    coverage = np.minimum(diameter, 1.0) ** 2
+    values = np.floor(np.clip(colors, 0, 255) * coverage[:, None] + 0.5).astype(np.int64)
+    rows, cols = np.round(cy).astype(np.int64), np.round(cx).astype(np.int64)
+    inside = (rows >= 0) & (rows < H) & (cols >= 0) & (cols < W)
+    np.add.at(total, rows[inside] * W + cols[inside], values[inside])
+    out = buf.reshape(-1, 3).astype(np.int64) + np.minimum(total, 255)
+    return np.minimum(out, 255).astype(np.uint8).reshape(buf.shape)
+
+
+def test_single_pixel_discs_match_reference():
+    rng = np.random.default_rng(0)
+    n = 5000 # Muchos más que píxeles: hay muchos coincidentes
+    cx = rng.random(n) * (W + 10) - 5
+    cy = rng.random(n) * (H + 10) - 5
+    diameter = rng.random(n)
+    colors = (rng.random((n, 3)) * 60).astype(np.float32)
+    buf = rng.integers(0, 200, (H, W, 3)).astype(np.uint8)
+    expected = single_pixel_reference(buf, cx, cy, diameter, colors)
+    raster.splat_discs(buf, cx, cy, diameter, colors)
+    assert np.array_equal(buf, expected)
+
+
+def test_overlapping_discs_add_like_one_at_a_time():
+    rng = np.random.default_rng(1)
+    n = 300
+    cx = rng.random(n) * W
+    cy = rng.random(n) * H
+    diameter = rng.random(n) * 6 # Varios tamaños en píxeles
+    colors = rng.random((n, 3)) * 80
+    together = np.zeros((H, W, 3), dtype=np.uint8)
+    raster.splat_discs(together, cx, cy, diameter, colors)
+    # Por separado (sin saturar: los colores no llegan a sumar 255)
+    total = np.zeros((H, W, 3), dtype=np.int64)
+    for i in range(n):
+        one = np.zeros((H, W, 3), dtype=np.uint8)
+        raster.splat_discs(one, cx[i:i + 1], cy[i:i + 1], diameter[i:i + 1], colors[i:i + 1])
+        total += one
+    assert total.max() < 255
+    assert np.array_equal(together, total)
+
+
+def test_saturates_and_ignores_discs_outside():
+    buf = np.full((H, W, 3), 250, dtype=np.uint8)
+    cx = np.array([10.0, 10.0, -3.0, 10.0, np.nan])
+    cy = np.array([5.0, 5.0, 5.0, H + 2.0, 5.0])
+    colors = np.full((5, 3), 200.0)
+    raster.splat_discs(buf, cx, cy, np.ones(5), colors)
+    assert (buf[5, 10] == 255).all()
+    buf[5, 10] = 250
+    assert (buf == 250).all()
+
+
+def pil_ellipse(shape, box, fill, outline, width):
+    from PIL import Image, ImageDraw
+    img = Image.new("RGB", (shape[1], shape[0]))
+    ImageDraw.Draw(img).ellipse(box, fill=fill, outline=outline, width=width)
+    return np.asarray(img)
+
+
+def test_circle_matches_imagedraw_ellipse():
+    rng = np.random.default_rng(2)
+    for _ in range(200):
+        cx, cy = rng.random(2) * (W, H)
+        radius = rng.random() * 50
+        width = int(rng.integers(1, 5))
+        fill = tuple(int(v) for v in rng.integers(0, 200, 3))
+        buf = np.zeros((H, W, 3), dtype=np.uint8)
+        raster.circle(buf, cx, cy, radius, fill=fill, outline=(255, 255, 255), width=width)
+        expected = pil_ellipse(buf.shape, [cx - radius, cy - radius, cx + radius, cy + radius],
+                               fill, (255, 255, 255), width)
+        assert np.array_equal(buf, expected), (cx, cy, radius, width)
+
+
+def test_circle_pulse_matches_imagedraw():
+    import visualizer
+    rng = np.random.default_rng(3)
+    w, h = 1920, 1080
+    buf = np.empty((h, w, 3), dtype=np.uint8)
+    for _ in range(20):
+        data = rng.random(64).astype(np.float32)
+        beat_phase = rng.random()
+        visualizer.render_frame(buf, data, "Circle Pulse", features={"beat_phase": beat_phase})
+        # El dibujo original (ImageDraw) de _draw_circle_pulse
+        bass = np.mean(data[:5])
+        radius = 50 + bass * 150 + 40 * (1.0 - beat_phase) ** 3
+        box = [w // 2 - radius, h // 2 - radius, w // 2 + radius, h // 2 + radius]
+        expected = pil_ellipse(buf.shape, box, (int(bass * 50), 0, int(bass * 100)), (255, 255, 255), 2)
+        assert np.array_equal(buf, expected)
@@ -0,0 +1,501 @@
+import librosa
+import numpy as np
+import threading
+import time
+import os
+import shutil
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from audio_analysis import (StreamingSTFT, amplitude_to_abs_db, ref_db_from_max,
+                            log_band_filterbank, band_power_db, encode_db, analyze_span,
+                            EnvelopeFollower, envelope_coefficient, scaled_fft_size,
+                            RowBuffer, DiskRowBuffer, SharedRowBuffer)
+from audio_decode import AudioStream, RESAMPLE_QUALITIES
+from waveform import WaveformPyramid
+
+
+class AnalysisCancelled(Exception):
+    """El análisis se canceló antes de terminar."""
+
+
+def _read_only(array):
+    """Vista de solo lectura (el array original no cambia)."""
+    view = array.view()
+    view.setflags(write=False)
+    return view
+
+
+class TrackAnalysis:
+    """
+    Resultado terminado e inmutable de un análisis (ver TrackAnalyzer.snapshot).
+
+    Guarda sus propias referencias a las tablas, como vistas de solo lectura
+    (en RAM, en memoria compartida o con memory-map desde la caché), así que
+    sigue siendo válido aunque el motor cambie de pista y suelte su
+    TrackAnalyzer. Se puede compartir entre hilos sin copiar nada: una
+    exportación toma uno y no vuelve a leer el estado del motor.
+
+    Expone los mismos atributos de lectura que TrackAnalyzer (spec_db,
+    bands_db, display_bands, ref_db, frames_ready, sr, hop_length, waveform,
+    done, error, cache_key...), así que FeatureStore y los lectores de bandas
+    lo aceptan igual.
+    """
+
+    def __init__(self, filepath, sr, n_fft, hop_length, n_bands, duration, ref_db,
+                 spec_db, bands_db, bands_smooth_db=None, waveform=None, cache_key=None):
+        fields = {
+            "filepath": filepath, "sr": sr, "n_fft": n_fft, "hop_length": hop_length,
+            "n_bands": n_bands, "duration": duration, "ref_db": np.float32(ref_db),
+            "spec_db": _read_only(spec_db), "bands_db": _read_only(bands_db),
+            "bands_smooth_db": _read_only(bands_smooth_db) if bands_smooth_db is not None else None,
+            "waveform": waveform, "frames_ready": len(bands_db), "error": None,
+            "done": threading.Event(), "_cache_key": cache_key,
+        }
+        fields["done"].set() # Siempre terminado (para quien espere en done, como FeatureStore)
+        self.__dict__.update(fields)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"TrackAnalysis es inmutable ({name})")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"TrackAnalysis es inmutable ({name})")
+
+    @property
+    def display_bands(self):
+        smooth = self.bands_smooth_db
+        return smooth if smooth is not None else self.bands_db
+
+    def cache_key(self):
+        return self._cache_key
+
+    def snapshot(self):
+        return self
+
+    def release(self):
+        pass # Las tablas se liberan cuando cae la última referencia
+
+
+class TrackAnalyzer:
+    """
+    Análisis completo de una pista: caché, decodificación, STFT y tabla de bandas.
+
+    No depende de pygame ni de la UI, así se puede usar tanto desde AudioEngine
+    (en un hilo) como desde procesos de pre-análisis. Los resultados quedan en
+    los atributos spec_db, bands_db, ref_db, frames_ready, sr y duration, que se
+    van rellenando a medida que avanza el análisis progresivo, y en waveform
+    (pirámide min/max de la forma de onda, ver waveform.WaveformPyramid).
+    """
+
+    def __init__(self, filepath, cache=None, sr=22050, n_fft=2048, hop_length=512, n_bands=64,
+                 spec_dtype="float16", streaming=True, out_of_core_seconds=None, keep_raw_audio=False,
+                 shared_buffers=None, resample_quality="hq", analysis_workers=None, band_smoothing=None,
+                 table_folder=None):
+        self.filepath = filepath
+        self.cache = cache
+        self.target_sr = sr
+        # n_fft y hop_length efectivos: con resample_quality="native" se escalan
+        # a la frecuencia del archivo (ver _set_sr); la clave de caché usa los pedidos
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self._requested = (n_fft, hop_length)
+        self.resample_quality = resample_quality
+        # Hilos para la STFT por trozos (None: uno por núcleo, 1: secuencial)
+        self.analysis_workers = analysis_workers
+        self.n_bands = n_bands
+        self.spec_dtype = spec_dtype
+        self.streaming = streaming
+        self.out_of_core_seconds = out_of_core_seconds
+        self.keep_raw_audio = keep_raw_audio
+        # Suavizado ataque/liberación de las bandas: (ataque, liberación) en segundos, o None
+        self.band_smoothing = tuple(band_smoothing) if band_smoothing else None
+        # ({tabla: SharedSegment}, filas): tablas reservadas por otro proceso en memoria
+        # compartida (ver subprocess_analyzer); las que falten se crean aquí
+        self.shared_buffers = shared_buffers
+        # Carpeta donde escribir las tablas fuera de memoria, reservada por otro
+        # proceso (ver subprocess_analyzer), que es quien la publica en la caché
+        self.table_folder = table_folder
+
+        # Resultados
+        self.y = None # Audio crudo (solo con keep_raw_audio en el análisis completo)
+        self.spec = None # STFT compleja (ídem)
+        self.sr = sr
+        self.duration = 0
+        self.spec_db = None # dB absolutos compactados, forma (frames, bins)
+        self.bands_db = None # Bandas logarítmicas en dB, forma (frames, n_bands)
+        self.bands_smooth_db = None # bands_db suavizado (solo con band_smoothing)
+        self.waveform = None # WaveformPyramid del audio decodificado
+        self.ref_db = 0.0 # Referencia de normalización (máximo visto hasta ahora)
+        self.frames_ready = 0 # Frames ya calculados
+        self.truncated = False # Faltan frames del final: una tabla compartida se quedó corta
+        self.from_cache = False
+
+        self.done = threading.Event()
+        self.error = None
+        self._scratch_dir = None # Carpeta temporal si no hay caché
+        self._entry_folder = None # Carpeta temporal de la entrada de caché que se está escribiendo (fuera de memoria)
+        self._snapshot = None
+
+    @property
+    def display_bands(self):
+        """Tabla de bandas para visualizar: la suavizada si la hay, si no bands_db."""
+        smooth = self.bands_smooth_db
+        return smooth if smooth is not None else self.bands_db
+
+    # --- Caché ---
+    def cache_key(self):
+        n_fft, hop_length = self._requested
+        return self.cache.make_key(self.filepath, sr=self.target_sr, n_fft=n_fft,
+                                   hop_length=hop_length, n_bands=self.n_bands,
+                                   spec_dtype=self.spec_dtype, resample_quality=self.resample_quality,
+                                   band_smoothing=self.band_smoothing)
+
+    def load_cached(self):
+        """Intenta recuperar el análisis desde la caché. Devuelve True si hubo acierto."""
+        if self.cache is None:
+            return False
+
+        start = time.perf_counter()
+        try:
+            entry = self.cache.load(self.cache_key())
+        except OSError as e:
+            print(f"[ENGINE LOG] Cache lookup failed: {e}")
+            return False
+
+        if entry is None:
+            print(f"[ENGINE LOG] Cache MISS ({self.cache.stats()})")
+            return False
+
+        arrays, meta = entry
+        self._set_sr(meta["sr"])
+        self.duration = meta["duration"]
+        self.ref_db = np.float32(meta["ref_db"])
+        self.spec_db = arrays["spec_db"]
+        self.bands_db = arrays["bands_db"]
+        self.bands_smooth_db = arrays.get("bands_smooth_db")
+        if "waveform" in arrays:
+            self.waveform = WaveformPyramid.from_base(arrays["waveform"], self.sr)
+        self.frames_ready = len(self.bands_db)
+        self.from_cache = True
+        print(f"[ENGINE LOG] Cache HIT, loaded in {time.perf_counter() - start:.3f}s ({self.cache.stats()})")
+        return True
+
+    def _store_in_cache(self):
+        if self.cache is None or isinstance(self.spec_db, np.memmap):
+            return
+        if self.truncated:
+            print("[ENGINE LOG] Truncated analysis, not storing it in cache")
+            return
+        arrays = {name: getattr(self, name) for name, _, _ in self._tables()}
+        if self.waveform is not None:
+            arrays["waveform"] = self.waveform.base
+        try:
+            self.cache.store(self.cache_key(), arrays, self._cache_meta())
+        except OSError as e:
+            print(f"[ENGINE LOG] Could not store analysis in cache: {e}")
+
+    def _cache_meta(self):
+        return {"sr": self.sr, "n_fft": self.n_fft, "hop_length": self.hop_length, "duration": self.duration, "ref_db": float(self.ref_db),
+                "source": os.path.basename(self.filepath)}
+
+    # --- Análisis ---
+    def run(self, on_ready=None, should_cancel=None, on_progress=None):
+        """
+        Ejecuta el análisis (o lo carga de la caché).
+        on_ready se llama una vez, en cuanto hay frames para visualizar.
+        should_cancel se consulta entre bloques; si devuelve True se lanza AnalysisCancelled.
+        on_progress recibe la fracción analizada (0-1).
+        """
+        try:
+            if self.load_cached():
+                if on_ready:
+                    on_ready()
+                return
+
+            start = time.perf_counter()
+            if self.streaming:
+                self._analyze_streaming(on_ready, should_cancel, on_progress)
+            else:
+                self._analyze_full()
+                if on_ready:
+                    on_ready()
+
+            self._store_in_cache()
+            print(f"[ENGINE LOG] Analysis completed in {time.perf_counter() - start:.2f}s "
+                  f"({os.path.basename(self.filepath)})")
+        except Exception as e:
+            self.error = e
+            raise
+        finally:
+            self.done.set()
+
+    def _analyze_full(self):
+        """Análisis clásico: carga el archivo completo y calcula la STFT de una vez."""
+        print("Iniciando análisis de audio con Librosa...")
+        # 1. Cargar audio (puede tardar unos segundos en archivos largos)
+        quality = RESAMPLE_QUALITIES[self.resample_quality]
+        y, sr = librosa.load(self.filepath, sr=self.target_sr if quality else None,
+                             res_type=f"soxr_{quality.lower()}" if quality else "soxr_hq")
+        self._set_sr(sr)
+        self.duration = librosa.get_duration(y=y, sr=self.sr)
+        self.waveform = WaveformPyramid.from_samples(y, self.sr)
+
+        # 2. Calcular STFT (Short-Time Fourier Transform)
+        # Esto nos da la magnitud de frecuencias a lo largo del tiempo
+        spec = librosa.stft(y, n_fft=self.n_fft, hop_length=self.hop_length)
+        if self.keep_raw_audio:
+            self.y, self.spec = y, spec
+
+        # Solo necesitamos la magnitud: soltar la STFT compleja cuanto antes
+        mag = np.abs(spec).T
+        del spec, y
+
+        # 3. Convertir a dB absolutos; la normalización contra el máximo
+        # (equivalente a ref=np.max) se aplica al leer cada frame
+        self.ref_db = ref_db_from_max(mag.max())
+        self.bands_db = band_power_db(mag, self._filterbank())
+        if self.band_smoothing:
+            self.bands_smooth_db = self._envelope_follower().process(self.bands_db)
+        self.spec_db = encode_db(amplitude_to_abs_db(mag), self.spec_dtype)
+        self.frames_ready = len(self.spec_db)
+
+    def _analyze_streaming(self, on_ready, should_cancel, on_progress):
+        """
+        Análisis progresivo: decodifica y transforma por bloques, rellenando spec_db
+        a medida que avanza. La pista queda lista tras el primer bloque.
+        """
+        print("Iniciando análisis progresivo...")
+        stream = self.open_stream()
+        stft = StreamingSTFT(self.n_fft, self.hop_length)
+        filterbank = self._filterbank()
+
+        # Reservar las tablas según la duración estimada
+        estimated = stream.estimated_samples or self.sr * 60
+        n_frames = 1 + estimated // self.hop_length
+        self.duration = estimated / self.sr
+        out_of_core = self.out_of_core_seconds is not None and self.duration >= self.out_of_core_seconds
+        buffers, entry_key, folder = self._create_row_buffers(n_frames, out_of_core)
+        wave = self.waveform = self._create_waveform(estimated, folder)
+        follower = self._envelope_follower() if self.band_smoothing else None
+        self._publish_tables(buffers)
+        self.frames_ready = 0
+        max_mag = np.float32(0)
+
+        def publish(result):
+            nonlocal max_mag
+            spec_rows, band_rows, block_max = result
+            if len(band_rows) == 0:
+                return
+            start = self.frames_ready
+            buffers["spec_db"].write(start, spec_rows)
+            buffers["bands_db"].write(start, band_rows)
+            if follower is not None:
+                buffers["bands_smooth_db"].write(start, follower.process(band_rows))
+            self._publish_tables(buffers)
+            max_mag = max(max_mag, block_max)
+            self.ref_db = ref_db_from_max(max_mag)
+            # Las tablas compartidas no crecen: nunca contar frames que no caben
+            end = start + len(band_rows)
+            capacity = len(buffers["bands_db"].array)
+            if end > capacity:
+                self.truncated = True
+                end = capacity
+            self.frames_ready = end
+
+        # Los trozos se transforman en paralelo mientras se sigue decodificando;
+        # se publican en orden, así que el resultado es idéntico al secuencial
+        workers = self.analysis_workers or os.cpu_count() or 1
+        pool = ThreadPoolExecutor(workers) if workers > 1 else None
+        in_flight = deque()
+
+        def submit(span):
+            if pool is None:
+                publish(analyze_span(span, stft, filterbank, self.spec_dtype))
+            else:
+                in_flight.append(pool.submit(analyze_span, span, stft, filterbank, self.spec_dtype))
+
+        def collect(wait=False):
+            # Publicar los trozos ya terminados; esperar si hay demasiados en cola
+            while in_flight and (wait or in_flight[0].done() or len(in_flight) > 2 * workers):
+                publish(in_flight.popleft().result())
+
+        ready = False
+        try:
+            for block in stream:
+                if should_cancel and should_cancel():
+                    raise AnalysisCancelled(self.filepath)
+                wave.add(block)
+                submit(stft.push_span(block))
+                collect(wait=not ready)
+                if on_progress:
+                    on_progress(min(1.0, self.frames_ready / n_frames))
+                if not ready and self.frames_ready > 0:
+                    ready = True
+                    print("[ENGINE LOG] First frames ready.")
+                    if on_ready:
+                        on_ready()
+
+            submit(stft.finish_span())
+            collect(wait=True)
+        except Exception:
+            for buf in buffers.values():
+                buf.close()
+            wave.close()
+            if entry_key is not None:
+                # Nunca queda una entrada a medias: la carpeta temporal se descarta
+                self.cache.abort_entry(self._entry_folder)
+                self._entry_folder = None
+            raise
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True, cancel_futures=True)
+
+        for name, buf in buffers.items():
+            setattr(self, name, buf.finish(self.frames_ready))
+        wave.finish()
+        self.duration = stft.samples_seen / self.sr
+
+        if entry_key is not None:
+            # Las tablas ya están escritas dentro de la entrada de la caché
+            # (salvo las que viven en RAM o en memoria compartida)
+            for name, buf in buffers.items():
+                if not isinstance(buf, DiskRowBuffer):
+                    np.save(os.path.join(self._entry_folder, f"{name}.npy"), getattr(self, name))
+            if not isinstance(wave.base, np.memmap):
+                np.save(os.path.join(self._entry_folder, "waveform.npy"), wave.base)
+            if not self.cache.finish_entry(entry_key, self._entry_folder, list(buffers) + ["waveform"],
+                                           self._cache_meta()):
+                # Sigue siendo nuestra (las tablas se leen de ahí): se borra en release
+                self._scratch_dir = self._entry_folder
+            self._entry_folder = None
+        if not ready and on_ready:
+            on_ready()
+
+    def _tables(self):
+        """Tablas por frame que produce el análisis: (nombre, ancho, dtype)."""
+        tables = [("spec_db", self.n_fft // 2 + 1, self.spec_dtype), ("bands_db", self.n_bands, np.float32)]
+        if self.band_smoothing:
+            tables.append(("bands_smooth_db", self.n_bands, np.float32))
+        return tables
+
+    def _publish_tables(self, buffers):
+        for name, buf in buffers.items():
+            setattr(self, name, buf.array)
+
+    def _create_row_buffers(self, n_frames, out_of_core):
+        """
+        Crea un buffer por tabla (ver _tables): en memoria compartida si otro
+        proceso la reservó, en RAM, o fuera de memoria escribiéndola directamente
+        en table_folder, en una entrada de la caché o en una carpeta temporal.
+        Devuelve ({nombre: buffer}, clave_de_caché_o_None, carpeta_o_None).
+        """
+        shared, rows = self.shared_buffers or ({}, 0)
+        folder = entry_key = None
+        if out_of_core and any(name not in shared for name, _, _ in self._tables()):
+            if self.table_folder is not None:
+                folder = self.table_folder
+            elif self.cache is not None:
+                entry_key = self.cache_key()
+                folder = self._entry_folder = self.cache.begin_entry(entry_key)
+            else:
+                folder = self._scratch_dir = tempfile.mkdtemp(prefix="music_visual_")
+            print(f"[ENGINE LOG] Out-of-core analysis, writing tables to {folder}")
+
+        buffers = {}
+        for name, width, dtype in self._tables():
+            if name in shared:
+                buffers[name] = SharedRowBuffer(shared[name], rows, width, dtype)
+            elif folder is not None:
+                buffers[name] = DiskRowBuffer(os.path.join(folder, f"{name}.npy"), n_frames, width, dtype)
+            else:
+                buffers[name] = RowBuffer(n_frames, width, dtype)
+        return buffers, entry_key, folder
+
+    def _create_waveform(self, estimated_samples, folder=None):
+        """
+        Pirámide de la forma de onda; su nivel 0 va en memoria compartida si otro
+        proceso la reservó, o a disco junto a las tablas fuera de memoria.
+        """
+        shared, _ = self.shared_buffers or ({}, 0)
+        rows = WaveformPyramid.rows_for(estimated_samples)
+        if "waveform" in shared:
+            segment = shared["waveform"]
+            return WaveformPyramid(self.sr, buffer=SharedRowBuffer(segment, segment.size // 8, 2, np.float32))
+        if folder is not None:
+            return WaveformPyramid(self.sr, buffer=DiskRowBuffer(os.path.join(folder, "waveform.npy"), rows, 2, np.float32))
+        return WaveformPyramid(self.sr, rows)
+
+    def _envelope_follower(self):
+        attack, release = self.band_smoothing
+        frame_rate = self.sr / self.hop_length
+        return EnvelopeFollower(envelope_coefficient(attack, frame_rate), envelope_coefficient(release, frame_rate))
+
+    def open_stream(self):
+        """Abre el decodificador (sin decodificar nada aún) y fija sr, n_fft y hop_length."""
+        stream = AudioStream(self.filepath, self.target_sr, quality=self.resample_quality)
+        self._set_sr(stream.sr)
+        return stream
+
+    def _set_sr(self, sr):
+        """
+        Fija la frecuencia del análisis. Si no es la pedida (análisis a la frecuencia
+        nativa), escala hop_length para que cada frame dure lo mismo en segundos y
+        n_fft a la potencia de dos más cercana, conservando la resolución en Hz.
+        """
+        self.sr = sr
+        n_fft, hop_length = self._requested
+        ratio = sr / self.target_sr
+        self.hop_length = max(1, int(round(hop_length * ratio)))
+        self.n_fft = scaled_fft_size(n_fft, sr, self.target_sr)
+
+    def _filterbank(self):
+        # Mismo reparto de bandas aunque se analice a la frecuencia nativa
+        return log_band_filterbank(self.sr, self.n_fft, self.n_bands, fmax=self.target_sr / 2)
+
+    def snapshot(self):
+        """
+        TrackAnalysis inmutable con el resultado; espera a que el análisis
+        termine. Lanza AnalysisCancelled si se canceló, se descartó o se soltó
+        (release) antes de terminar, y el error del análisis si falló.
+        """
+        self.done.wait()
+        if isinstance(self.error, AnalysisCancelled):
+            raise self.error
+        if self.error is not None:
+            raise RuntimeError(f"Analysis failed: {self.error}") from self.error
+        if self._snapshot is not None:
+            return self._snapshot
+        # Leer cada atributo una sola vez (release los vacía desde otro hilo,
+        # empezando por frames_ready)
+        frames = self.frames_ready
+        spec_db, bands_db, smooth, wave = self.spec_db, self.bands_db, self.bands_smooth_db, self.waveform
+        if frames == 0 or spec_db is None or bands_db is None or (self.band_smoothing and smooth is None):
+            raise AnalysisCancelled(self.filepath)
+        if wave is not None:
+            wave = WaveformPyramid.from_base(_read_only(wave.base[:wave.count]), wave.sr, wave.block)
+            for level in wave.levels:
+                if level is not None:
+                    level.setflags(write=False)
+        self._snapshot = TrackAnalysis(
+            self.filepath, self.sr, self.n_fft, self.hop_length, self.n_bands, self.duration, self.ref_db,
+            spec_db[:frames], bands_db[:frames], smooth[:frames] if smooth is not None else None,
+            waveform=wave, cache_key=self.cache_key() if self.cache is not None else None,
+        )
+        return self._snapshot
+
+    def release(self):
+        """
+        Suelta los arrays (y la carpeta temporal, si la hubo). Las instantáneas
+        (snapshot) ya tomadas siguen siendo válidas.
+        """
+        self._snapshot = None
+        self.frames_ready = 0
+        self.y = None
+        self.spec = None
+        self.spec_db = None
+        self.bands_db = None
+        self.bands_smooth_db = None
+        self.waveform = None
+        if self._scratch_dir:
+            shutil.rmtree(self._scratch_dir, ignore_errors=True)
+            self._scratch_dir = None
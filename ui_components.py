@@ -3,8 +3,10 @@
 
 import customtkinter as ctk
 import os
+import time
 
-def create_control_panel(parent, load_callback, play_callback, pause_callback, stop_callback, export_callback, visualization_callback):
+def create_control_panel(parent, load_callback, play_callback, pause_callback, stop_callback, export_callback, visualization_callback,
+                         seek_callback=None):
     """
     Crea el panel de control estilo DJ en la parte inferior.
     Divide el área en 3 'Decks' o secciones.
@@ -29,6 +31,18 @@ def create_control_panel(parent, load_callback, play_callback, pause_callback, s
                                fg_color="#333333", hover_color="#444444", width=140)
     btn_folder.pack(pady=5)
 
+    btn_preanalyze = ctk.CTkButton(left_deck, text="PRE-ANALYZE ⚡", fg_color="#333333",
+                                   hover_color="#444444", width=140, height=24, font=("Roboto", 10))
+    btn_preanalyze.pack(pady=(0, 5))
+
+    btn_live = ctk.CTkButton(left_deck, text="LIVE INPUT 🎤", fg_color="#333333",
+                             hover_color="#444444", width=140, height=24, font=("Roboto", 10))
+    btn_live.pack(pady=(0, 5))
+
+    btn_playlist = ctk.CTkButton(left_deck, text="PLAYLIST: OFF", fg_color="#333333",
+                                 hover_color="#444444", width=140, height=24, font=("Roboto", 10))
+    btn_playlist.pack(pady=(0, 5))
+
     # Lista scrollable de canciones
     song_list_frame = ctk.CTkScrollableFrame(left_deck, width=180, height=120, 
                                              fg_color="#101010", label_text="Track List")
@@ -100,21 +114,145 @@ def create_control_panel(parent, load_callback, play_callback, pause_callback, s
                                fg_color="#6200EA", hover_color="#651FFF",
                                font=("Roboto", 12, "bold"), height=35)
     btn_export.pack(pady=(10, 5))
+    
+    # Cancelar las exportaciones en marcha (main lo muestra solo mientras hay alguna)
+    btn_cancel_export = ctk.CTkButton(right_deck, text="CANCEL RENDER",
+                                      fg_color="#D50000", hover_color="#B71C1C",
+                                      font=("Roboto", 11, "bold"), height=28)
+
+    # --- BARRA DE DESPLAZAMIENTO (ancho completo) ---
+    scrub_bar = ScrubBar(control_frame, on_seek=seek_callback)
+    scrub_bar.grid(row=1, column=0, columnspan=3, padx=20, pady=(0, 10), sticky="ew")
 
     return {
         "lbl_file": lbl_file,
         "lbl_status": lbl_status,
         "viz_menu": viz_menu,
         "btn_folder": btn_folder,
+        "btn_preanalyze": btn_preanalyze,
+        "btn_live": btn_live,
+        "btn_playlist": btn_playlist,
         "song_list_frame": song_list_frame,
         "btn_play": btn_play,
         "btn_pause": btn_pause,
         "btn_stop": btn_stop,
         "btn_config_random": btn_config_random,
         "btn_auto_random": btn_auto_random,
-        "btn_export": btn_export
+        "btn_export": btn_export,
+        "btn_cancel_export": btn_cancel_export,
+        "scrub_bar": scrub_bar
     }
 
+class ScrubBar(ctk.CTkFrame):
+    """
+    Barra de desplazamiento de la pista: la forma de onda completa (ver
+    waveform.WaveformPyramid) con el cursor de reproducción encima.
+    Clic o arrastre para saltar; on_seek recibe el tiempo en segundos.
+    """
+    REDRAW_SECONDS = 0.25 # Mientras la forma de onda crece (análisis en curso), redibujar como mucho así
+    DRAG_SEEK_SECONDS = 0.05 # Al arrastrar, saltar como mucho así de a menudo
+
+    def __init__(self, parent, on_seek=None, height=36):
+        super().__init__(parent, fg_color="transparent")
+        self.on_seek = on_seek
+        self._bar_height = height
+        self.duration = 0
+        self._waveform_key = None
+        self._last_redraw = 0
+        self._last_drag_seek = 0
+        self._dragging = False
+        self._time_text = None
+
+        self.canvas = ctk.CTkCanvas(self, height=height, bg="#101010", highlightthickness=0)
+        self.canvas.pack(side="left", fill="x", expand=True)
+        self.lbl_time = ctk.CTkLabel(self, text="0:00 / 0:00", font=("Consolas", 11), width=90)
+        self.lbl_time.pack(side="left", padx=(8, 0))
+        self._playhead = self.canvas.create_line(0, 0, 0, height, fill="#00E5FF", width=2)
+
+        self.canvas.bind("<Button-1>", self._on_press)
+        self.canvas.bind("<B1-Motion>", self._on_drag)
+        self.canvas.bind("<ButtonRelease-1>", self._on_release)
+        self.canvas.bind("<Configure>", lambda e: setattr(self, "_waveform_key", None))
+
+    def refresh(self, t, duration, waveform=None):
+        """Coloca el cursor en t y redibuja la forma de onda si cambió (llamar en cada frame)."""
+        self.duration = duration
+        width = max(1, self.canvas.winfo_width())
+        self._draw_waveform(waveform, width)
+        if not self._dragging:
+            self._move_playhead(t, width)
+
+    def _draw_waveform(self, waveform, width):
+        if waveform is None or not self.duration:
+            if self._waveform_key is not None:
+                self.canvas.delete("wave")
+                self._waveform_key = None
+            return
+
+        key = (id(waveform), waveform.count, waveform.levels is not None, width)
+        if key == self._waveform_key:
+            return
+        now = time.perf_counter()
+        # Misma pirámide aún creciendo (y mismo ancho): no hace falta redibujar en cada frame
+        growing = not key[2] and self._waveform_key is not None and self._waveform_key[::3] == key[::3]
+        if growing and now - self._last_redraw < self.REDRAW_SECONDS:
+            return
+        self._waveform_key = key
+        self._last_redraw = now
+
+        # La pista entera (duración estimada mientras se analiza) en una columna por píxel
+        mins, maxs = waveform.envelope(0, self.duration, width)
+        mid = self._bar_height / 2
+        scale = self._bar_height * 0.45
+        points = []
+        for x, v in enumerate(maxs):
+            points += (x, mid - v * scale)
+        for x in range(width - 1, -1, -1):
+            points += (x, mid - mins[x] * scale)
+        self.canvas.delete("wave")
+        self.canvas.create_polygon(points, fill="#0096FF", outline="", tags="wave")
+        self.canvas.tag_raise(self._playhead)
+
+    def _move_playhead(self, t, width):
+        x = (t / self.duration) * width if self.duration else 0
+        self.canvas.coords(self._playhead, x, 0, x, self._bar_height)
+        text = f"{_format_time(t)} / {_format_time(self.duration)}"
+        if text != self._time_text:
+            self._time_text = text
+            self.lbl_time.configure(text=text)
+
+    def _time_at(self, x):
+        width = max(1, self.canvas.winfo_width())
+        return min(max(x / width, 0.0), 1.0) * self.duration
+
+    def _seek(self, x):
+        t = self._time_at(x)
+        self._move_playhead(t, max(1, self.canvas.winfo_width()))
+        if self.on_seek and self.duration:
+            self.on_seek(t)
+
+    def _on_press(self, event):
+        self._dragging = True
+        self._last_drag_seek = time.perf_counter()
+        self._seek(event.x)
+
+    def _on_drag(self, event):
+        # El cursor sigue al ratón siempre; el audio salta con un límite de frecuencia
+        now = time.perf_counter()
+        if now - self._last_drag_seek >= self.DRAG_SEEK_SECONDS:
+            self._last_drag_seek = now
+            self._seek(event.x)
+        else:
+            self._move_playhead(self._time_at(event.x), max(1, self.canvas.winfo_width()))
+
+    def _on_release(self, event):
+        self._seek(event.x)
+        self._dragging = False
+
+def _format_time(seconds):
+    seconds = int(max(seconds, 0))
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
 class ExportDialog(ctk.CTkToplevel):
     def __init__(self, parent, initial_settings, on_export_start):
         super().__init__(parent)
@@ -204,24 +342,3 @@ class ExportDialog(ctk.CTkToplevel):
         
         self.destroy()
         self.on_export_start(w, h, fps, folder, settings)
-
-def toggle_inputs(ui_elements, enabled=True):
-    """
-    Habilita o deshabilita los controles de la UI.
-    """
-    state = "normal" if enabled else "disabled"
-    
-    # Lista de botones conocidos
-    buttons = ["btn_load", "btn_play", "btn_pause", "btn_stop", "viz_menu"]
-    
-    for key in buttons:
-        if key in ui_elements:
-            try:
-                ui_elements[key].configure(state=state)
-            except:
-                pass
-    
-    # btn_export lo manejamos aparte desde main si es necesario cambiarle el texto
-
-
-
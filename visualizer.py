@@ -2,51 +2,163 @@ from PIL import Image, ImageDraw, ImageFilter, ImageEnhance
 import numpy as np
 import math
 import random
+import threading
+from collections import OrderedDict
+import raster
+from particles import ParticleSystem
+from audio_features import TRAVEL_FPS
 
 # Global state for engines
 _gl_engine = None
-_particles_state = None
-_particles_colors = None
+_particles = None
 
-def draw_frame(audio_data, width, height, mode="Bars Spectrum", t=0.0):
+# Partículas de "Cosmic Particles" (ver particles.ParticleSystem); main lo
+# toma de la configuración ("particle_count")
+PARTICLE_COUNT = 200
+
+# Modos que se dibujan con shaders de OpenGL
+GPU_MODES = [
+    "GPU Fractal", "Quantum Bloom", "Hyperwarp", "Neural Liquid",
+    "Mandelbrot Trip", "Electric Storm", "DNA Helix", "Organic Cells",
+    "Audio Matrix", "Infinity Mirrors", "Fire & Ice", 
+    "Rainbow Flow", "Geometric Chaos"
+]
+
+# Características de audio (ver audio_features) que usa cada visualizador CPU.
+# Los shaders las declaran con uniforms (ver opengl_engine.FEATURE_UNIFORMS).
+VISUALIZER_FEATURES = {
+    "Circle Pulse": ("beat_phase",),
+    "Cosmic Particles": ("travel",),
+}
+_shader_features = {}
+
+# Visualizadores que dibujan la forma de onda real (ver AudioEngine.get_waveform)
+# y cuántos segundos de audio muestran a lo ancho
+WAVEFORM_MODES = ("Waveform",)
+WAVEFORM_SECONDS = 2.0
+
+# Rejillas de coordenadas de los visualizadores NumPy (ver _geometry): solo
+# dependen del tamaño de salida, así que se calculan una vez por tamaño. Se
+# guardan las últimas GEOMETRY_CACHE_SIZE (p. ej. la vista previa y una exportación)
+GEOMETRY_CACHE_SIZE = 4
+_geometry_cache = OrderedDict()
+_geometry_lock = threading.Lock()
+
+def _geometry(key, build):
+    """
+    Rejillas precalculadas para key = (modo, ancho, alto, escala interna, ...),
+    con expulsión LRU. build() las crea si no están: un dict de arrays float32,
+    de solo lectura porque se comparten entre hilos (vista previa y exportaciones).
+    """
+    with _geometry_lock:
+        grids = _geometry_cache.get(key)
+        if grids is not None:
+            _geometry_cache.move_to_end(key)
+            return grids
+    grids = build()
+    for array in grids.values():
+        array.setflags(write=False)
+    with _geometry_lock:
+        _geometry_cache[key] = grids
+        _geometry_cache.move_to_end(key)
+        while len(_geometry_cache) > GEOMETRY_CACHE_SIZE:
+            _geometry_cache.popitem(last=False)
+    return grids
+
+def _gpu_shaders():
+    """Nombre del modo -> fragment shader (importa OpenGL solo cuando hace falta)."""
+    from opengl_engine import (
+        FRACTAL_FRAGMENT, BLOOM_FRAGMENT, HYPERWARP_FRAGMENT, 
+        LIQUID_FRAGMENT, MANDELBROT_FRAGMENT, STORM_FRAGMENT, 
+        DNA_FRAGMENT, CELLS_FRAGMENT, MATRIX_FRAGMENT, 
+        MIRROR_FRAGMENT, FIREICE_FRAGMENT, RAINBOW_FRAGMENT, 
+        CHAOS_FRAGMENT
+    )
+    return {
+        "GPU Fractal": FRACTAL_FRAGMENT, "Quantum Bloom": BLOOM_FRAGMENT,
+        "Hyperwarp": HYPERWARP_FRAGMENT, "Neural Liquid": LIQUID_FRAGMENT,
+        "Mandelbrot Trip": MANDELBROT_FRAGMENT, "Electric Storm": STORM_FRAGMENT,
+        "DNA Helix": DNA_FRAGMENT, "Organic Cells": CELLS_FRAGMENT,
+        "Audio Matrix": MATRIX_FRAGMENT, "Infinity Mirrors": MIRROR_FRAGMENT, 
+        "Fire & Ice": FIREICE_FRAGMENT, "Rainbow Flow": RAINBOW_FRAGMENT, 
+        "Geometric Chaos": CHAOS_FRAGMENT
+    }
+
+def required_features(mode):
+    """Características que necesita un modo (para AudioEngine.get_features)."""
+    if mode not in GPU_MODES:
+        return VISUALIZER_FEATURES.get(mode, ())
+    if mode not in _shader_features:
+        try:
+            from opengl_engine import shader_features
+            _shader_features[mode] = shader_features(_gpu_shaders()[mode])
+        except Exception:
+            _shader_features[mode] = ()
+    return _shader_features[mode]
+
+def draw_frame(audio_data, width, height, mode="Bars Spectrum", t=0.0, features=None, waveform=None):
     """
     Genera un frame visual basado en los datos de audio.
-    Retorna un objeto PIL.Image
+    features: dict con las características pedidas por required_features(mode).
+    waveform: (mínimos, máximos) por columna para los WAVEFORM_MODES, o None.
+    Retorna un objeto PIL.Image (para dibujar en un array propio, ver render_frame)
+    """
+    features = features or {}
+    img = _draw_image(audio_data, width, height, mode, t, features)
+    if img is None:
+        buf = raster.frame_buffer(width, height)
+        _draw_primitives(buf, audio_data, mode, t, features, waveform)
+        img = Image.fromarray(buf)
+    return img
+
+def render_frame(out, audio_data, mode="Bars Spectrum", t=0.0, features=None, waveform=None):
     """
+    Como draw_frame, pero dibuja en `out`, un array (alto, ancho, 3) uint8 del
+    llamador (p. ej. de un raster.FramePool), y lo retorna.
+    Los modos de primitivas escriben directamente en él; los que generan un
+    PIL.Image (GPU, Kaleidoscope, Plasma Fluid) se copian una vez.
+    """
+    height, width = out.shape[:2]
+    features = features or {}
+
+    img = _draw_image(audio_data, width, height, mode, t, features)
+    if img is None:
+        _draw_primitives(out, audio_data, mode, t, features, waveform)
+    else:
+        out[:] = np.asarray(img)
+    return out
+
+def _draw_primitives(out, audio_data, mode, t, features, waveform):
+    """
+    Modos de primitivas: se rasterizan con NumPy sobre el buffer en negro
+    (ver raster), sin Image.new ni una llamada por primitiva.
+    """
+    height, width = out.shape[:2]
+    out.fill(0)
+    if mode == "Neon Tunnel":
+        _draw_tunnel(out, audio_data, width, height)
+    elif mode == "Waveform":
+        _draw_waveform(out, audio_data, width, height, waveform)
+    elif mode == "Circle Pulse":
+        _draw_circle_pulse(out, audio_data, width, height, features.get("beat_phase"))
+    elif mode == "Cosmic Particles":
+        _draw_particles(out, audio_data, features.get("travel"), t)
+    else:
+        _draw_bars(out, audio_data, width, height)
+
+def _draw_image(audio_data, width, height, mode, t, features):
+    """Frame de los modos que generan un PIL.Image; None para los de primitivas."""
     global _gl_engine
     
     # print(f"[DEBUG] Drawing {mode} at {width}x{height}") # Desmentado si detectamos fallos persistentes
     
     # Manejar modos GPU especiales primero
-    gpu_modes = [
-        "GPU Fractal", "Quantum Bloom", "Hyperwarp", "Neural Liquid",
-        "Mandelbrot Trip", "Electric Storm", "DNA Helix", "Organic Cells",
-        "Audio Matrix", "Infinity Mirrors", "Fire & Ice", 
-        "Rainbow Flow", "Geometric Chaos"
-    ]
-    if mode in gpu_modes:
+    if mode in GPU_MODES:
         if _gl_engine is None:
             try:
-                from opengl_engine import (
-                    OpenGLEngine, FRACTAL_FRAGMENT, BLOOM_FRAGMENT, 
-                    HYPERWARP_FRAGMENT, LIQUID_FRAGMENT, MANDELBROT_FRAGMENT,
-                    STORM_FRAGMENT, DNA_FRAGMENT, CELLS_FRAGMENT, 
-                    MATRIX_FRAGMENT, MIRROR_FRAGMENT, 
-                    FIREICE_FRAGMENT, RAINBOW_FRAGMENT,
-                    CHAOS_FRAGMENT, VERTEX_DEFAULT
-                )
+                from opengl_engine import OpenGLEngine, FRACTAL_FRAGMENT, VERTEX_DEFAULT
                 _gl_engine = OpenGLEngine(width, height)
-                # Map names to fragments
-                shaders = {
-                    "GPU Fractal": FRACTAL_FRAGMENT, "Quantum Bloom": BLOOM_FRAGMENT,
-                    "Hyperwarp": HYPERWARP_FRAGMENT, "Neural Liquid": LIQUID_FRAGMENT,
-                    "Mandelbrot Trip": MANDELBROT_FRAGMENT, "Electric Storm": STORM_FRAGMENT,
-                    "DNA Helix": DNA_FRAGMENT, "Organic Cells": CELLS_FRAGMENT,
-                    "Audio Matrix": MATRIX_FRAGMENT, "Infinity Mirrors": MIRROR_FRAGMENT, 
-                    "Fire & Ice": FIREICE_FRAGMENT, "Rainbow Flow": RAINBOW_FRAGMENT, 
-                    "Geometric Chaos": CHAOS_FRAGMENT
-                }
-                _gl_engine.load_shader(VERTEX_DEFAULT, shaders.get(mode, FRACTAL_FRAGMENT))
+                _gl_engine.load_shader(VERTEX_DEFAULT, _gpu_shaders().get(mode, FRACTAL_FRAGMENT))
             except Exception as e:
                 print(f"Failed to load OpenGL Engine: {e}")
                 return Image.new('RGB', (width, height), (20, 0, 0))
@@ -54,23 +166,8 @@ def draw_frame(audio_data, width, height, mode="Bars Spectrum", t=0.0):
         # Detectar si el modo ha cambiado para recargar el shader
         current_shader_mode = getattr(_gl_engine, '_current_mode', None)
         if current_shader_mode != mode:
-            from opengl_engine import (
-                FRACTAL_FRAGMENT, BLOOM_FRAGMENT, HYPERWARP_FRAGMENT, 
-                LIQUID_FRAGMENT, MANDELBROT_FRAGMENT, STORM_FRAGMENT, 
-                DNA_FRAGMENT, CELLS_FRAGMENT, MATRIX_FRAGMENT, 
-                MIRROR_FRAGMENT, FIREICE_FRAGMENT, RAINBOW_FRAGMENT, 
-                CHAOS_FRAGMENT, VERTEX_DEFAULT
-            )
-            shaders = {
-                "GPU Fractal": FRACTAL_FRAGMENT, "Quantum Bloom": BLOOM_FRAGMENT,
-                "Hyperwarp": HYPERWARP_FRAGMENT, "Neural Liquid": LIQUID_FRAGMENT,
-                "Mandelbrot Trip": MANDELBROT_FRAGMENT, "Electric Storm": STORM_FRAGMENT,
-                "DNA Helix": DNA_FRAGMENT, "Organic Cells": CELLS_FRAGMENT,
-                "Audio Matrix": MATRIX_FRAGMENT, "Infinity Mirrors": MIRROR_FRAGMENT, 
-                "Fire & Ice": FIREICE_FRAGMENT, "Rainbow Flow": RAINBOW_FRAGMENT, 
-                "Geometric Chaos": CHAOS_FRAGMENT
-            }
-            _gl_engine.load_shader(VERTEX_DEFAULT, shaders.get(mode, FRACTAL_FRAGMENT))
+            from opengl_engine import FRACTAL_FRAGMENT, VERTEX_DEFAULT
+            _gl_engine.load_shader(VERTEX_DEFAULT, _gpu_shaders().get(mode, FRACTAL_FRAGMENT))
             _gl_engine._current_mode = mode
 
         # Update size if changed
@@ -78,58 +175,42 @@ def draw_frame(audio_data, width, height, mode="Bars Spectrum", t=0.0):
             _gl_engine.width = width
             _gl_engine.height = height
             
-        return _gl_engine.render_frame(t, audio_data)
+        return _gl_engine.render_frame(t, audio_data, features)
 
-    # Crear fondo negro para modos CPU
-    img = Image.new('RGB', (width, height), (0, 0, 0))
-    draw = ImageDraw.Draw(img)
-    
     # Manejar datos vacíos o ruido inicial
     if audio_data is None or len(audio_data) == 0:
-        return img
+        return Image.new('RGB', (width, height), (0, 0, 0))
 
-    if mode == "Bars Spectrum":
-        _draw_bars(draw, audio_data, width, height)
-    elif mode == "Neon Tunnel":
-        _draw_tunnel(draw, img, audio_data, width, height)
-    elif mode == "Waveform":
-        _draw_waveform(draw, audio_data, width, height)
-    elif mode == "Circle Pulse":
-        _draw_circle_pulse(draw, audio_data, width, height)
-    elif mode == "Kaleidoscope":
+    if mode == "Kaleidoscope":
         return _draw_kaleidoscope(audio_data, width, height, t)
     elif mode == "Plasma Fluid":
         return _draw_plasma(audio_data, width, height, t)
-    elif mode == "Cosmic Particles":
-        _draw_particles(draw, audio_data, width, height)
-    else:
-        _draw_bars(draw, audio_data, width, height)
-
-    return img
+    return None
 
-def _draw_bars(draw, data, w, h):
+def _draw_bars(buf, data, w, h):
     """Dibuja barras verticales clásicas"""
+    data = np.asarray(data, dtype=np.float64)
     num_bars = len(data)
     bar_width = w / num_bars
     
-    for i, amp in enumerate(data):
-        # amp está entre 0 y 1
-        bar_height = int(amp * h * 0.8) # 80% de la altura máxima
-        
-        # Coordenadas
-        x1 = i * bar_width
-        y1 = h - bar_height
-        x2 = x1 + bar_width - 2 # Separación de 2px
-        y2 = h
-        
-        # Color degradado basado en altura (Verde -> Amarillo -> Rojo)
-        color = (0, 255, 0)
-        if amp > 0.5: color = (255, 255, 0)
-        if amp > 0.8: color = (255, 0, 0)
-        
-        draw.rectangle([x1, y1, x2, y2], fill=color)
+    # amp está entre 0 y 1
+    bar_height = (data * h * 0.8).astype(np.int64) # 80% de la altura máxima
+    
+    # Coordenadas
+    x1 = np.arange(num_bars) * bar_width
+    y1 = h - bar_height
+    x2 = x1 + bar_width - 2 # Separación de 2px
+    y2 = np.full(num_bars, h)
+    
+    # Color degradado basado en altura (Verde -> Amarillo -> Rojo)
+    colors = np.zeros((num_bars, 3), dtype=np.uint8)
+    colors[:] = (0, 255, 0)
+    colors[data > 0.5] = (255, 255, 0)
+    colors[data > 0.8] = (255, 0, 0)
+    
+    raster.bars(buf, x1, y1, x2, y2, colors)
 
-def _draw_tunnel(draw, img, data, w, h):
+def _draw_tunnel(buf, data, w, h):
     """Simula un tunel neón usando rectángulos concéntricos"""
     center_x, center_y = w // 2, h // 2
     
@@ -140,103 +221,119 @@ def _draw_tunnel(draw, img, data, w, h):
     num_squares = 10
     max_size = min(w, h)
     
-    for i in range(num_squares):
-        factor = (i + 1) / num_squares
-        # El bass_energy afecta la separación o tamaño
-        current_size = max_size * factor * (0.8 + bass_energy * 0.4)
-        
-        half = current_size / 2
-        x1 = center_x - half
-        y1 = center_y - half
-        x2 = center_x + half
-        y2 = center_y + half
-        
-        # Color neón cian/rosa alternado
-        color = (0, 255, 255) if i % 2 == 0 else (255, 0, 255)
-        
-        # Grosor varía con la energía
-        width_line = int(2 + bass_energy * 5)
-        draw.rectangle([x1, y1, x2, y2], outline=color, width=width_line)
+    factor = np.arange(1, num_squares + 1) / num_squares
+    # El bass_energy afecta la separación o tamaño
+    current_size = max_size * factor * (0.8 + bass_energy * 0.4)
+    
+    half = current_size / 2
+    
+    # Color neón cian/rosa alternado
+    colors = np.where((np.arange(num_squares) % 2 == 0)[:, None], (0, 255, 255), (255, 0, 255))
+    
+    # Grosor varía con la energía
+    width_line = int(2 + bass_energy * 5)
+    raster.rect_outlines(buf, center_x - half, center_y - half, center_x + half, center_y + half,
+                         colors, width=width_line)
+
+def _draw_waveform(buf, data, w, h, waveform=None):
+    """Dibuja la forma de onda (envolvente min/max) o, sin ella, una línea a partir del espectro"""
+    if waveform is not None:
+        mins, maxs = waveform
+        center_y = h / 2
+        scale = h * 0.45
+        xs = np.linspace(0, w - 1, len(maxs))
+        # Franja entre el borde superior (máximos) y el inferior (mínimos)
+        raster.fill_between(buf, xs, center_y - maxs * scale, center_y - mins * scale, (0, 150, 255))
+        return
 
-def _draw_waveform(draw, data, w, h):
-    """Dibuja una línea conectando puntos"""
-    points = []
     num_points = len(data)
     step_x = w / num_points
     
     center_y = h / 2
     
-    for i, amp in enumerate(data):
-        x = i * step_x
-        # La amplitud mueve el punto arriba y abajo desde el centro
-        offset = amp * (h / 3) 
-        # Alternar signo para simular onda si los datos son solo magnitud FFT (siempre positivos)
-        # Esto es un truco visual
-        direction = 1 if i % 2 == 0 else -1 
-        y = center_y + (offset * direction)
-        points.append((x, y))
+    # La amplitud mueve el punto arriba y abajo desde el centro
+    offset = np.asarray(data, dtype=np.float64) * (h / 3)
+    # Alternar signo para simular onda si los datos son solo magnitud FFT (siempre positivos)
+    # Esto es un truco visual
+    direction = np.where(np.arange(num_points) % 2 == 0, 1, -1)
+    xs = np.arange(num_points) * step_x
+    ys = center_y + offset * direction
         
-    draw.line(points, fill=(0, 150, 255), width=3)
+    raster.polyline(buf, xs, ys, (0, 150, 255), width=3)
 
-def _draw_circle_pulse(draw, data, w, h):
+def _draw_circle_pulse(buf, data, w, h, beat_phase=None):
     """Un círculo central que late"""
     bass = np.mean(data[:5]) # Solo sub-bajos
     center_x, center_y = w // 2, h // 2
     
     radius = 50 + (bass * 150) # Radio base 50 + hasta 150px extra
+    if beat_phase is not None:
+        # Golpe en cada beat que se apaga antes del siguiente
+        radius += 40 * (1.0 - beat_phase) ** 3
     
     # Dibujar circulo relleno semitransparente (simulado con color oscuro)
     color_fill = (int(bass*50), 0, int(bass*100)) # Púrpura oscuro
     
-    x1 = center_x - radius
-    y1 = center_y - radius
-    x2 = center_x + radius
-    y2 = center_y + radius
-    
-    draw.ellipse([x1, y1, x2, y2], fill=color_fill, outline=(255, 255, 255), width=2)
+    raster.circle(buf, center_x, center_y, radius, fill=color_fill, outline=(255, 255, 255), width=2)
 
 # --- ADVANCED NUMPY VISUALIZERS ---
 
+def _kaleidoscope_geometry(sw, sh, n_bands):
+    # Coordenadas polares y, para los términos sin(k*Angle + w*t) y cos(k*R + w*t),
+    # el seno y coseno de k*Angle y k*R: por frame basta sin/cos de w*t (escalares)
+    x = np.linspace(-1, 1, sw, dtype=np.float32)
+    y = np.linspace(-1, 1, sh, dtype=np.float32)
+    X, Y = np.meshgrid(x, y)
+    R = np.sqrt(X**2 + Y**2)
+    Angle = np.arctan2(Y, X)
+    return {
+        # Anillo de la banda que corresponde a cada píxel
+        "ring": ((R * n_bands).astype(np.int32) % n_bands),
+        "sin_a6": np.sin(Angle * 6), "cos_a6": np.cos(Angle * 6),
+        "sin_a3": np.sin(Angle * 3), "cos_a3": np.cos(Angle * 3),
+        "sin_r10": np.sin(R * 10), "cos_r10": np.cos(R * 10),
+        "sin_r5": np.sin(R * 5), "cos_r5": np.cos(R * 5),
+    }
+
 def _draw_kaleidoscope(data, w, h, t):
     """
     Uses numpy to generate a radial spectrum effect.
     Optimized: Calculates at lower resolution and downscales to improve FPS.
+    The coordinate grids come from the geometry cache (see _geometry), so each
+    frame only does the time- and audio-dependent math.
     """
     # Optimization: Render at lower resolution
     scale = 2 # Improved from 4 to 2 for better quality
     sw, sh = max(50, w // scale), max(50, h // scale)
-    
-    # Create coordinate grid
-    x = np.linspace(-1, 1, sw)
-    y = np.linspace(-1, 1, sh)
-    X, Y = np.meshgrid(x, y)
-    
-    # Polar coordinates
-    R = np.sqrt(X**2 + Y**2)
-    Angle = np.arctan2(Y, X)
+    n = len(data)
+    grid = _geometry(("Kaleidoscope", w, h, scale, n), lambda: _kaleidoscope_geometry(sw, sh, n))
     
     # Bass influence
     bass = np.mean(data[:5]) * 2.0
     
+    # sin/cos of the time terms (scalars): sin(a + b) = sin a cos b + cos a sin b
+    s2, c2 = np.float32(math.sin(t * 2)), np.float32(math.cos(t * 2))
+    s3, c3 = np.float32(math.sin(t * 3)), np.float32(math.cos(t * 3))
+    s4, c4 = np.float32(math.sin(t * 4)), np.float32(math.cos(t * 4))
+    
     # Pattern generation
     # Create a rotating pattern based on angle, time, and radius
-    # Speed up: t * 3 instead of t
-    pattern = np.sin(Angle * 6 + t * 2) + np.cos(R * 10 - t * 4)
+    # sin(Angle * 6 + t * 2) + cos(R * 10 - t * 4)
+    pattern = grid["sin_a6"] * c2 + grid["cos_a6"] * s2 + grid["cos_r10"] * c4 + grid["sin_r10"] * s4
     
     # Modulate with audio
-    # Map audio data to rings
-    # We resize data to match R resolution roughly or just pick values based on R
-    idx = (R * len(data)).astype(int) % len(data)
-    audio_val = data[idx] # This broadcasts
+    # Map audio data to rings (precomputed index map)
+    audio_val = np.asarray(data, dtype=np.float32)[grid["ring"]]
     
     # Combine
     # Boost contrast and sensitivity
-    intensity = (pattern * 0.5 + 0.5) * audio_val * 255 * (1 + bass * 3)
+    intensity = (pattern * 0.5 + 0.5) * audio_val * np.float32(255 * (1 + bass * 3))
     
     # Color mapping (Psychedelic)
     # More vivid colors, faster cycling
-    red = (np.sin(R * 5 + t * 2) * 127 + 128) * audio_val
-    green = (np.cos(Angle * 3 - t * 3) * 127 + 128) * audio_val
+    # sin(R * 5 + t * 2) and cos(Angle * 3 - t * 3)
+    red = ((grid["sin_r5"] * c2 + grid["cos_r5"] * s2) * 127 + 128) * audio_val
+    green = ((grid["cos_a3"] * c3 + grid["sin_a3"] * s3) * 127 + 128) * audio_val
     blue = intensity
     
     # Stack and convert
@@ -245,17 +342,29 @@ def _draw_kaleidoscope(data, w, h, t):
     
     return img.resize((w, h), Image.Resampling.LANCZOS)
 
+def _plasma_geometry(sw, sh):
+    # sin/cos of X, Y (1D, broadcast), X + Y and the distance field: each
+    # sin(term + k*t) per frame is then a linear combination with scalars
+    x = np.linspace(0, 4 * np.pi, sw, dtype=np.float32)
+    y = np.linspace(0, 4 * np.pi, sh, dtype=np.float32)
+    X, Y = np.meshgrid(x, y)
+    D = np.sqrt(X**2 + Y**2)
+    return {
+        "sin_x": np.sin(x)[None, :], "cos_x": np.cos(x)[None, :],
+        "sin_y": np.sin(y)[:, None], "cos_y": np.cos(y)[:, None],
+        "sin_xy": np.sin(X + Y), "cos_xy": np.cos(X + Y),
+        "sin_d": np.sin(D), "cos_d": np.cos(D),
+    }
+
 def _draw_plasma(data, w, h, t):
     """
     Vectorized plasma fluid effect.
+    Coordinate grids come from the geometry cache (see _geometry).
     """
     # Downscale for performance, then upscale
     scale = 4
     sw, sh = w // scale, h // scale
-    
-    x = np.linspace(0, 4 * np.pi, sw)
-    y = np.linspace(0, 4 * np.pi, sh)
-    X, Y = np.meshgrid(x, y)
+    grid = _geometry(("Plasma Fluid", w, h, scale), lambda: _plasma_geometry(sw, sh))
     
     bass = np.mean(data[:10])
     mid = np.mean(data[10:30])
@@ -263,10 +372,12 @@ def _draw_plasma(data, w, h, t):
     # Fluid math: sum of sines interacting
     # Speed up: t * 3
     t_fast = t * 3
-    v1 = np.sin(X + t_fast)
-    v2 = np.sin(Y + t_fast)
-    v3 = np.sin((X + Y) + t_fast)
-    v4 = np.sin(np.sqrt(X**2 + Y**2) + t_fast * 2)
+    s1, c1 = np.float32(math.sin(t_fast)), np.float32(math.cos(t_fast))
+    s2, c2 = np.float32(math.sin(t_fast * 2)), np.float32(math.cos(t_fast * 2))
+    v1 = grid["sin_x"] * c1 + grid["cos_x"] * s1 # sin(X + t_fast)
+    v2 = grid["sin_y"] * c1 + grid["cos_y"] * s1 # sin(Y + t_fast)
+    v3 = grid["sin_xy"] * c1 + grid["cos_xy"] * s1 # sin((X + Y) + t_fast)
+    v4 = grid["sin_d"] * c2 + grid["cos_d"] * s2 # sin(sqrt(X**2 + Y**2) + t_fast * 2)
     
     val = (v1 + v2 + v3 + v4)
     
@@ -274,9 +385,13 @@ def _draw_plasma(data, w, h, t):
     # shift color based on audio
     c_shift = bass * 10 # More shift
     
-    r = np.sin(val * np.pi + c_shift) * 127 + 128
-    g = np.cos(val * np.pi + t_fast) * 127 + 128
-    b = np.sin(val * np.pi - c_shift) * 127 + 128
+    # sin/cos(val * pi) once, then each channel shifts it by a scalar phase
+    sin_v = np.sin(val * np.float32(np.pi))
+    cos_v = np.cos(val * np.float32(np.pi))
+    sc, cc = np.float32(math.sin(c_shift)), np.float32(math.cos(c_shift))
+    r = (sin_v * cc + cos_v * sc) * 127 + 128 # sin(val * pi + c_shift)
+    g = (cos_v * c1 - sin_v * s1) * 127 + 128 # cos(val * pi + t_fast)
+    b = (sin_v * cc - cos_v * sc) * 127 + 128 # sin(val * pi - c_shift)
     
     rgb = np.dstack((r, g, b)).astype(np.uint8) 
     
@@ -285,59 +400,23 @@ def _draw_plasma(data, w, h, t):
     # Upscale nicely
     return img.resize((w, h), Image.Resampling.BILINEAR)
 
-def _draw_particles(draw, data, w, h):
+def _draw_particles(buf, data, travel, t):
     """
     Starfield like effect.
     """
-    global _particles_state, _particles_colors
-    
-    num_particles = 200
-    
-    # Initialize if needed
-    if _particles_state is None or len(_particles_state) != num_particles:
-        # x, y, speed, size
-        _particles_state = np.random.rand(num_particles, 4)
-        _particles_state[:, 0] *= w # x
-        _particles_state[:, 1] *= h # y
-        _particles_state[:, 2] = np.random.rand(num_particles) * 5 + 2 # speed (faster base)
-        _particles_state[:, 3] = np.random.rand(num_particles) * 3 + 1 # size
-        
-        # Colors (R, G, B) normalized 0-1
-        _particles_colors = np.random.rand(num_particles, 3)
+    global _particles
+    
+    # Initialize if needed (or if the count changed)
+    if _particles is None or _particles.count != PARTICLE_COUNT:
+        _particles = ParticleSystem(PARTICLE_COUNT)
+
+    # Sin "travel" avanzan a velocidad base: una unidad por frame a TRAVEL_FPS.
+    # La vista previa siempre lo pasa, ya sin saltos (AudioEngine.get_features)
+    if travel is None:
+        travel = t * TRAVEL_FPS
 
     bass = np.mean(data[:5])
-    # MUCH faster on bass
-    speed_factor = 1 + (bass * 50) 
-    
-    # Update positions
-    # Move X
-    _particles_state[:, 0] -= _particles_state[:, 2] * speed_factor
-    
-    # Reset if out of bounds (left side)
-    reset_mask = _particles_state[:, 0] < 0
-    _particles_state[reset_mask, 0] = w
-    _particles_state[reset_mask, 1] = np.random.rand(np.sum(reset_mask)) * h
-    
-    # Draw
-    # We iterate here because PIL draw primitive is faster for sparse dots than constructing huge array
-    for i, p in enumerate(_particles_state):
-        x, y, _, size = p
-        # Size reacts to audio too
-        s = size * (1 + bass * 5)
-        
-        # Color processing
-        # Base color + brightness boost from bass
-        c_r, c_g, c_b = _particles_colors[i]
-        
-        # Brightness boost
-        boost = 1 + bass * 2
-        final_color = (
-            min(255, int(c_r * 255 * boost)),
-            min(255, int(c_g * 255 * boost)),
-            min(255, int(c_b * 255 * boost))
-        )
-        
-        draw.ellipse([x, y, x+s, y+s], fill=final_color)
+    _particles.draw(buf, travel, bass)
 
 
 def _draw_manim_placeholder(w, h):
@@ -0,0 +1,161 @@
+import numpy as np
+from audio_analysis import RowBuffer
+
+# Muestras por entrada del nivel base (a 22050 Hz, ~0.7 ms)
+WAVE_BLOCK = 16
+
+# Niveles 1 a _SKIPPED_LEVELS no se guardan: a esos zooms cada columna junta
+# menos de 2^(_SKIPPED_LEVELS + 1) entradas del nivel 0, que se reducen al
+# consultar. Así los niveles superiores ocupan 1/8 del nivel 0 en vez de lo mismo
+_SKIPPED_LEVELS = 3
+
+# Entradas por trozo al reducir el nivel 0 (puede ser un memory-map enorme)
+_REDUCE_CHUNK = 1 << 20
+
+
+class WaveformPyramid:
+    """
+    Pirámide de decimación min/max del audio decodificado.
+
+    El nivel 0 guarda (mínimo, máximo) de cada bloque de `block` muestras y cada
+    nivel siguiente junta parejas del anterior; los más finos no se guardan (ver
+    _SKIPPED_LEVELS), así que ocupa ~1.125x el nivel base (unos 3 MB para 10
+    minutos a 22050 Hz). Con ella cualquier ventana de tiempo se dibuja a
+    cualquier ancho en O(ancho), sin volver a tocar las muestras.
+
+    El nivel 0 se rellena por bloques durante el análisis (add) y ya se puede
+    consultar; los niveles superiores se construyen en finish.
+    """
+
+    def __init__(self, sr, rows=0, buffer=None, block=WAVE_BLOCK):
+        self.sr = sr
+        self.block = block
+        self._buffer = buffer if buffer is not None else RowBuffer(max(1, rows), 2, np.float32)
+        self.base = self._buffer.array
+        self.count = 0 # Entradas del nivel 0 ya escritas
+        self.levels = None # [nivel 0, None..., nivel _SKIPPED_LEVELS + 1, ...] tras finish
+        self._pending = np.zeros(0, dtype=np.float32)
+
+    @staticmethod
+    def rows_for(samples, block=WAVE_BLOCK):
+        """Entradas del nivel 0 para una señal de `samples` muestras."""
+        return int(samples) // block + 1
+
+    @classmethod
+    def from_samples(cls, y, sr, block=WAVE_BLOCK):
+        pyramid = cls(sr, cls.rows_for(len(y), block), block=block)
+        pyramid.add(y)
+        pyramid.finish()
+        return pyramid
+
+    @classmethod
+    def from_base(cls, base, sr, block=WAVE_BLOCK):
+        """Reconstruye la pirámide a partir del nivel 0 (p. ej. leído de la caché)."""
+        pyramid = cls(sr, block=block)
+        pyramid.base = base
+        pyramid.count = len(base)
+        pyramid._build_levels()
+        return pyramid
+
+    @property
+    def duration(self):
+        return self.count * self.block / self.sr
+
+    # --- Construcción ---
+    def add(self, samples):
+        """Añade muestras (mono) al nivel 0; el resto de un bloque incompleto queda pendiente."""
+        data = np.concatenate((self._pending, np.asarray(samples, dtype=np.float32)))
+        usable = len(data) - len(data) % self.block
+        if usable:
+            self._write(data[:usable].reshape(-1, self.block))
+        self._pending = data[usable:]
+
+    def finish(self):
+        """Cierra el último bloque y construye los niveles superiores."""
+        if len(self._pending):
+            self._write(self._pending[None, :])
+            self._pending = np.zeros(0, dtype=np.float32)
+        self.base = self._buffer.finish(self.count)
+        self._build_levels()
+
+    def close(self):
+        """Suelta el archivo del nivel 0 (si va a disco) sin terminar la pirámide."""
+        self._buffer.close()
+
+    def _write(self, blocks):
+        rows = np.stack((blocks.min(axis=1), blocks.max(axis=1)), axis=1)
+        self._buffer.write(self.count, rows)
+        # Primero el array (puede haber crecido) y después la cuenta: un lector
+        # que lee count y luego base nunca ve entradas fuera del array
+        self.base = self._buffer.array
+        self.count = min(self.count + len(rows), len(self.base))
+
+    def _build_levels(self):
+        levels = [self.base[:self.count]]
+        if len(levels[0]) > 1:
+            levels += [None] * _SKIPPED_LEVELS
+            levels.append(self._reduce(levels[0], 2 << _SKIPPED_LEVELS))
+        while len(levels[-1]) > 1:
+            levels.append(self._reduce(levels[-1], 2))
+        self.levels = levels
+
+    @staticmethod
+    def _reduce(data, step):
+        """(mín, máx) de cada `step` entradas (la última puede juntar menos), por trozos."""
+        out = np.empty((-(-len(data) // step), 2), dtype=np.float32)
+        chunk = _REDUCE_CHUNK - _REDUCE_CHUNK % step
+        for start in range(0, len(data), chunk):
+            part = np.asarray(data[start:start + chunk])
+            offsets = np.arange(0, len(part), step)
+            rows = slice(start // step, start // step + len(offsets))
+            out[rows, 0] = np.minimum.reduceat(part[:, 0], offsets)
+            out[rows, 1] = np.maximum.reduceat(part[:, 1], offsets)
+        return out
+
+    # --- Consulta ---
+    def envelope(self, start, end, width):
+        """
+        (mínimos, máximos) de la señal entre start y end (segundos), uno por cada
+        una de las `width` columnas. Lo que cae fuera de la pista (o aún sin
+        analizar) vale 0.
+        """
+        width = max(1, int(width))
+        count = self.count
+        levels = self.levels
+        level = 0
+        samples_per_column = max(end - start, 0) * self.sr / width
+        if levels is not None and samples_per_column > self.block:
+            # El nivel más grueso con al menos una entrada por columna
+            level = min(int(np.log2(samples_per_column / self.block)), len(levels) - 1)
+            if levels[level] is None:
+                level = 0 # Nivel no guardado: pocas entradas del 0 por columna
+        data = levels[level] if levels is not None else self.base[:count]
+
+        mins = np.zeros(width, dtype=np.float32)
+        maxs = np.zeros(width, dtype=np.float32)
+        n = len(data)
+        if n == 0:
+            return mins, maxs
+
+        edges = np.linspace(start, end, width + 1) * self.sr / (self.block << level)
+        inside = (edges[1:] > 0) & (edges[:-1] < n)
+        if not inside.any():
+            return mins, maxs
+        lo = np.clip(np.floor(edges[:-1][inside]).astype(np.int64), 0, n - 1)
+        last = np.clip(np.ceil(edges[1:][inside]).astype(np.int64) - 1, lo, n - 1)
+        # reduceat: cada columna reduce [lo[i], lo[i+1]) (si coinciden, por zoom
+        # por debajo del nivel 0, repite la entrada); la entrada que cruza el borde
+        # derecho de la columna se suma aparte, así ninguna muestra se pierde
+        segment = np.asarray(data[lo[0]:last[-1] + 1])
+        offsets = lo - lo[0]
+        mins[inside] = np.minimum(np.minimum.reduceat(segment[:, 0], offsets), segment[last - lo[0], 0])
+        maxs[inside] = np.maximum(np.maximum.reduceat(segment[:, 1], offsets), segment[last - lo[0], 1])
+        return mins, maxs
+
+    def window(self, t, seconds, width):
+        """Ventana de `seconds` segundos centrada en t (para el visualizador)."""
+        return self.envelope(t - seconds / 2, t + seconds / 2, width)
+
+    def overview(self, width):
+        """La pista entera en `width` columnas (p. ej. para una barra de desplazamiento)."""
+        return self.envelope(0, self.duration, width)